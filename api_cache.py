@@ -0,0 +1,240 @@
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    __slots__ = ('value', 'fresh_until', 'stale_until', 'size')
+
+    def __init__(self, value, fresh_until, stale_until, size):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.size = size
+
+
+class MemoryBackend:
+    """Bounded in-process LRU with approximate memory accounting.
+
+    Entries are evicted least-recently-used first whenever either the entry
+    count or the total payload size (measured as encoded JSON) goes over
+    its limit.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.bytes_used += entry.size
+            while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes_used -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every worker process that opens the same file"""
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        self._writes = 0
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS api_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'fresh_until REAL NOT NULL, stale_until REAL NOT NULL, stored_at REAL NOT NULL)'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS ix_api_cache_stored_at ON api_cache (stored_at)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM api_cache').fetchone()[0]
+
+    @property
+    def bytes_used(self):
+        return self._connect().execute('SELECT COALESCE(SUM(LENGTH(value)), 0) FROM api_cache').fetchone()[0]
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, fresh_until, stale_until FROM api_cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, fresh_until, stale_until = row
+        return CacheEntry(json.loads(value), fresh_until, stale_until, len(value))
+
+    def set(self, key, entry):
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO api_cache (key, value, fresh_until, stale_until, stored_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, json.dumps(entry.value, default=str), entry.fresh_until, entry.stale_until, time.time())
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(connection)
+
+    def _prune(self, connection):
+        cursor = connection.execute(
+            'DELETE FROM api_cache WHERE stale_until < ? OR key IN ('
+            'SELECT key FROM api_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (time.time(), self.max_entries)
+        )
+        self.evictions += cursor.rowcount
+
+    def clear(self):
+        self._connect().execute('DELETE FROM api_cache')
+
+
+class ResponseCache:
+    """TTL cache in front of upstream API calls.
+
+    Each method gets its own TTL. Once an entry expires it is still served
+    for ``stale_ttl`` seconds while a background thread refreshes it
+    (stale-while-revalidate). Error results are cached for ``negative_ttl``
+    seconds so a failing upstream is not hammered.
+    """
+
+    def __init__(self, backend=None, ttls=None, default_ttl=300, stale_ttl=600, negative_ttl=30):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.counters = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'negative_hits': 0, 'refreshes': 0}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method, args):
+        return f'{method}:{json.dumps(args, separators=(",", ":"), default=str)}'
+
+    @staticmethod
+    def is_error(value):
+        return isinstance(value, dict) and 'error' in value
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def get_or_compute(self, method, args, compute):
+        key = self.make_key(method, args)
+        now = time.time()
+        entry = self.backend.get(key)
+
+        if entry is not None and now < entry.fresh_until:
+            self._count('negative_hits' if self.is_error(entry.value) else 'hits')
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            self._count('stale_hits')
+            self._refresh_in_background(method, key, compute)
+            return entry.value
+
+        self._count('misses')
+        return self._store(method, key, compute())
+
+    def _store(self, method, key, value):
+        now = time.time()
+        if self.is_error(value):
+            fresh_until = stale_until = now + self.negative_ttl
+        else:
+            fresh_until = now + self.ttls.get(method, self.default_ttl)
+            stale_until = fresh_until + self.stale_ttl
+        size = len(json.dumps(value, default=str))
+        self.backend.set(key, CacheEntry(value, fresh_until, stale_until, size))
+        return value
+
+    def _refresh_in_background(self, method, key, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = compute()
+                # Keep serving the stale copy rather than replacing it with an error
+                if not self.is_error(value):
+                    self._store(method, key, value)
+                self._count('refreshes')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        stats['entries'] = len(self.backend)
+        stats['bytes'] = self.backend.bytes_used
+        stats['evictions'] = self.backend.evictions
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+
+
+def cached(method):
+    """Cache the decorated MusicAPIService method through ``self.cache``"""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None:
+                return func(self, *args, **kwargs)
+            # Bind defaults so search_tracks(q) and search_tracks(q, 10) share an entry
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            return self.cache.get_or_compute(method, list(bound.arguments.values())[1:],
+                                             lambda: func(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
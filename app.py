@@ -1,25 +1,101 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+import click
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file, abort
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from models import db, User, Artist, Album, Song, Playlist, Favorite
-from datetime import datetime
+from sqlalchemy.orm import joinedload
+from models import db, User, Artist, Album, Song, Playlist, Favorite, playlist_songs
+from datetime import datetime, date
 import json
-from music_api import MusicAPIService
+import time
+from music_api import MusicAPIService, CACHE_TTLS, BATCH_TIMEOUT, MAX_BATCH_SIZE
+from deezer_async import AsyncDeezerClient
+from api_cache import ResponseCache, MemoryBackend, SQLiteBackend
+from search_index import SearchIndex, KIND_SONG, KIND_ARTIST, KIND_ALBUM
+from streaming import send_audio
+from play_counter import PlayCounter
+from query_budget import query_budget
+from pagination import keyset_paginate, page_size, InvalidCursor
+import migrations
+from library_stats import LibraryCounters, count_flushed_plays
+from uploads import UploadError, receive_audio, receive_image, add_reference
+from covers import CoverThumbnails, CoverNotFound, SIZES, FORMATS, negotiate_format
+from library_import import LibraryImporter, format_progress
+from recommender import Recommender
+from play_history import PlayHistory, dedupe_consecutive
+import playlists
+from http_cache import HTTPCache, LIBRARY, PLAYS, bump_versions, plays_flushed
+from suggest import SuggestIndex, KIND_NAMES
+from favorite_sets import FavoriteSets, EMPTY as FAVORITES_EMPTY
+from metrics import Metrics
+from assets import Assets, missing_packages, mimetype as asset_mimetype
+from database import Database
+from serializers import (SongRecord, AlbumRecord, ArtistRecord, ARTIST_NAME, song_query, album_query, artist_query, records,
+                         url_builder, json_response, song_json, album_json, artist_json)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here-change-this-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+# Any SQLAlchemy URL; SQLite files get WAL and a read-only reader engine (see database.py)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+# Optional read replica for other databases
+app.config['DATABASE_READ_URL'] = os.environ.get('DATABASE_READ_URL')
+# SQLITE_TUNING=0 restores SQLite's default journaling, single engine and no write lock
+app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') != '0'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+app.config['MAX_AUDIO_BYTES'] = 50 * 1024 * 1024
+app.config['MAX_IMAGE_BYTES'] = 10 * 1024 * 1024
+# Resized cover variants, evicted least recently used first past this size
+app.config['COVER_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+# Seconds before the recommendation model is rebuilt in the background (0 disables)
+app.config['RECOMMENDER_REBUILD_INTERVAL'] = 3600
+# Repeat plays of a song inside this many seconds are one play; history is
+# trimmed to this age and length per user by `flask compact-play-history`
+app.config['PLAY_HISTORY_DEDUPE_SECONDS'] = 30
+app.config['PLAY_HISTORY_RETENTION_DAYS'] = 90
+app.config['PLAY_HISTORY_PER_USER'] = 500
+# None, 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd)
+app.config['AUDIO_OFFLOAD'] = os.environ.get('AUDIO_OFFLOAD')
+app.config['AUDIO_ACCEL_PREFIX'] = '/protected/audio/'
+# Point at a file to share cached Deezer responses between workers
+app.config['DEEZER_CACHE_PATH'] = os.environ.get('DEEZER_CACHE_PATH')
+# 'async' sends Deezer requests through one pooled event loop that coalesces
+# identical in-flight requests; 'sync' uses deezer.Client directly
+app.config['DEEZER_BACKEND'] = os.environ.get('DEEZER_BACKEND', 'async')
+app.config['DEEZER_API_URL'] = os.environ.get('DEEZER_API_URL', 'https://api.deezer.com')
+# Upstream requests in flight per worker, seconds per attempt, and retries after the first
+app.config['DEEZER_CONCURRENCY'] = 10
+app.config['DEEZER_TIMEOUT'] = 5.0
+app.config['DEEZER_RETRIES'] = 2
+# Seconds before the suggestion index is rebuilt after other workers changed the library or play counts
+app.config['SUGGEST_REFRESH_SECONDS'] = 300
+# Buffered play counts are written once this many are pending or after this many seconds
+app.config['PLAY_FLUSH_SIZE'] = 500
+app.config['PLAY_FLUSH_INTERVAL'] = 5.0
+# Log requests slower than this many milliseconds with their SQL (None disables)
+app.config['SLOW_REQUEST_MS'] = int(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
 
 # Initialize extensions
-db.init_app(app)
+database = Database(app, db)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+metrics = Metrics(app)
+search_index = SearchIndex(app)
+play_counter = PlayCounter(app)
+library_counters = LibraryCounters(app)
+cover_thumbnails = CoverThumbnails(app)
+recommender = Recommender(app)
+play_history = PlayHistory(app)
+http_cache = HTTPCache(app)
+suggest_index = SuggestIndex(app, version=http_cache.versions)
+favorite_sets = FavoriteSets(app)
+assets = Assets(app)
+play_counter.flush_listeners.append(count_flushed_plays)
+play_counter.flush_listeners.append(play_history.write)
+play_counter.flush_listeners.append(plays_flushed)
 
 # Ensure upload directories exist
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'audio'), exist_ok=True)
@@ -40,11 +116,91 @@ def allowed_file(filename, allowed_set):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_set
 
 
+# Keyset sort orders: (expression, descending) pairs ending in a unique column.
+# Plain columns can use the indexes in models.py; migration 1 backfills their NULLs.
+SONG_SORTS = {
+    'title': [(Song.title, False), (Song.id, False)],
+    'plays': [(Song.plays, True), (Song.id, True)],
+    'created_at': [(Song.created_at, True), (Song.id, True)],
+}
+ALBUM_SORTS = {
+    'title': [(Album.title, False), (Album.id, False)],
+    'release_date': [(db.func.coalesce(Album.release_date, date(1, 1, 1)), True), (Album.id, True)],
+}
+ARTIST_SORTS = {
+    'name': [(Artist.name, False), (Artist.id, False)],
+}
+FAVORITE_SORTS = {
+    'recent': [(Favorite.created_at, True), (Favorite.id, True)],
+    'title': [(Song.title, False), (Favorite.id, False)],
+    'artist': [(ARTIST_NAME, False), (Favorite.id, False)],
+    'plays': [(Song.plays, True), (Favorite.id, True)],
+}
+
+
+def sort_keys(sorts, default):
+    return sorts.get(request.args.get('sort'), sorts[default])
+
+
+def cover_url(filename, size='md'):
+    """Content-addressed URL of a cover resized for the view: sm rows, md cards, lg player"""
+    return cover_thumbnails.url(filename, size)
+
+
+def record_play(song_id):
+    """Count a play and add it to the listener's history, once per dedupe window"""
+    if current_user.is_authenticated and not play_history.record(current_user.id, song_id):
+        return
+    play_counter.record(song_id)
+
+
+def artists_with_song_counts():
+    """Query of ``(Artist, songs_count)`` rows with the count done in SQL"""
+    songs_count = db.func.count(Song.id).label('songs_count')
+    return db.session.query(Artist, songs_count).outerjoin(Song, Song.artist_id == Artist.id).group_by(Artist.id)
+
+
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    return jsonify({'error': str(error)}), 400
+
+
+# The page helpers return ORM objects for templates by default; the JSON
+# endpoints pass the column projections from serializers.py instead.
+def library_songs_page(cursor=None, limit=None, query=None):
+    if query is None:
+        query = Song.query.options(joinedload(Song.artist), joinedload(Song.album))
+    return keyset_paginate(query, sort_keys(SONG_SORTS, 'title'), cursor, page_size(limit))
+
+
+def library_albums_page(cursor=None, limit=None, query=None):
+    if query is None:
+        query = Album.query.options(joinedload(Album.artist))
+    return keyset_paginate(query, sort_keys(ALBUM_SORTS, 'title'), cursor, page_size(limit))
+
+
+def library_artists_page(cursor=None, limit=None, query=None):
+    if query is None:
+        query = artists_with_song_counts()
+    return keyset_paginate(query, sort_keys(ARTIST_SORTS, 'name'), cursor, page_size(limit))
+
+
+def playlist_songs_page(playlist_id, cursor=None, limit=None, query=None):
+    if query is None:
+        query = Song.query.options(joinedload(Song.artist), joinedload(Song.album))
+    query = query.join(playlist_songs, playlist_songs.c.song_id == Song.id) \
+        .filter(playlist_songs.c.playlist_id == playlist_id)
+    keys = [(playlist_songs.c.position, False), (playlist_songs.c.song_id, False)]
+    return keyset_paginate(query, keys, cursor, page_size(limit))
+
+
 # Routes
 @app.route('/')
+@query_budget(4)
 def index():
-    featured_songs = Song.query.order_by(Song.plays.desc()).limit(10).all()
-    recent_albums = Album.query.order_by(Album.release_date.desc()).limit(6).all()
+    featured_songs = Song.query.options(joinedload(Song.artist), joinedload(Song.album)) \
+        .order_by(Song.plays.desc()).limit(10).all()
+    recent_albums = Album.query.options(joinedload(Album.artist)).order_by(Album.release_date.desc()).limit(6).all()
 
     # Fix for the popular artists query
     popular_artists = Artist.query.limit(6).all()
@@ -56,25 +212,85 @@ def index():
 
 
 @app.route('/library')
+@query_budget(5)
 def library():
-    songs = Song.query.all()
-    albums = Album.query.all()
-    artists = Artist.query.all()
+    # Only the first page of each tab is rendered; the rest is fetched as the user scrolls
+    songs = library_songs_page()
+    albums = library_albums_page()
+    artists = library_artists_page()
+    favorite_ids = favorite_sets.get(current_user.id) if current_user.is_authenticated else FAVORITES_EMPTY
     return render_template('library.html',
-                           songs=songs,
-                           albums=albums,
-                           artists=artists)
+                           songs=songs.items,
+                           favorite_ids=favorite_ids,
+                           albums=albums.items,
+                           artists=artists.items,
+                           next_cursors={'songs': songs.next_cursor,
+                                         'albums': albums.next_cursor,
+                                         'artists': artists.next_cursor})
+
+
+@app.route('/api/library/songs')
+@query_budget(1)
+def get_library_songs():
+    page = library_songs_page(request.args.get('cursor'), request.args.get('limit'), song_query())
+    urls = url_builder()
+    return json_response({
+        'songs': [song_json(s, urls) for s in records(SongRecord, page.items)],
+        'next_cursor': page.next_cursor
+    })
+
+
+@app.route('/api/library/albums')
+@query_budget(1)
+def get_library_albums():
+    page = library_albums_page(request.args.get('cursor'), request.args.get('limit'), album_query())
+    urls = url_builder()
+    return json_response({
+        'albums': [album_json(a, urls) for a in records(AlbumRecord, page.items)],
+        'next_cursor': page.next_cursor
+    })
+
+
+@app.route('/api/library/artists')
+@query_budget(1)
+def get_library_artists():
+    page = library_artists_page(request.args.get('cursor'), request.args.get('limit'), artist_query())
+    urls = url_builder()
+    return json_response({
+        'artists': [artist_json(a, urls) for a in records(ArtistRecord, page.items)],
+        'next_cursor': page.next_cursor
+    })
 
 
 @app.route('/search')
+@query_budget(3)
 def search():
     query = request.args.get('q', '')
-    if query:
-        songs = Song.query.filter(Song.title.contains(query)).all()
-        artists = Artist.query.filter(Artist.name.contains(query)).all()
-        albums = Album.query.filter(Album.title.contains(query)).all()
-    else:
-        songs = artists = albums = []
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+
+    if not query:
+        return jsonify({'songs': [], 'artists': [], 'albums': []})
+
+    if search_index.available:
+        songs = search_index.search(query, KIND_SONG, limit, offset)
+        artists = search_index.search(query, KIND_ARTIST, limit, offset)
+        albums = search_index.search(query, KIND_ALBUM, limit, offset)
+        return jsonify({
+            'songs': [{'id': s.id, 'title': s.title, 'artist': s.artist or 'Unknown'} for s in songs],
+            'artists': [{'id': a.id, 'name': a.title} for a in artists],
+            'albums': [{'id': a.id, 'title': a.title, 'artist': a.artist or 'Unknown'} for a in albums]
+        })
+
+    # Databases without FTS5 fall back to substring matching
+    songs = Song.query.options(joinedload(Song.artist)) \
+        .filter(Song.title.contains(query)).offset(offset).limit(limit).all()
+    artists = Artist.query.filter(Artist.name.contains(query)).offset(offset).limit(limit).all()
+    albums = Album.query.options(joinedload(Album.artist)) \
+        .filter(Album.title.contains(query)).offset(offset).limit(limit).all()
 
     return jsonify({
         'songs': [{'id': s.id, 'title': s.title, 'artist': s.artist.name if s.artist else 'Unknown'} for s in songs],
@@ -83,28 +299,109 @@ def search():
     })
 
 
+SUGGEST_KINDS = {name: kind for kind, name in KIND_NAMES.items()}
+
+
+@app.route('/api/suggest')
+@query_budget(1)  # Only the cache version check that may trigger a refresh
+def suggest():
+    """Search-as-you-type over song, artist and album names, most played first.
+
+    ``types`` limits the kinds (``song,artist,album``). Served from memory
+    without touching the database.
+    """
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    types = [t for t in request.args.get('types', '').split(',') if t]
+    unknown = [t for t in types if t not in SUGGEST_KINDS]
+    if unknown:
+        return jsonify({'error': f'Unknown types: {", ".join(unknown)}'}), 400
+    kinds = {SUGGEST_KINDS[t] for t in types} or None
+    return json_response({'query': query, 'suggestions': suggest_index.suggest(query, limit, kinds)})
+
+
+@app.route('/api/suggest/stats')
+def get_suggest_stats():
+    return jsonify(suggest_index.stats())
+
+
 @app.route('/player/<int:song_id>')
+@query_budget(2)
 def player(song_id):
-    song = Song.query.get_or_404(song_id)
-    song.plays += 1
-    db.session.commit()
+    song = Song.query.options(joinedload(Song.artist), joinedload(Song.album)).get_or_404(song_id)
+    record_play(song.id)
     return render_template('player.html', song=song)
 
 
 @app.route('/api/song/<int:song_id>')
+@http_cache.cached(LIBRARY, max_age=300, s_maxage=3600)
+@query_budget(1)
 def get_song(song_id):
-    song = Song.query.get_or_404(song_id)
-    return jsonify({
-        'id': song.id,
-        'title': song.title,
-        'artist': song.artist.name if song.artist else 'Unknown',
-        'album': song.album.title if song.album else 'Single',
-        'duration': song.duration,
-        'file_url': url_for('static', filename=f'uploads/audio/{song.file_path}'),
-        'cover_url': url_for('static',
-                             filename=f'uploads/covers/{song.album.cover_image}') if song.album and song.album.cover_image else url_for(
-            'static', filename='default-album.jpg')
-    })
+    row = song_query(Song.file_path).filter(Song.id == song_id).first()
+    if row is None:
+        abort(404)
+    urls = url_builder()
+    return json_response(dict(song_json(SongRecord._make(row[:-1]), urls, 'lg'),
+                              file_url=urls.static(f'uploads/audio/{row[-1]}')))
+
+
+@app.route('/covers/<size>/<digest>/<path:filename>')
+def cover_thumbnail(size, digest, filename):
+    if size not in SIZES or os.path.basename(filename) != filename:
+        return jsonify({'error': 'Unknown cover size'}), 404
+    current = cover_thumbnails.digest(filename)
+    if current is None:
+        return jsonify({'error': 'Cover not found'}), 404
+    if current != digest:
+        # The source changed since the URL was handed out
+        return redirect(cover_url(filename, size))
+
+    fmt = negotiate_format(request.accept_mimetypes)
+    try:
+        path = cover_thumbnails.render(filename, size, fmt)
+    except CoverNotFound:
+        return jsonify({'error': 'Cover not found'}), 404
+    response = send_file(path, mimetype=FORMATS[fmt][1], max_age=365 * 24 * 3600, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    located = assets.locate(filename, request.accept_encodings)
+    if located is None:
+        # Not built: the bundle straight from source, revalidated on every load
+        source = assets.source(filename)
+        if source is None:
+            abort(404)
+        response = app.response_class(source, mimetype=asset_mimetype(filename))
+        response.cache_control.no_cache = True
+        return response
+
+    path, encoding = located
+    response = send_file(path, mimetype=asset_mimetype(filename), max_age=365 * 24 * 3600, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+
+@app.route('/api/cache/stats')
+def get_http_cache_stats():
+    """Per-endpoint hit ratios of the shared response cache"""
+    return jsonify(http_cache.stats())
+
+
+@app.route('/api/covers/cache/stats')
+def get_cover_cache_stats():
+    return jsonify(cover_thumbnails.cache.stats())
 
 
 @app.route('/playlist/create', methods=['POST'])
@@ -129,34 +426,98 @@ def add_to_playlist(playlist_id):
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
     data = request.get_json()
-    song = Song.query.get(data['song_id'])
-    if song and song not in playlist.songs:
-        playlist.songs.append(song)
+    if playlists.add_songs(playlist_id, [data['song_id']]):
         db.session.commit()
 
     return jsonify({'success': True})
 
 
+def edit_playlist_songs(playlist_id, edit):
+    """Apply ``edit(song_ids, data)`` to the user's playlist in one transaction"""
+    playlist = Playlist.query.get_or_404(playlist_id)
+    if playlist.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True)
+    try:
+        song_ids = playlists.parse_song_ids(data)
+    except playlists.InvalidSongList as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    result = edit(song_ids, data)
+    db.session.commit()
+    return jsonify(dict(result, success=True, song_count=playlists.song_count(playlist_id)))
+
+
+@app.route('/playlist/<int:playlist_id>/songs/add', methods=['POST'])
+@login_required
+def add_songs_to_playlist(playlist_id):
+    """Append ``song_ids`` in order, skipping unknown songs and songs already in the playlist"""
+    return edit_playlist_songs(playlist_id, lambda song_ids, data: {
+        'added': playlists.add_songs(playlist_id, song_ids)
+    })
+
+
+@app.route('/playlist/<int:playlist_id>/songs/remove', methods=['POST'])
+@login_required
+def remove_songs_from_playlist(playlist_id):
+    return edit_playlist_songs(playlist_id, lambda song_ids, data: {
+        'removed': playlists.remove_songs(playlist_id, song_ids)
+    })
+
+
+@app.route('/playlist/<int:playlist_id>/songs/reorder', methods=['POST'])
+@login_required
+def reorder_playlist_songs(playlist_id):
+    """Move ``song_ids``, in that order, to ``index`` among the remaining songs (the end if omitted)"""
+    index = (request.get_json(silent=True) or {}).get('index')
+    if index is not None and (not isinstance(index, int) or isinstance(index, bool)):
+        return jsonify({'success': False, 'error': 'index must be an integer'}), 400
+    return edit_playlist_songs(playlist_id, lambda song_ids, data: {
+        'moved': playlists.move_songs(playlist_id, song_ids, index)
+    })
+
+
 @app.route('/favorite/toggle/<int:song_id>', methods=['POST'])
 @login_required
 def toggle_favorite(song_id):
-    favorite = Favorite.query.filter_by(
-        user_id=current_user.id,
-        song_id=song_id
-    ).first()
-
-    if favorite:
-        db.session.delete(favorite)
-        is_favorite = False
-    else:
-        favorite = Favorite(user_id=current_user.id, song_id=song_id)
-        db.session.add(favorite)
-        is_favorite = True
-
+    is_favorite = favorite_sets.toggle(current_user.id, song_id)
     db.session.commit()
     return jsonify({'success': True, 'is_favorite': is_favorite})
 
 
+@app.route('/api/user/favorites/bulk', methods=['POST'])
+@login_required
+def update_favorites():
+    """Add and remove favorites in one transaction: ``{"add": [song ids], "remove": [song ids]}``"""
+    data = request.get_json(silent=True) or {}
+    try:
+        add = playlists.parse_song_ids(data, 'add') if 'add' in data else []
+        remove = playlists.parse_song_ids(data, 'remove') if 'remove' in data else []
+    except playlists.InvalidSongList as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    added, removed = favorite_sets.update(current_user.id, add, remove)
+    db.session.commit()
+    return jsonify({'success': True, 'added': added, 'removed': removed})
+
+
+@app.route('/api/user/favorites/contains')
+@query_budget(2)
+@login_required
+def favorites_contains():
+    """Which of ``ids`` (comma-separated song ids) are the user's favorites"""
+    try:
+        song_ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    if len(song_ids) > playlists.MAX_BULK_SONGS:
+        return jsonify({'error': f'At most {playlists.MAX_BULK_SONGS} ids per request'}), 400
+
+    favorite_ids = favorite_sets.get(current_user.id)
+    return jsonify({'favorites': favorite_ids.intersection(song_ids)})
+
+
 @app.route('/api/upload', methods=['POST'])
 @login_required
 def upload_song():
@@ -169,82 +530,106 @@ def upload_song():
     if audio_file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    if audio_file and allowed_file(audio_file.filename, ALLOWED_AUDIO):
-        # Save audio file
-        audio_filename = secure_filename(audio_file.filename)
-        audio_path = os.path.join(app.config['UPLOAD_FOLDER'], 'audio', audio_filename)
-        audio_file.save(audio_path)
-
-        # Save cover if provided
-        cover_filename = 'default-album.jpg'
-        if cover_file and allowed_file(cover_file.filename, ALLOWED_IMAGES):
-            cover_filename = secure_filename(cover_file.filename)
-            cover_path = os.path.join(app.config['UPLOAD_FOLDER'], 'covers', cover_filename)
-            cover_file.save(cover_path)
-
-        # Get or create artist
-        artist_name = request.form.get('artist', 'Unknown Artist')
-        artist = Artist.query.filter_by(name=artist_name).first()
-        if not artist:
-            artist = Artist(name=artist_name)
-            db.session.add(artist)
-            db.session.flush()
-
-        # Get or create album
-        album_title = request.form.get('album', 'Singles')
-        album = Album.query.filter_by(title=album_title, artist_id=artist.id).first()
-        if not album and album_title:
-            album = Album(
-                title=album_title,
-                artist_id=artist.id,
-                cover_image=cover_filename,
-                genre=request.form.get('genre', 'Unknown')
-            )
-            db.session.add(album)
-            db.session.flush()
+    if not allowed_file(audio_file.filename, ALLOWED_AUDIO):
+        return jsonify({'error': 'Invalid file type'}), 400
+    if cover_file and cover_file.filename and not allowed_file(cover_file.filename, ALLOWED_IMAGES):
+        return jsonify({'error': 'Invalid cover type'}), 400
 
-        # Create song
-        song = Song(
-            title=request.form.get('title', 'Untitled'),
+    # Validate both files before either goes into the store
+    try:
+        stored, metadata = receive_audio(audio_file, os.path.join(app.config['UPLOAD_FOLDER'], 'audio'),
+                                         app.config['MAX_AUDIO_BYTES'])
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    cover_filename = 'default-album.jpg'
+    if cover_file and cover_file.filename:
+        try:
+            cover = receive_image(cover_file, os.path.join(app.config['UPLOAD_FOLDER'], 'covers'),
+                                  app.config['MAX_IMAGE_BYTES'])
+        except UploadError as e:
+            stored.discard()
+            return jsonify({'error': str(e)}), e.status
+        cover.place()
+        cover_filename = cover.path
+        cover_thumbnails.prerender(cover_filename)
+
+    # Form fields win over tags read from the file
+    def field(name, default):
+        return request.form.get(name, '').strip() or metadata[name] or default
+
+    # Get or create artist
+    artist_name = field('artist', 'Unknown Artist')
+    artist = Artist.query.filter_by(name=artist_name).first()
+    if not artist:
+        artist = Artist(name=artist_name)
+        db.session.add(artist)
+        db.session.flush()
+
+    # Get or create album
+    album_title = field('album', 'Singles')
+    album = Album.query.filter_by(title=album_title, artist_id=artist.id).first()
+    if not album:
+        album = Album(
+            title=album_title,
             artist_id=artist.id,
-            album_id=album.id if album else None,
-            duration=int(request.form.get('duration', 0)),
-            file_path=audio_filename
+            cover_image=cover_filename,
+            genre=field('genre', 'Unknown')
         )
+        db.session.add(album)
+        db.session.flush()
+
+    song = Song(
+        title=field('title', 'Untitled'),
+        artist_id=artist.id,
+        album_id=album.id,
+        duration=metadata['duration'],
+        bitrate=metadata['bitrate'],
+        file_path=stored.path
+    )
+    db.session.add(song)
+    # The reference takes the write lock, so the file is placed before a delete of the
+    # same content can clean it up, or after that cleanup has run
+    add_reference(stored)
+    stored.place()
+    db.session.commit()
 
-        db.session.add(song)
-        db.session.commit()
-
-        return jsonify({'success': True, 'song_id': song.id})
-
-    return jsonify({'error': 'Invalid file type'}), 400
+    return jsonify({'success': True, 'song_id': song.id, 'duration': song.duration, 'bitrate': song.bitrate})
 
 
 @app.route('/api/stats')
+@http_cache.cached(LIBRARY, PLAYS)
+@query_budget(1)
 def get_stats():
-    total_songs = Song.query.count()
-    total_artists = Artist.query.count()
-    total_albums = Album.query.count()
-    total_plays = db.session.query(db.func.sum(Song.plays)).scalar() or 0
+    return jsonify(library_counters.read())
 
-    return jsonify({
-        'songs': total_songs,
-        'artists': total_artists,
-        'albums': total_albums,
-        'plays': total_plays
-    })
+
+@app.route('/api/plays/stats')
+def get_play_counter_stats():
+    """Play counter flush latency and backlog"""
+    return jsonify(play_counter.stats())
 
 
 @app.route('/api/playlists')
+@query_budget(3)
 @login_required
 def get_playlists():
-    playlists = Playlist.query.filter_by(user_id=current_user.id).all()
-    return jsonify([{
+    """List the user's playlists, newest first.
+
+    Kept as a plain array for existing callers; when more playlists are
+    available the cursor for the next page is sent in ``X-Next-Cursor``.
+    """
+    query = db.session.query(Playlist, playlists.song_count_column()).filter(Playlist.user_id == current_user.id)
+    keys = [(Playlist.created_at, True), (Playlist.id, True)]
+    page = keyset_paginate(query, keys, request.args.get('cursor'), page_size(request.args.get('limit')))
+    response = jsonify([{
         'id': p.id,
         'name': p.name,
         'description': p.description,
-        'song_count': len(p.songs)
-    } for p in playlists])
+        'song_count': song_count
+    } for p, song_count in page.items])
+    if page.next_cursor:
+        response.headers['X-Next-Cursor'] = page.next_cursor
+    return response
 
 
 # Simple login route for testing (you'll want to expand this)
@@ -281,6 +666,106 @@ def create_admin():
             db.session.commit()
             print('Admin user created!')
 
+
+@app.cli.command("import-library")
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Files written per transaction')
+@click.option('--workers', type=int, default=None, help='Tag parsing processes (default: CPU count)')
+def import_library(directory, batch_size, workers):
+    """Import every audio file below DIRECTORY; re-runs only pick up new or changed files"""
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade()
+        importer = LibraryImporter(os.path.join(app.config['UPLOAD_FOLDER'], 'audio'), batch_size=batch_size,
+                                   workers=workers, progress=lambda stats: print(format_progress(stats)))
+        stats = importer.run(directory, ALLOWED_AUDIO)
+        print(f"Found {stats['found']} files, {stats['unchanged']} unchanged, "
+              f"{stats['imported']} imported, {stats['updated']} updated in {stats['elapsed']:.1f}s")
+        if stats['imported'] or stats['updated']:
+            # Bulk inserts skip the ORM events that maintain these
+            library_counters.reconcile()
+            search_index.rebuild()
+            with db.engine.begin() as connection:
+                bump_versions(connection, LIBRARY, PLAYS)
+
+
+@app.cli.command("build-recommendations")
+def build_recommendations():
+    """Rebuild the song similarity model used by /api/songs/recommended"""
+    with app.app_context():
+        songs = recommender.build()
+        print(f'Built recommendations for {songs} songs')
+
+
+@app.cli.command("build-assets")
+@click.option('--no-minify', is_flag=True, help='Bundle and hash without minifying')
+@click.option('--prune', is_flag=True, help='Delete files of earlier builds')
+def build_assets(no_minify, prune):
+    """Minify, hash and precompress the CSS and JavaScript bundles; restart workers afterwards"""
+    missing = missing_packages(minify=not no_minify)
+    if missing:
+        click.echo(f'Warning: {", ".join(missing)} not installed; bundles are built without them '
+                   '(pip install -r requirements.txt)', err=True)
+    with app.app_context():
+        for name, (hashed, sizes) in assets.build(minify=not no_minify, prune=prune).items():
+            compressed = ', '.join(f'{encoding} {sizes[encoding]}' for encoding in ('br', 'gzip') if encoding in sizes)
+            print(f"{name} -> {hashed}: {sizes['source']} -> {sizes['minified']} bytes"
+                  + (f' ({compressed})' if compressed else ''))
+
+
+@app.cli.command("compact-play-history")
+def compact_play_history():
+    """Delete play events past retention and beyond the per-user cap"""
+    with app.app_context():
+        removed = play_history.compact()
+        print(f'Removed {removed} play events')
+
+
+@app.cli.command("db-upgrade")
+def db_upgrade():
+    """Apply pending schema migrations"""
+    with app.app_context():
+        db.create_all()
+        applied = migrations.upgrade()
+        for version, description in applied:
+            print(f'Applied migration {version}: {description}')
+        if not applied:
+            print('Database is up to date')
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans():
+    """Fail if a hot query is not served by an index"""
+    with app.app_context():
+        problems = migrations.check_query_plans()
+        for name, plan in problems.items():
+            print(f'{name}:')
+            for line in plan:
+                print(f'    {line}')
+        if problems:
+            raise SystemExit(1)
+        print('All hot queries use indexes')
+
+
+@app.cli.command("reconcile-stats")
+@click.option('--dry-run', is_flag=True, help='Report drift without fixing it')
+def reconcile_stats(dry_run):
+    """Recompute library statistics and report drift"""
+    with app.app_context():
+        drift = library_counters.reconcile(fix=not dry_run)
+        for counter, (stored, actual) in drift.items():
+            print(f'{counter}: stored {stored}, actual {actual} ({actual - stored:+d})')
+        if not drift:
+            print('Library statistics are accurate')
+
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index():
+    """Rebuild the full-text search index"""
+    with app.app_context():
+        count = search_index.rebuild()
+        print(f'Indexed {count} rows')
+
 # Add to app.py
 @app.route('/static/default-avatar.png')
 def default_avatar():
@@ -298,91 +783,186 @@ def favorites():
     return render_template('favorites.html')
 
 
+def trending_songs():
+    urls = url_builder()
+    rows = song_query().order_by(Song.plays.desc()).limit(10)
+    return [song_json(s, urls) for s in records(SongRecord, rows)]
+
+
+def new_releases():
+    urls = url_builder()
+    rows = album_query().order_by(Album.release_date.desc()).limit(10)
+    return [album_json(a, urls) for a in records(AlbumRecord, rows)]
+
+
+def recommended_songs(user_id):
+    """Songs for ``user_id`` (popular songs for anonymous visitors)"""
+    songs = []
+    if user_id is not None:
+        # Songs that share favorites lists and playlists with the user's own
+        seeds = db.session.query(Favorite.song_id).filter(Favorite.user_id == user_id).union(
+            db.session.query(playlist_songs.c.song_id).join(Playlist, Playlist.id == playlist_songs.c.playlist_id)
+            .filter(Playlist.user_id == user_id)
+        )
+        song_ids = recommender.recommend([song_id for song_id, in seeds], limit=10)
+        if song_ids:
+            by_id = {s.id: s for s in records(SongRecord, song_query().filter(Song.id.in_(song_ids)))}
+            songs = [by_id[song_id] for song_id in song_ids if song_id in by_id]
+
+    if not songs:
+        # Cold start: top songs by the user's favorite artists, then popular songs
+        songs_query = song_query().order_by(Song.plays.desc())
+        if user_id is not None:
+            favorite_artist_ids = db.session.query(Song.artist_id) \
+                .join(Favorite, Favorite.song_id == Song.id) \
+                .filter(Favorite.user_id == user_id)
+            songs = records(SongRecord, songs_query.filter(Song.artist_id.in_(favorite_artist_ids)).limit(10))
+        if not songs:
+            songs = records(SongRecord, songs_query.limit(10))
+
+    urls = url_builder()
+    return [song_json(s, urls) for s in songs]
+
+
+def popular_artists():
+    urls = url_builder()
+    return [artist_json(a, urls) for a in records(ArtistRecord, artist_query().limit(10))]
+
+
+def recently_played(user_id, limit=20, dedupe=True):
+    if user_id is None:
+        return []
+    plays = play_history.recent(user_id)
+    if dedupe:
+        plays = dedupe_consecutive(plays)
+    plays = plays[:limit]
+
+    songs = {}
+    if plays:
+        songs = {s.id: s for s in records(SongRecord, song_query().filter(Song.id.in_({song_id for song_id, _ in plays})))}
+    urls = url_builder()
+    return [dict(song_json(songs[song_id], urls, 'sm'), played_at=played_at.isoformat())
+            for song_id, played_at in plays if song_id in songs]
+
+
 @app.route('/api/songs/trending')
+@http_cache.cached(LIBRARY, PLAYS)
+@query_budget(1)
 def get_trending_songs():
-    songs = Song.query.order_by(Song.plays.desc()).limit(10).all()
-    return jsonify([{
-        'id': s.id,
-        'title': s.title,
-        'artist': s.artist.name if s.artist else 'Unknown',
-        'cover_url': url_for('static',
-                             filename=f'uploads/covers/{s.album.cover_image}') if s.album and s.album.cover_image else url_for(
-            'static', filename='default-album.jpg')
-    } for s in songs])
+    return json_response(trending_songs())
 
 
 @app.route('/api/albums/new-releases')
+@http_cache.cached(LIBRARY, max_age=300, s_maxage=3600)
+@query_budget(1)
 def get_new_releases():
-    albums = Album.query.order_by(Album.release_date.desc()).limit(10).all()
-    return jsonify([{
-        'id': a.id,
-        'title': a.title,
-        'artist': a.artist.name if a.artist else 'Unknown',
-        'cover_url': url_for('static', filename=f'uploads/covers/{a.cover_image}') if a.cover_image else url_for(
-            'static', filename='default-album.jpg')
-    } for a in albums])
+    return json_response(new_releases())
 
 
 @app.route('/api/songs/recommended')
+@query_budget(5)
 @login_required
 def get_recommended_songs():
-    # Simple recommendation based on user's favorites
-    favorites = Favorite.query.filter_by(user_id=current_user.id).all()
-    favorite_artist_ids = [f.song.artist_id for f in favorites if f.song and f.song.artist]
-
-    if favorite_artist_ids:
-        # Get songs from favorite artists
-        songs = Song.query.filter(Song.artist_id.in_(favorite_artist_ids)).order_by(Song.plays.desc()).limit(10).all()
-    else:
-        # If no favorites, return popular songs
-        songs = Song.query.order_by(Song.plays.desc()).limit(10).all()
-
-    return jsonify([{
-        'id': s.id,
-        'title': s.title,
-        'artist': s.artist.name if s.artist else 'Unknown',
-        'cover_url': url_for('static',
-                             filename=f'uploads/covers/{s.album.cover_image}') if s.album and s.album.cover_image else url_for(
-            'static', filename='default-album.jpg')
-    } for s in songs])
+    return json_response(recommended_songs(current_user.id))
 
 
 @app.route('/api/artists/popular')
+@http_cache.cached(LIBRARY)
+@query_budget(1)
 def get_popular_artists():
-    artists = Artist.query.limit(10).all()
-    return jsonify([{
-        'id': a.id,
-        'name': a.name,
-        'image_url': url_for('static', filename=f'uploads/covers/{a.image}') if a.image else url_for('static',
-                                                                                                     filename='default-artist.jpg'),
-        'songs_count': len(a.songs)
-    } for a in artists])
+    return json_response(popular_artists())
 
 
 @app.route('/api/user/recently-played')
+@query_budget(3)
 @login_required
 def get_recently_played():
-    # This would need a RecentPlay model - for now return empty list
-    return jsonify([])
+    limit = min(page_size(request.args.get('limit'), default=20), 200)
+    return json_response(recently_played(current_user.id, limit, request.args.get('dedupe', '1') != '0'))
+
+
+# Sections of /api/discover; each takes the user id (None when logged out)
+DISCOVER_SECTIONS = {
+    'trending': lambda user_id: trending_songs(),
+    'new_releases': lambda user_id: new_releases(),
+    'recommended': recommended_songs,
+    'popular_artists': lambda user_id: popular_artists(),
+    'recently_played': recently_played,
+}
+# Sections fetched from Deezer; only computed when asked for by name
+DISCOVER_REMOTE_SECTIONS = {
+    'deezer_trending': lambda: music_api.get_trending(),
+}
+
+
+@app.route('/api/discover')
+@query_budget(10)
+def get_discover():
+    """Every section of the discover page in one request.
+
+    ``sections`` picks a comma-separated subset (default: all local ones).
+    Deezer sections start first on the shared thread pool and run while the
+    database sections are computed in order on this request's session,
+    which shares one user lookup. ``Server-Timing`` reports each section.
+    """
+    requested = request.args.get('sections')
+    names = requested.split(',') if requested else list(DISCOVER_SECTIONS)
+    unknown = [name for name in names if name not in DISCOVER_SECTIONS and name not in DISCOVER_REMOTE_SECTIONS]
+    if unknown:
+        return jsonify({'error': f'Unknown sections: {", ".join(unknown)}'}), 400
+
+    started = time.perf_counter()
+    timings = {}
+
+    def timed(name, func, *args):
+        section_started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = (time.perf_counter() - section_started) * 1000
+
+    remote = {name: music_api.submit(timed, name, DISCOVER_REMOTE_SECTIONS[name])
+              for name in names if name in DISCOVER_REMOTE_SECTIONS}
+    user_id = current_user.id if current_user.is_authenticated else None
+    result = {name: timed(name, DISCOVER_SECTIONS[name], user_id) for name in names if name in DISCOVER_SECTIONS}
+    for name, future in remote.items():
+        try:
+            result[name] = future.result(timeout=BATCH_TIMEOUT)
+        except Exception as e:
+            future.cancel()
+            timings.setdefault(name, BATCH_TIMEOUT * 1000)
+            result[name] = {'error': str(e) or 'Timed out'}
+
+    response = json_response(result)
+    timings['total'] = (time.perf_counter() - started) * 1000
+    response.headers['Server-Timing'] = ', '.join(f'{name};dur={ms:.1f}' for name, ms in timings.items())
+    return response
 
 
 @app.route('/api/user/favorites')
+@query_budget(3)
 @login_required
 def get_user_favorites():
-    favorites = Favorite.query.filter_by(user_id=current_user.id).order_by(Favorite.created_at.desc()).all()
-    return jsonify({
-        'favorites': [{
-            'id': f.song.id,
-            'title': f.song.title,
-            'artist': f.song.artist.name if f.song.artist else 'Unknown',
-            'duration': f.song.duration,
-            'plays': f.song.plays,
-            'cover_url': url_for('static',
-                                 filename=f'uploads/covers/{f.song.album.cover_image}') if f.song.album and f.song.album.cover_image else url_for(
-                'static', filename='default-album.jpg'),
-            'added_date': f.created_at.strftime('%Y-%m-%d')
-        } for f in favorites]
-    })
+    query = song_query(Favorite.created_at).join(Favorite, Favorite.song_id == Song.id) \
+        .filter(Favorite.user_id == current_user.id)
+    cursor = request.args.get('cursor')
+    page = keyset_paginate(query, sort_keys(FAVORITE_SORTS, 'recent'), cursor, page_size(request.args.get('limit')))
+
+    totals = {}
+    if not cursor:
+        # Summary figures for the whole collection, sent with the first page only
+        count, duration = db.session.query(db.func.count(Favorite.id), db.func.coalesce(db.func.sum(Song.duration), 0)) \
+            .join(Song, Favorite.song_id == Song.id).filter(Favorite.user_id == current_user.id).one()
+        totals = {'total': count, 'total_duration': duration}
+
+    urls = url_builder()
+    favorites = []
+    for row in page.items:
+        song = SongRecord._make(row[:-1])
+        favorites.append(dict(song_json(song, urls), plays=song.plays,
+                              thumbnail_url=urls.cover(song.cover_image, 'sm'),
+                              added_date=row[-1].strftime('%Y-%m-%d')))
+    return json_response({**totals, 'next_cursor': page.next_cursor, 'favorites': favorites})
 
 
 @app.route('/api/song/<int:song_id>/stream')
@@ -393,7 +973,14 @@ def stream_song(song_id):
     if not os.path.exists(audio_path):
         return jsonify({'error': 'Audio file not found'}), 404
 
-    return send_file(audio_path, mimetype='audio/mpeg')
+    # Seeking and resumed downloads send further ranged requests for the same play
+    if request.range is None or request.range.ranges[0][0] == 0:
+        if current_user.is_authenticated:
+            record_play(song.id)
+
+    return send_audio(audio_path,
+                      offload=app.config['AUDIO_OFFLOAD'],
+                      accel_path=app.config['AUDIO_ACCEL_PREFIX'] + song.file_path)
 
 
 from flask import flash
@@ -444,15 +1031,40 @@ def register():
 
 @app.route('/playlist/<int:playlist_id>')
 def view_playlist(playlist_id):
-    playlist = Playlist.query.get_or_404(playlist_id)
-    return render_template('playlist.html', playlist=playlist)
+    return render_playlist(playlist_id)
 
 
 # View a single playlist
 @app.route('/playlist/<int:playlist_id>')
 def playlist(playlist_id):
+    return render_playlist(playlist_id)
+
+
+def render_playlist(playlist_id):
     playlist = Playlist.query.get_or_404(playlist_id)
-    return render_template('playlist.html', playlist=playlist)
+    songs = playlist_songs_page(playlist_id)
+    return render_template('playlist.html', playlist=playlist, songs=songs.items,
+                           song_count=playlists.song_count(playlist_id), next_cursor=songs.next_cursor)
+
+
+@app.route('/api/playlist/<int:playlist_id>/songs')
+@query_budget(2)
+def get_playlist_songs(playlist_id):
+    Playlist.query.get_or_404(playlist_id)
+    page = playlist_songs_page(playlist_id, request.args.get('cursor'), request.args.get('limit'), song_query())
+    urls = url_builder()
+    return json_response({
+        'songs': [song_json(s, urls, 'sm') for s in records(SongRecord, page.items)],
+        'next_cursor': page.next_cursor
+    })
+
+
+@app.route('/api/playlist/<int:playlist_id>/song-ids')
+@query_budget(2)
+def get_playlist_song_ids(playlist_id):
+    """Every song id of the playlist in order, for Play all and Shuffle"""
+    Playlist.query.get_or_404(playlist_id)
+    return jsonify({'song_ids': playlists.song_ids(playlist_id)})
 
 # Remove song from playlist
 @app.route('/playlist/<int:playlist_id>/remove-song', methods=['POST'])
@@ -463,9 +1075,7 @@ def remove_from_playlist(playlist_id):
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
     data = request.get_json()
-    song = Song.query.get(data['song_id'])
-    if song in playlist.songs:
-        playlist.songs.remove(song)
+    if playlists.remove_songs(playlist_id, [data['song_id']]):
         db.session.commit()
 
     return jsonify({'success': True})
@@ -495,6 +1105,8 @@ def delete_playlist(playlist_id):
     if playlist.user_id != current_user.id:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
+    # Without loading the songs collection to find the rows to delete
+    playlists.clear(playlist_id)
     db.session.delete(playlist)
     db.session.commit()
 
@@ -502,7 +1114,23 @@ def delete_playlist(playlist_id):
 
 
 # Initialize the simple music API service
-music_api = MusicAPIService()
+if app.config['DEEZER_CACHE_PATH']:
+    deezer_cache_backend = SQLiteBackend(app.config['DEEZER_CACHE_PATH'])
+else:
+    deezer_cache_backend = MemoryBackend()
+if app.config['DEEZER_BACKEND'] == 'async':
+    deezer_client = AsyncDeezerClient(app.config['DEEZER_API_URL'], concurrency=app.config['DEEZER_CONCURRENCY'],
+                                      timeout=app.config['DEEZER_TIMEOUT'], retries=app.config['DEEZER_RETRIES'])
+else:
+    deezer_client = None
+music_api = MusicAPIService(client=deezer_client, cache=ResponseCache(deezer_cache_backend, ttls=CACHE_TTLS),
+                            observer=metrics.observe_deezer)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, SQL and Deezer metrics in the Prometheus text format"""
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/api/music/search')
@@ -531,6 +1159,22 @@ def get_track_info(track_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/music/tracks')
+def get_tracks_info():
+    """Get details for several tracks in one round-trip"""
+    try:
+        track_ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+
+    if not track_ids:
+        return jsonify({'error': 'No track ids'}), 400
+    if len(set(track_ids)) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} track ids per request'}), 400
+
+    return jsonify(music_api.get_tracks(track_ids))
+
+
 @app.route('/api/music/trending')
 def get_trending_music():
     """Get trending tracks"""
@@ -541,6 +1185,20 @@ def get_trending_music():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/music/cache/stats')
+def get_music_cache_stats():
+    """Deezer response cache hit/miss counters"""
+    return jsonify(music_api.cache.stats())
+
+
+@app.route('/api/music/client/stats')
+def get_music_client_stats():
+    """Upstream, coalesced and retried Deezer requests of the async backend"""
+    if not hasattr(music_api.client, 'stats'):
+        return jsonify({'backend': 'sync'})
+    return jsonify(dict(music_api.client.stats(), backend='async'))
+
+
 @app.route('/api/music/artist/<int:artist_id>/top')
 def get_artist_top(artist_id):
     """Get artist's top tracks"""
@@ -553,4 +1211,5 @@ def get_artist_top(artist_id):
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        migrations.upgrade()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from flask import url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+# Bundle name -> files under the static folder, concatenated in order.
+# Page scripts are separate bundles so each page only loads its own.
+BUNDLES = {
+    'css/style.css': ('css/style.css',),
+    'js/app.js': ('js/main.js', 'js/sidebar.js'),
+    'js/pages/index.js': ('js/pages/index.js',),
+    'js/pages/library.js': ('js/pages/library.js',),
+    'js/pages/playlist.js': ('js/pages/playlist.js',),
+    'js/pages/player.js': ('js/pages/player.js',),
+    'js/pages/favorites.js': ('js/pages/favorites.js',),
+    'js/pages/discover.js': ('js/pages/discover.js',),
+}
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+# Precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+DIGEST_LENGTH = 12
+MANIFEST = 'manifest.json'
+
+
+class Assets:
+    """Minified, content-hashed and precompressed CSS and JavaScript bundles.
+
+    ``flask build-assets`` writes each bundle of BUNDLES to ``ASSETS_FOLDER``
+    as ``<name>.<digest>.<ext>``, minified if the ``rjsmin`` and ``rcssmin``
+    packages are installed, with ``.gz`` (and, if the ``brotli`` package
+    is installed, ``.br``) variants, and records the hashed names in a
+    manifest. ``asset_url`` in templates links the hashed name, which is
+    served with ``Cache-Control: immutable``; workers read the manifest at
+    start-up, so restart them after a build.
+
+    Without a build, ``asset_url`` links the plain bundle name and the
+    bundle is concatenated from source on every request, uncached, so
+    edits show up on reload in development.
+    """
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.folder = None
+        self.manifest = {}
+        self._built = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_FOLDER', os.path.join(app.static_folder, 'dist'))
+        self.static_folder = app.static_folder
+        self.folder = app.config['ASSETS_FOLDER']
+        self.load()
+        app.extensions['assets'] = self
+        app.add_template_global(self.url, 'asset_url')
+
+    def load(self):
+        try:
+            with open(os.path.join(self.folder, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        self._built = set(self.manifest.values())
+
+    def url(self, name):
+        """URL of bundle ``name``, hashed once it has been built"""
+        return url_for('asset', filename=self.manifest.get(name, name))
+
+    def locate(self, filename, accept_encodings):
+        """``(path, encoding)`` of the best variant of a built file the client accepts, or None if not built"""
+        if filename not in self._built:
+            return None
+        path = os.path.join(self.folder, filename)
+        for encoding, suffix in ENCODINGS:
+            if accept_encodings[encoding] and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
+
+    def source(self, name):
+        """Unminified bundle ``name`` read from source, or None if there is no such bundle"""
+        if name not in BUNDLES:
+            return None
+        return concatenate(self.static_folder, BUNDLES[name])
+
+    def build(self, minify=True, prune=False):
+        """Write every bundle and the manifest; returns ``{name: (hashed name, sizes)}``.
+
+        ``sizes`` maps ``source``, ``minified`` and each written encoding to
+        a byte count. Files of earlier builds are kept for workers still
+        serving the old manifest unless ``prune`` is set.
+        """
+        manifest, results = {}, {}
+        for name, files in BUNDLES.items():
+            source = concatenate(self.static_folder, files)
+            data = (minify_css(source) if name.endswith('.css') else minify_js(source)) if minify else source
+            data = data.encode('utf-8')
+            root, ext = os.path.splitext(name)
+            hashed = f'{root}.{hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]}{ext}'
+            sizes = {'source': len(source.encode('utf-8')), 'minified': len(data)}
+            path = os.path.join(self.folder, hashed)
+            _write(path, data)
+            for encoding, suffix in ENCODINGS:
+                compressed = compress(data, encoding)
+                # Small files can come out larger; the client then gets the identity file
+                if compressed is not None and len(compressed) < len(data):
+                    _write(path + suffix, compressed)
+                    sizes[encoding] = len(compressed)
+            manifest[name] = hashed
+            results[name] = (hashed, sizes)
+
+        _write(os.path.join(self.folder, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+        if prune:
+            keep = {MANIFEST} | {hashed + suffix for hashed in manifest.values() for suffix in ('', '.gz', '.br')}
+            for directory, _, names in os.walk(self.folder):
+                for filename in names:
+                    path = os.path.join(directory, filename)
+                    if os.path.relpath(path, self.folder).replace(os.sep, '/') not in keep:
+                        os.remove(path)
+        self.manifest = manifest
+        self._built = set(manifest.values())
+        return results
+
+
+def mimetype(filename):
+    return MIMETYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+
+
+def concatenate(static_folder, files):
+    parts = []
+    for name in files:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            parts.append(f.read())
+    # Every file of a JS bundle ends its last statement, as separate <script> tags would
+    return '\n;\n'.join(parts) if files[0].endswith('.js') and len(files) > 1 else '\n'.join(parts)
+
+
+def compress(data, encoding):
+    """``data`` compressed at the highest level, or None if the encoding is unavailable"""
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output, and so the ETag, the same across builds
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.build-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def missing_packages(minify=True):
+    """Names of the packages a build would use but cannot import"""
+    packages = [('brotli', brotli)]
+    if minify:
+        packages += [('rjsmin', rjsmin), ('rcssmin', rcssmin)]
+    return [name for name, module in packages if module is None]
+
+
+def minify_js(source):
+    """``source`` minified with ``rjsmin``, or unchanged when it is not installed"""
+    return rjsmin.jsmin(source) if rjsmin is not None else source
+
+
+def minify_css(source):
+    """``source`` minified with ``rcssmin``, or unchanged when it is not installed"""
+    return rcssmin.cssmin(source) if rcssmin is not None else source
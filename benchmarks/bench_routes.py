@@ -0,0 +1,221 @@
+"""Latency, throughput and query counts of the hot routes.
+
+Seeds a scratch database with a synthetic library, swaps the Deezer client
+for a local fake with injected latency, then drives each route through the
+Flask test client: first one request at a time, then from ``--concurrency``
+threads for ``--duration`` seconds. Results are JSON so runs can be diffed:
+
+    python benchmarks/bench_routes.py --output before.json
+    python benchmarks/bench_routes.py --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from synthetic import PASSWORD, WORDS, FakeDeezerClient, scratch_database, seed_library, write_audio
+
+SCRATCH = scratch_database()
+
+import app as sonance  # noqa: E402
+from models import db  # noqa: E402
+from query_budget import QueryCounter  # noqa: E402
+import migrations  # noqa: E402
+
+# Each route builds its next URL from a random generator and the library size
+ROUTES = {
+    'search': lambda rng, songs: f'/search?q={rng.choice(WORDS)}',
+    'stats': lambda rng, songs: '/api/stats',
+    'player': lambda rng, songs: f'/player/{rng.randint(1, songs)}',
+    'stream': lambda rng, songs: f'/api/song/{rng.randint(1, songs)}/stream',
+    'favorites': lambda rng, songs: '/api/user/favorites',
+    # A small pool of queries, so the Deezer response cache sees hits and misses
+    'music_search': lambda rng, songs: f'/api/music/search?q={rng.choice(WORDS)}+{rng.randint(0, 9)}',
+}
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(latencies, queries, errors, elapsed):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'queries': {'mean': round(statistics.fmean(queries), 2), 'max': max(queries)},
+    }
+
+
+class Worker:
+    """A logged-in test client that records the cost of each request it makes"""
+
+    def __init__(self, user_number, songs, seed):
+        self.client = sonance.app.test_client()
+        self.client.post('/login', data={'username': f'user{user_number}', 'password': PASSWORD})
+        self.songs = songs
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+    def request(self, route):
+        url = ROUTES[route](self.rng, self.songs)
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            response = self.client.get(url)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+        response.close()
+        if response.status_code >= 400:
+            self.errors += 1
+        self.latencies.append(elapsed * 1000)
+        self.queries.append(counter.count)
+
+
+def run_sequential(route, requests, warmup, songs):
+    worker = Worker(0, songs, seed=1)
+    for _ in range(warmup):
+        worker.request(route)
+    worker.latencies, worker.queries, worker.errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        worker.request(route)
+    return summarize(worker.latencies, worker.queries, worker.errors, time.perf_counter() - started)
+
+
+def run_concurrent(route, concurrency, duration, songs):
+    workers = [Worker(i % 50, songs, seed=100 + i) for i in range(concurrency)]
+    deadline = time.perf_counter() + duration
+    start = threading.Barrier(concurrency + 1)
+
+    def loop(worker):
+        start.wait()
+        while time.perf_counter() < deadline:
+            worker.request(route)
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize([ms for w in workers for ms in w.latencies], [n for w in workers for n in w.queries],
+                     sum(w.errors for w in workers), elapsed)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print p95 latency and throughput against an earlier run"""
+    print(f'{"route":<14}{"phase":<12}{"p95 ms":>20}{"req/s":>22}', file=sys.stderr)
+    for route, phases in results['routes'].items():
+        for phase, current in phases.items():
+            before = baseline.get('routes', {}).get(route, {}).get(phase)
+            if not before or not current.get('requests') or not before.get('requests'):
+                continue
+            p95, old_p95 = current['latency_ms']['p95'], before['latency_ms']['p95']
+            rps, old_rps = current['throughput_rps'], before['throughput_rps']
+            print(f'{route:<14}{phase:<12}{old_p95:>9.2f} -> {p95:<9.2f}{old_rps:>10.1f} -> {rps:<9.1f}',
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--songs', type=int, default=100000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--albums', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--favorites', type=int, default=200, help='favorites per user')
+    parser.add_argument('--playlists', type=int, default=5, help='playlists per user')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated routes to run')
+    parser.add_argument('--requests', type=int, default=200, help='sequential requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests before each route')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads for the concurrent phase; 0 skips it')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of concurrent load per route')
+    parser.add_argument('--deezer-latency', type=float, default=0.08, help='seconds per fake Deezer call')
+    parser.add_argument('--deezer-jitter', type=float, default=0.04, help='extra random seconds per call')
+    parser.add_argument('--output', help='write results to this file instead of stdout')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    args = parser.parse_args()
+    routes = args.routes.split(',')
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f'unknown routes: {", ".join(sorted(unknown))}')
+
+    app = sonance.app
+    app.config['UPLOAD_FOLDER'] = os.path.join(SCRATCH, 'uploads')
+    app.config['AUDIO_OFFLOAD'] = None
+    write_audio(app.config['UPLOAD_FOLDER'])
+    sonance.music_api.client = FakeDeezerClient(args.deezer_latency, args.deezer_jitter)
+
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade()
+        with db.engine.begin() as connection:
+            seed_library(connection, users=args.users, artists=args.artists, albums=args.albums, songs=args.songs,
+                         favorites_per_user=args.favorites, playlists_per_user=args.playlists)
+        sonance.library_counters.reconcile()
+        sonance.search_index.rebuild()
+    print(f'Seeded {args.songs} songs in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        },
+        'routes': {},
+    }
+    for route in routes:
+        print(f'Running {route}', file=sys.stderr)
+        phases = {'sequential': run_sequential(route, args.requests, args.warmup, args.songs)}
+        if args.concurrency:
+            phases['concurrent'] = run_concurrent(route, args.concurrency, args.duration, args.songs)
+        results['routes'][route] = phases
+    results['meta']['deezer_calls'] = sonance.music_api.client.calls
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Per-row cost of serializing songs: ORM objects vs. column projections.
+
+Seeds a scratch SQLite database and times building a JSON response for
+10, 1k and 100k songs both ways:
+
+    python benchmarks/bench_serializers.py [--rows 10,1000,100000] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import time
+
+from synthetic import scratch_database
+
+scratch_database()
+
+from flask import jsonify  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import app, cover_url  # noqa: E402
+from models import db, Song, Artist, Album  # noqa: E402
+from serializers import SongRecord, song_query, records, url_builder, json_response, song_json  # noqa: E402
+
+
+def seed(songs):
+    artists = max(1, songs // 50)
+    albums = max(1, songs // 10)
+    with db.engine.begin() as connection:
+        connection.execute(Artist.__table__.insert(), [{'name': f'Artist {i}'} for i in range(artists)])
+        connection.execute(Album.__table__.insert(), [
+            {'title': f'Album {i}', 'artist_id': i % artists + 1, 'cover_image': f'cover-{i % 500}.jpg'}
+            for i in range(albums)
+        ])
+        connection.execute(Song.__table__.insert(), [
+            {'title': f'Song {i}', 'artist_id': i % artists + 1, 'album_id': i % albums + 1,
+             'file_path': f'{i}.mp3', 'duration': 180 + i % 120, 'plays': i % 1000}
+            for i in range(songs)
+        ])
+
+
+def orm_response(limit):
+    songs = Song.query.options(joinedload(Song.artist), joinedload(Song.album)).limit(limit).all()
+    return jsonify([{
+        'id': s.id,
+        'title': s.title,
+        'artist': s.artist.name if s.artist else 'Unknown',
+        'album': s.album.title if s.album else 'Single',
+        'duration': s.duration,
+        'cover_url': cover_url(s.album.cover_image if s.album else None)
+    } for s in songs])
+
+
+def projection_response(limit):
+    urls = url_builder()
+    return json_response([song_json(s, urls) for s in records(SongRecord, song_query().limit(limit))])
+
+
+def measure(build, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        with app.test_request_context('/'):
+            started = time.perf_counter()
+            response = build(rows)
+            elapsed = time.perf_counter() - started
+            db.session.remove()
+        best = elapsed if best is None else min(best, elapsed)
+    return {'total_ms': round(best * 1000, 3), 'us_per_row': round(best * 1e6 / rows, 3),
+            'bytes': len(response.get_data())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10,1000,100000', help='comma-separated row counts')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement; the best is kept')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.rows.split(',')]
+
+    with app.app_context():
+        db.create_all()
+        seed(max(sizes))
+
+    results = []
+    for rows in sizes:
+        results.append({
+            'rows': rows,
+            'orm': measure(orm_response, rows, args.repeat),
+            'projection': measure(projection_response, rows, args.repeat),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"rows":>8}  {"orm us/row":>11}  {"projection us/row":>18}  {"speedup":>7}')
+    for result in results:
+        orm, projection = result['orm']['us_per_row'], result['projection']['us_per_row']
+        print(f'{result["rows"]:>8}  {orm:>11.2f}  {projection:>18.2f}  {orm / projection:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
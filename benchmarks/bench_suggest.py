@@ -0,0 +1,133 @@
+"""Memory footprint and latency of the /api/suggest index at 1M titles.
+
+Builds a suggest.Snapshot from synthetic song, album and artist names
+(a Zipf-distributed vocabulary, so common words have long postings),
+then times queries by shape: short prefixes, longer prefixes, several
+words, misspellings and misses. Memory is what tracemalloc sees the
+snapshot holding once the source rows are gone:
+
+    python benchmarks/bench_suggest.py [--titles 1000000] [--vocabulary 50000] [--queries 2000]
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggest import Snapshot, words  # noqa: E402
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ra', 'so', 'tu', 'vi', 'zen', 'dor', 'bel', 'fa', 'gri', 'hu', 'jo',
+             'ly', 'mar', 'nok', 'pe', 'qui', 'ri', 'sta', 'tor', 'ul', 'wen', 'xa', 'yo', 'zu')
+
+
+def vocabulary(size, rng):
+    result = set()
+    while len(result) < size:
+        result.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(result)
+
+
+def library(titles, vocabulary_size, seed):
+    """Synthetic (songs, artists, albums) rows with one artist per 50 and one album per 10 titles"""
+    rng = random.Random(seed)
+    vocab = vocabulary(vocabulary_size, rng)
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, len(vocab) + 1)))
+
+    def name(low, high):
+        return ' '.join(rng.choices(vocab, cum_weights=cumulative, k=rng.randint(low, high))).title()
+
+    artists = max(1, titles // 50)
+    albums = max(1, titles // 10)
+    songs = titles - artists - albums
+    artist_rows = [(i, name(1, 2), rng.randint(0, 100000)) for i in range(1, artists + 1)]
+    album_rows = [(i, name(1, 3), rng.randint(1, artists), rng.randint(0, 20000)) for i in range(1, albums + 1)]
+    song_rows = [(i, name(1, 4), rng.randint(1, artists), int(rng.paretovariate(1.2))) for i in range(1, songs + 1)]
+    return song_rows, artist_rows, album_rows
+
+
+def typo(word, rng):
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice('aeiouxz') + word[position + 1:]
+
+
+def queries(rows, count, rng):
+    """``count`` queries of each shape, taken from real names"""
+    names = [words(row[1]) for row in rng.sample(rows, min(len(rows), count * 4))]
+    names = [n for n in names if n and len(n[0]) >= 2]
+    long_names = [n for n in names if len(n) >= 2] or names
+    long_words = [w for n in names for w in n if len(w) >= 6] or ['kalomi']
+    return {
+        'prefix 1-2 chars': [n[0][:rng.randint(1, 2)] for n in rng.choices(names, k=count)],
+        'prefix 3-5 chars': [n[0][:rng.randint(3, 5)] for n in rng.choices(names, k=count)],
+        'full word': [n[0] + ' ' for n in rng.choices(names, k=count)],
+        'two words': [f'{n[0]} {n[1][:3]}' for n in rng.choices(long_names, k=count)],
+        'misspelt word': [typo(w, rng) + ' ' for w in rng.choices(long_words, k=count)],
+        'no match': [''.join(rng.choices('qxjv', k=6)) for _ in range(count)],
+    }
+
+
+def percentiles(values):
+    quantiles = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50_us': round(quantiles[49], 1), 'p95_us': round(quantiles[94], 1),
+            'p99_us': round(quantiles[98], 1), 'max_us': round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=1000000)
+    parser.add_argument('--vocabulary', type=int, default=50000, help='distinct words in names')
+    parser.add_argument('--queries', type=int, default=2000, help='queries per shape')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Traced from the start, so the name strings the snapshot keeps are counted
+    tracemalloc.start()
+    songs, artists, albums = library(args.titles, args.vocabulary, args.seed)
+    text_bytes = sum(len(row[1].encode()) for rows in (songs, artists, albums) for row in rows)
+    rng = random.Random(args.seed)
+    sample = queries(songs, args.queries, rng)
+    gc.collect()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    snapshot = Snapshot.build(songs, artists, albums)
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    del songs, artists, albums
+    gc.collect()
+    # What is still allocated is the snapshot, with the names it kept, and the sample queries
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = {}
+    for shape, texts in sample.items():
+        timings, hits = [], 0
+        for query in texts:
+            begin = time.perf_counter()
+            hits += bool(snapshot.search(query, args.limit))
+            timings.append((time.perf_counter() - begin) * 1e6)
+        latencies[shape] = dict(percentiles(timings), hit_rate=round(hits / len(texts), 3))
+
+    print(json.dumps({
+        'config': vars(args),
+        'index': snapshot.stats(),
+        'build_seconds': round(build_seconds, 2),
+        'memory_mb': round(memory / 2 ** 20, 1),
+        'memory_bytes_per_title': round(memory / len(snapshot)),
+        'build_peak_mb': round((peak - before) / 2 ** 20, 1),
+        'name_text_mb': round(text_bytes / 2 ** 20, 1),
+        'latency': latencies,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
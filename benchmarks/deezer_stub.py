@@ -0,0 +1,134 @@
+"""Local stand-in for the Deezer HTTP API, and a coalescing benchmark.
+
+``serve()`` starts a threaded HTTP server answering /search, /track/<id>,
+/artist/<id> and /artist/<id>/top with Deezer-shaped JSON after an
+injected delay, failing a fraction of requests (and the next
+``server.fail_next`` ones) with 503. Run directly to fire concurrent
+identical searches at the sync and async backends:
+
+    python benchmarks/deezer_stub.py [--callers 50] [--latency 0.2] [--failure-rate 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deezer_async import AsyncDeezerClient  # noqa: E402
+from music_api import MusicAPIService  # noqa: E402
+
+
+def _track(track_id, title):
+    return {
+        'id': track_id, 'type': 'track', 'title': title, 'duration': 30 + track_id % 300,
+        'preview': f'https://example.com/{track_id}.mp3',
+        'artist': {'id': track_id % 997, 'type': 'artist', 'name': f'Artist {track_id % 997}'},
+        'album': {'id': track_id % 4999, 'type': 'album', 'title': f'Album {track_id % 4999}',
+                  'cover_small': 'https://example.com/s.jpg', 'cover_medium': 'https://example.com/m.jpg',
+                  'cover_big': 'https://example.com/b.jpg'},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            fail = server.fail_next > 0
+            server.fail_next -= fail
+        time.sleep(server.latency)
+        if fail or server.failure_rate and random.random() < server.failure_rate:
+            return self._send(503, {'error': 'unavailable'})
+
+        url = urlparse(self.path)
+        if url.path == '/search':
+            query = parse_qs(url.query).get('q', [''])[0]
+            base = sum(map(ord, query)) * 1000
+            return self._send(200, {'data': [_track(base + i, f'{query} {i}') for i in range(25)], 'total': 25})
+        match = re.fullmatch(r'/track/(\d+)', url.path)
+        if match:
+            return self._send(200, _track(int(match[1]), f'Track {match[1]}'))
+        match = re.fullmatch(r'/artist/(\d+)(/top)?', url.path)
+        if match and match[2]:
+            artist_id = int(match[1])
+            return self._send(200, {'data': [_track(artist_id * 100 + i, f'Top {i}') for i in range(5)]})
+        if match:
+            return self._send(200, {'id': int(match[1]), 'name': f'Artist {match[1]}', 'type': 'artist'})
+        self._send(200, {'error': {'type': 'DataException', 'message': 'no data', 'code': 800}})
+
+
+def serve(latency=0.1, failure_rate=0.0, port=0):
+    """Start the stub in a daemon thread; returns the server (``server.hits`` counts requests)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.latency, server.failure_rate = latency, failure_rate
+    server.hits, server.fail_next, server.lock = 0, 0, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def burst(service, callers, query):
+    """Run ``callers`` identical searches at once; returns (seconds, errors)"""
+    barrier = threading.Barrier(callers)
+
+    def call(_):
+        barrier.wait()
+        return 'error' in service.search_tracks(query)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        errors = sum(pool.map(call, range(callers)))
+    return time.perf_counter() - started, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--callers', type=int, default=50, help='concurrent identical searches')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds the stub takes per request')
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='fraction of stub requests answered 503')
+    args = parser.parse_args()
+
+    server = serve(args.latency, args.failure_rate)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    import deezer
+    sync_client = deezer.Client()
+    sync_client.base_url = base_url
+    backends = [('sync', sync_client), ('async', AsyncDeezerClient(base_url, retries=3, backoff=0.05))]
+    results = {}
+    for name, client in backends:
+        # No response cache, so every search would reach the stub without coalescing
+        service = MusicAPIService(client=client)
+        hits = server.hits
+        elapsed, errors = burst(service, args.callers, f'{name} burst')
+        results[name] = {'seconds': round(elapsed, 3), 'errors': errors, 'upstream_requests': server.hits - hits}
+        if hasattr(client, 'stats'):
+            results[name]['client'] = client.stats()
+    print(json.dumps(results, indent=2))
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
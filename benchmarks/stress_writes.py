@@ -0,0 +1,169 @@
+"""Concurrent readers and writers against one SQLite file, counting lock errors.
+
+Starts ``--processes`` worker processes (like gunicorn workers) with
+``--threads`` logged-in clients each. Every client mixes favorite toggles,
+playlist edits, plays and reads for ``--duration`` seconds. Exits non-zero
+if any request failed; ``--untuned`` runs with SQLITE_TUNING=0 to compare:
+
+    python benchmarks/stress_writes.py --processes 4 --threads 4 --duration 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from synthetic import PASSWORD, scratch_database, seed_library
+
+PLAYLISTS_PER_USER = 2
+
+# (operation, weight)
+OPERATIONS = [
+    ('toggle_favorite', 3),
+    ('add_to_playlist', 2),
+    ('remove_from_playlist', 1),
+    ('create_playlist', 1),
+    ('play', 4),
+    ('favorites', 3),
+    ('stats', 2),
+    ('library', 2),
+]
+
+
+def _request(client, operation, rng, user_id, songs):
+    song_id = rng.randint(1, songs)
+    playlist_id = (user_id - 1) * PLAYLISTS_PER_USER + 1
+    if operation == 'toggle_favorite':
+        return client.post(f'/favorite/toggle/{song_id}')
+    if operation == 'add_to_playlist':
+        return client.post(f'/playlist/{playlist_id}/add-song', json={'song_id': song_id})
+    if operation == 'remove_from_playlist':
+        return client.post(f'/playlist/{playlist_id}/remove-song', json={'song_id': song_id})
+    if operation == 'create_playlist':
+        return client.post('/playlist/create', json={'name': f'Stress {rng.random():.6f}'})
+    if operation == 'play':
+        return client.get(f'/player/{song_id}')
+    if operation == 'favorites':
+        return client.get('/api/user/favorites')
+    if operation == 'stats':
+        return client.get('/api/stats')
+    return client.get('/api/library/songs')
+
+
+def _is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message or 'busy' in message
+
+
+def run_worker(index, threads, duration, users, songs):
+    """One process worth of clients; returns raw measurements"""
+    import app as sonance
+
+    sonance.app.config['PROPAGATE_EXCEPTIONS'] = True
+    sonance.play_counter.flush_interval = 0.2
+    names, weights = zip(*OPERATIONS)
+    latencies = {name: [] for name in names}
+    errors = {'lock': 0, 'other': 0, 'samples': []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop(number):
+        user_id = (index * threads + number) % users + 1
+        rng = random.Random(index * 1000 + number)
+        client = sonance.app.test_client()
+        client.post('/login', data={'username': f'user{user_id - 1}', 'password': PASSWORD})
+        while time.perf_counter() < deadline:
+            operation = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = _request(client, operation, rng, user_id, songs)
+                failed = response.status_code >= 500
+                error = f'HTTP {response.status_code}' if failed else None
+            except Exception as e:
+                failed, error = True, e
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[operation].append(elapsed)
+                if failed:
+                    errors['lock' if _is_lock_error(error) else 'other'] += 1
+                    if len(errors['samples']) < 5:
+                        errors['samples'].append(f'{operation}: {error}')
+
+    workers = [threading.Thread(target=client_loop, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    try:
+        sonance.play_counter.flush()
+    except Exception as e:
+        errors['lock' if _is_lock_error(e) else 'other'] += 1
+        errors['samples'].append(f'final flush: {e}')
+    errors['flush_failures'] = sonance.play_counter.metrics['failures']
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='clients per process')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of load')
+    parser.add_argument('--songs', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--untuned', action='store_true', help='disable WAL, pragmas and read/write routing')
+    args = parser.parse_args()
+
+    scratch_database()
+    if args.untuned:
+        os.environ['SQLITE_TUNING'] = '0'
+
+    import app as sonance
+    from models import db
+    import migrations
+
+    with sonance.app.app_context():
+        db.create_all()
+        migrations.upgrade()
+        with db.engine.begin() as connection:
+            seed_library(connection, users=args.users, artists=max(1, args.songs // 50),
+                         albums=max(1, args.songs // 10), songs=args.songs, favorites_per_user=20,
+                         playlists_per_user=PLAYLISTS_PER_USER, songs_per_playlist=20)
+        db.engine.dispose()
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(run_worker, i, args.threads, args.duration, args.users, args.songs)
+                   for i in range(args.processes)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    for name, _ in OPERATIONS:
+        values = sorted(ms for latencies, _ in results for ms in latencies[name])
+        if len(values) > 1:
+            quantiles = statistics.quantiles(values, n=100, method='inclusive')
+            operations[name] = {'requests': len(values), 'p50_ms': round(quantiles[49], 2),
+                                'p95_ms': round(quantiles[94], 2), 'p99_ms': round(quantiles[98], 2)}
+    summary = {
+        'config': vars(args),
+        'requests': sum(op['requests'] for op in operations.values()),
+        'throughput_rps': round(sum(op['requests'] for op in operations.values()) / elapsed, 1),
+        'lock_errors': sum(errors['lock'] for _, errors in results),
+        'other_errors': sum(errors['other'] for _, errors in results),
+        'play_flush_failures': sum(errors['flush_failures'] for _, errors in results),
+        'error_samples': [sample for _, errors in results for sample in errors['samples']][:10],
+        'operations': operations,
+    }
+    print(json.dumps(summary, indent=2))
+    if summary['lock_errors'] or summary['other_errors'] or summary['play_flush_failures']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Synthetic library and fake Deezer client shared by the benchmarks.
+
+Import this before ``app`` and call ``scratch_database()`` first, so the
+app binds to a throwaway SQLite file instead of ``database.db``.
+"""
+import atexit
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from models import User, Artist, Album, Song, Playlist, Favorite, playlist_songs  # noqa: E402
+
+PASSWORD = 'benchmark'
+AUDIO_FILE = 'benchmark.mp3'
+WORDS = ('love', 'night', 'summer', 'blue', 'fire', 'dream', 'river', 'light', 'heart', 'road',
+         'city', 'rain', 'gold', 'wild', 'star', 'ocean', 'shadow', 'echo', 'home', 'time')
+GENRES = ('Rock', 'Pop', 'Jazz', 'Electronic', 'Hip-Hop', 'Classical', 'Folk', 'Metal')
+
+
+def scratch_database():
+    """Point DATABASE_URL at a temporary SQLite file; returns its directory"""
+    directory = tempfile.mkdtemp(prefix='sonance-bench-')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    return directory
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+
+
+def _chunks(rows, size=20000):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def seed_library(connection, users=50, artists=2000, albums=10000, songs=100000,
+                 favorites_per_user=200, playlists_per_user=5, songs_per_playlist=50, seed=0):
+    """Fill empty tables with a synthetic library using executemany inserts.
+
+    Users are ``user0``..``user<n-1>``, all with password ``PASSWORD``, and
+    every song points at ``AUDIO_FILE``. Play counts follow a long-tailed
+    distribution so "trending" and "popular" queries have realistic skew.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password = generate_password_hash(PASSWORD)
+
+    connection.execute(User.__table__.insert(), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password} for i in range(users)
+    ])
+    connection.execute(Artist.__table__.insert(), [{'name': f'{_title(rng)} {i}'} for i in range(artists)])
+    connection.execute(Album.__table__.insert(), [{
+        'title': _title(rng),
+        'artist_id': rng.randint(1, artists),
+        'release_date': date(2000, 1, 1) + timedelta(days=rng.randrange(9000)),
+        'cover_image': f'cover-{i % 500}.jpg',
+        'genre': rng.choice(GENRES),
+    } for i in range(albums)])
+
+    album_artists = [None] + [row[0] for row in connection.execute(
+        Album.__table__.select().with_only_columns(Album.artist_id).order_by(Album.id))]
+    for chunk in _chunks({
+        'title': _title(rng),
+        'artist_id': album_artists[album_id],
+        'album_id': album_id,
+        'duration': rng.randint(90, 420),
+        'file_path': AUDIO_FILE,
+        'plays': int(rng.paretovariate(1.2)) - 1,
+        'created_at': now - timedelta(minutes=i),
+    } for i, album_id in ((i, rng.randint(1, albums)) for i in range(songs))):
+        connection.execute(Song.__table__.insert(), chunk)
+
+    for user_id in range(1, users + 1):
+        picks = rng.sample(range(1, songs + 1), min(favorites_per_user, songs))
+        if picks:
+            connection.execute(Favorite.__table__.insert(), [
+                {'user_id': user_id, 'song_id': song_id, 'created_at': now - timedelta(hours=i)}
+                for i, song_id in enumerate(picks)
+            ])
+        for p in range(playlists_per_user):
+            playlist_id = connection.execute(Playlist.__table__.insert().values(
+                name=f'Playlist {p}', user_id=user_id)).inserted_primary_key[0]
+            picks = rng.sample(range(1, songs + 1), min(songs_per_playlist, songs))
+            if picks:
+                connection.execute(playlist_songs.insert(),
+                                   [{'playlist_id': playlist_id, 'song_id': song_id, 'position': i}
+                                    for i, song_id in enumerate(picks)])
+
+
+def write_audio(upload_folder, size=256 * 1024):
+    """Create the file every synthetic song streams from"""
+    directory = os.path.join(upload_folder, 'audio')
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, AUDIO_FILE), 'wb') as f:
+        f.write(os.urandom(size))
+
+
+class FakeDeezerClient:
+    """Stand-in for ``deezer.Client`` that answers locally after a delay.
+
+    Each call sleeps ``latency`` seconds plus up to ``jitter`` more, which
+    is what the Deezer API costs us in production without the network
+    noise. ``calls`` counts requests that reached the "API".
+    """
+
+    def __init__(self, latency=0.08, jitter=0.04, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.random() * self.jitter
+        time.sleep(delay)
+
+    @staticmethod
+    def _track(track_id, title):
+        artist = SimpleNamespace(id=track_id % 997, name=f'Artist {track_id % 997}')
+        album = SimpleNamespace(id=track_id % 4999, title=f'Album {track_id % 4999}',
+                                cover_small='https://example.com/s.jpg', cover_medium='https://example.com/m.jpg',
+                                cover_big='https://example.com/b.jpg')
+        return SimpleNamespace(id=track_id, title=title, artist=artist, album=album,
+                               preview=f'https://example.com/{track_id}.mp3', duration=30 + track_id % 300)
+
+    def search(self, query):
+        self._wait()
+        base = sum(map(ord, query)) * 1000
+        return [self._track(base + i, f'{query} {i}') for i in range(25)]
+
+    def get_track(self, track_id):
+        self._wait()
+        return self._track(track_id, f'Track {track_id}')
+
+    def get_artist(self, artist_id):
+        self._wait()
+        tracks = [self._track(artist_id * 100 + i, f'Top {i}') for i in range(10)]
+
+        def get_top():
+            self._wait()
+            return tracks
+
+        return SimpleNamespace(id=artist_id, name=f'Artist {artist_id}', get_top=get_top)
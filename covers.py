@@ -0,0 +1,204 @@
+import hashlib
+import os
+import re
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask import url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest edge in pixels of each variant. ``sm`` is for list rows
+# (48px at 2x), ``md`` for cards and ``lg`` for the player.
+SIZES = {'sm': 96, 'md': 300, 'lg': 640}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+DIGEST_LENGTH = 16
+_HASHED_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+class CoverNotFound(Exception):
+    pass
+
+
+class ThumbnailCache:
+    """Rendered cover variants on disk, evicted least recently used first.
+
+    Recency is kept in an OrderedDict and mirrored in file mtimes so the
+    order survives a restart; the directory is scanned once at start-up.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime_ns, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        """Path of a cached variant, or None"""
+        with self._lock:
+            if name not in self._entries:
+                self.metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(name)
+            self.metrics['hits'] += 1
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def put(self, name, image, fmt):
+        """Encode ``image`` as ``fmt`` into the cache and return its path"""
+        pil_format, _, options = FORMATS[fmt]
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.render-')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                image.save(temp, pil_format, **options)
+            os.replace(temp_path, self.path(name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        size = os.path.getsize(self.path(name))
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+        return self.path(name)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.metrics['evictions'] += 1
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+
+class CoverThumbnails:
+    """Resized cover variants addressed by a digest of the source image.
+
+    Covers stored by ``uploads.receive_image`` are named after their SHA-256,
+    so the digest is part of the filename; older covers are hashed once per
+    process and remembered until their mtime changes. Because the digest is
+    in the URL, responses can be cached forever by browsers and proxies.
+    """
+
+    def __init__(self, app=None):
+        self.source_folder = None
+        self.cache = None
+        self._digests = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COVER_CACHE_FOLDER', os.path.join(app.instance_path, 'covers'))
+        app.config.setdefault('COVER_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        self.source_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'covers')
+        self.cache = ThumbnailCache(app.config['COVER_CACHE_FOLDER'], app.config['COVER_CACHE_MAX_BYTES'])
+        app.extensions['cover_thumbnails'] = self
+        app.add_template_global(self.url, 'cover_url')
+
+    def digest(self, filename):
+        """Short content digest of a source cover, or None if it is not a file"""
+        if _HASHED_NAME.match(filename):
+            return filename[:DIGEST_LENGTH]
+        path = os.path.join(self.source_folder, filename)
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        # '..' and '.' pass the route's basename check and name directories
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        mtime = st.st_mtime_ns
+        cached = self._digests.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()[:DIGEST_LENGTH]
+        self._digests[filename] = (mtime, digest)
+        return digest
+
+    def url(self, filename, size='md'):
+        """Immutable URL of ``filename`` resized to ``size``.
+
+        Falls back to the plain static URL when the source is missing, as
+        for the default artwork.
+        """
+        filename = filename or 'default-album.jpg'
+        digest = self.digest(filename)
+        if digest is None:
+            return url_for('static', filename=f'uploads/covers/{filename}')
+        return url_for('cover_thumbnail', size=size, digest=digest, filename=filename)
+
+    def render(self, filename, size, fmt):
+        """Path of ``filename`` resized to ``size`` in ``fmt``, rendering it if not cached"""
+        name = f'{self.digest(filename)}-{size}.{fmt}'
+        path = self.cache.get(name)
+        if path is not None:
+            return path
+        return self._render_variants(filename, [size], fmt)[size]
+
+    def prerender(self, filename):
+        """Render every size and format of a freshly uploaded cover"""
+        for fmt in FORMATS:
+            self._render_variants(filename, list(SIZES), fmt)
+
+    def _render_variants(self, filename, sizes, fmt):
+        digest = self.digest(filename)
+        if digest is None:
+            raise CoverNotFound(filename)
+        try:
+            with Image.open(os.path.join(self.source_folder, filename)) as source:
+                source = ImageOps.exif_transpose(source)
+                source = source.convert('RGB')
+        except (UnidentifiedImageError, OSError) as e:
+            raise CoverNotFound(filename) from e
+
+        paths = {}
+        # Largest first so each variant is downscaled from the previous one
+        for size in sorted(sizes, key=SIZES.get, reverse=True):
+            source.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+            paths[size] = self.cache.put(f'{digest}-{size}.{fmt}', source, fmt)
+        return paths
+
+
+def negotiate_format(accept_mimetypes):
+    return 'webp' if accept_mimetypes.quality('image/webp') > 0 else 'jpg'
@@ -0,0 +1,165 @@
+import logging
+import threading
+
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+READER = 'reader'
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+_READ_PREFIXES = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of GET requests to the ``reader`` bind.
+
+    Flushes, everything after the first flush, and all work outside a
+    request (CLI commands, background threads) use the default engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing:
+            self.info['writer'] = True
+        elif (bind is None and not self.info.get('writer') and READER in self._db.engines
+              and has_request_context() and request.method in READ_METHODS):
+            return self._db.engines[READER]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class WriteLock:
+    """Serializes the writes of a process across threads.
+
+    Re-entrant per thread: a second writer connection of the thread that
+    holds the lock (``db.engine.begin()`` inside a request whose session has
+    already flushed) does not wait for it, and SQLite's busy timeout
+    decides instead. It is held until every connection of that thread has
+    released it; a release may come from another thread.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._owner = None
+        self._count = 0
+
+    def acquire(self, timeout=None):
+        thread = threading.get_ident()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._owner in (None, thread), timeout):
+                return False
+            self._owner = thread
+            self._count += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            if not self._count:
+                raise RuntimeError('release of an unlocked WriteLock')
+            self._count -= 1
+            if not self._count:
+                self._owner = None
+                self._condition.notify()
+
+
+def _is_sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+class Database:
+    """Engine configuration for concurrent workers; initializes ``db`` with ``app``.
+
+    For a SQLite file, the default engine becomes the writer. It uses WAL
+    journaling, ``synchronous=NORMAL``, a busy timeout and ``BEGIN
+    IMMEDIATE`` transactions, so a writer waits its turn instead of
+    failing when it upgrades a read lock. A WriteLock serializes the
+    writes of one process, so its threads queue instead of polling
+    SQLite's busy handler. Reads in GET requests go to a pooled read-only
+    ``reader`` bind on the same file; under WAL they never wait for writers.
+
+    Any other database (``DATABASE_URL=postgresql://...``) is used as is,
+    with ``DATABASE_READ_URL`` optionally naming a replica for reads.
+    Reads are only routed when ``db`` uses ``RoutingSession``.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.write_lock = WriteLock()
+        self.busy_timeout = 15.0
+        self.sqlite = False
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('DATABASE_READ_URL', None)
+        app.config.setdefault('DATABASE_READ_POOL_SIZE', 10)
+        app.config.setdefault('SQLITE_TUNING', True)
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT', 15.0)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 64 * 1024)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.extensions['database'] = self
+        self.busy_timeout = app.config['SQLITE_BUSY_TIMEOUT']
+
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        self.sqlite = _is_sqlite_file(url) and app.config['SQLITE_TUNING']
+        if self.sqlite:
+            # pysqlite issues this BEGIN itself, right before the first write of a transaction
+            options.setdefault('connect_args', {}).update(timeout=self.busy_timeout, isolation_level='IMMEDIATE')
+            read_only = url.set(database=f'file:{url.database}').update_query_dict({'mode': 'ro', 'uri': 'true'})
+            binds.setdefault(READER, {
+                'url': read_only,
+                'connect_args': {'timeout': self.busy_timeout, 'check_same_thread': False},
+                'pool_size': app.config['DATABASE_READ_POOL_SIZE'],
+                'max_overflow': app.config['DATABASE_READ_POOL_SIZE'],
+            })
+        elif url.get_backend_name() != 'sqlite':
+            options.setdefault('pool_pre_ping', True)
+            if app.config['DATABASE_READ_URL']:
+                binds.setdefault(READER, {'url': app.config['DATABASE_READ_URL'], 'pool_pre_ping': True})
+
+        db.init_app(app)
+        if not self.sqlite:
+            return
+        pragmas = [f'PRAGMA cache_size = -{int(app.config["SQLITE_CACHE_SIZE_KB"])}',
+                   f'PRAGMA mmap_size = {int(app.config["SQLITE_MMAP_SIZE"])}']
+        with app.app_context():
+            writer, reader = db.engines[None], db.engines[READER]
+            self._configure_writer(writer, pragmas)
+            event.listen(reader.pool, 'connect', lambda connection, record: _execute(connection, pragmas))
+
+    def _configure_writer(self, engine, pragmas):
+        writer_pragmas = ['PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL'] + pragmas
+        event.listen(engine.pool, 'connect', lambda connection, record: _execute(connection, writer_pragmas))
+        event.listen(engine, 'before_cursor_execute', self._before_write)
+        event.listen(engine, 'commit', self._release)
+        event.listen(engine, 'rollback', self._release)
+        # In case a connection goes back to the pool without either
+        event.listen(engine.pool, 'checkin', lambda connection, record: record and self._release_info(record.info))
+        # The file must be in WAL mode before a read-only connection opens it
+        with engine.connect():
+            pass
+
+    def _before_write(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get('write_lock') or statement.lstrip()[:7].upper().startswith(_READ_PREFIXES):
+            return
+        if self.write_lock.acquire(timeout=self.busy_timeout):
+            conn.info['write_lock'] = True
+        else:
+            logger.warning('Waited %.0fs for the write lock; writing without it', self.busy_timeout)
+
+    def _release(self, conn):
+        self._release_info(conn.info)
+
+    def _release_info(self, info):
+        if info.pop('write_lock', False):
+            self.write_lock.release()
+
+
+def _execute(connection, statements):
+    cursor = connection.cursor()
+    for statement in statements:
+        cursor.execute(statement)
+    cursor.close()
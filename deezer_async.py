@@ -0,0 +1,178 @@
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+
+import httpx
+from deezer.exceptions import DeezerErrorResponse, DeezerHTTPError
+
+DEEZER_API_URL = 'https://api.deezer.com'
+
+# Worth another attempt: throttling and server errors, and Deezer's
+# "quota exceeded" (4) and "service busy" (700) error responses
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ERROR_CODES = {4, 700}
+
+
+class _Retryable(Exception):
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+class Resource:
+    """Attribute access to a Deezer JSON object, like deezer-python's resources"""
+
+    def __init__(self, client, data):
+        self._client = client
+        for key, value in data.items():
+            setattr(self, key, Resource(client, value) if isinstance(value, dict) else value)
+
+
+class Artist(Resource):
+    def get_top(self, **params):
+        return [Resource(self._client, item) for item in self._client.get(f'artist/{self.id}/top', **params)['data']]
+
+
+class AsyncDeezerClient:
+    """``deezer.Client`` replacement that runs every request on one event loop.
+
+    Worker threads hand requests to a background asyncio loop and wait for
+    the result. The loop owns a keep-alive ``httpx.AsyncClient`` pool, caps
+    upstream concurrency at ``concurrency``, retries transient failures up
+    to ``retries`` times with full-jitter exponential backoff, and coalesces
+    identical requests that are already in flight into one upstream call
+    (single flight). ``base_url`` can point at a local stub server.
+    """
+
+    def __init__(self, base_url=DEEZER_API_URL, concurrency=10, timeout=5.0, retries=2, backoff=0.25,
+                 max_connections=20, max_keepalive=10):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        # How long a caller waits for every attempt and backoff combined
+        self.deadline = timeout * (retries + 1) + backoff * 2 ** retries
+        self.counters = {'requests': 0, 'upstream': 0, 'coalesced': 0, 'retries': 0, 'failures': 0}
+        self._loop = None
+        self._http = None
+        self._semaphore = None
+        self._inflight = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        # The loop thread does not survive fork, so pre-forking servers start one per worker
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='deezer-async', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self._loop, self._pid, self._inflight = loop, os.getpid(), {}
+        return self._loop
+
+    async def _open(self):
+        self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _close(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    async def _attempt(self, path, params):
+        async with self._semaphore:
+            self.counters['upstream'] += 1
+            response = await self._http.get(path, params=params)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            error = DeezerHTTPError.from_http_error(e)
+            raise _Retryable(error) if response.status_code in RETRY_STATUSES else error
+        data = response.json()
+        if isinstance(data, dict) and data.get('error'):
+            error = DeezerErrorResponse(data)
+            code = data['error'].get('code') if isinstance(data['error'], dict) else None
+            raise _Retryable(error) if code in RETRY_ERROR_CODES else error
+        return data
+
+    async def _fetch(self, path, params):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(path, params)
+            except _Retryable as e:
+                error = e.error
+            except httpx.TransportError as e:
+                # Timeouts have an empty message
+                error = ConnectionError(f'{type(e).__name__} requesting {path}: {e}' if str(e)
+                                        else f'{type(e).__name__} requesting {path}')
+            except Exception:
+                self.counters['failures'] += 1
+                raise
+            if attempt < self.retries:
+                self.counters['retries'] += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        self.counters['failures'] += 1
+        raise error
+
+    async def _get(self, path, params):
+        self.counters['requests'] += 1
+        key = (path, tuple(sorted(params.items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch(path, params))
+
+            def forget(done):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+                # Retrieved here in case every caller gave up at its deadline
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(forget)
+        else:
+            self.counters['coalesced'] += 1
+        # One caller giving up must not cancel the request the others share
+        return await asyncio.shield(task)
+
+    def get(self, path, **params):
+        """Decoded JSON of ``GET path``, blocking the calling thread"""
+        future = asyncio.run_coroutine_threadsafe(self._get(path, params), self._ensure_loop())
+        try:
+            return future.result(self.deadline)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f'Deezer did not answer {path} within {self.deadline:.1f}s') from None
+
+    def search(self, query):
+        """Tracks matching ``query``; further pages are fetched as the results are consumed"""
+        page = self.get('search', q=query)
+        while True:
+            for item in page.get('data', []):
+                yield Resource(self, item)
+            if not page.get('next'):
+                return
+            page = self.get(page['next'])
+
+    def get_track(self, track_id):
+        return Resource(self, self.get(f'track/{track_id}'))
+
+    def get_artist(self, artist_id):
+        return Artist(self, self.get(f'artist/{artist_id}'))
+
+    def stats(self):
+        return dict(self.counters, in_flight=len(self._inflight))
+
+    def close(self):
+        if self._loop is None or self._pid != os.getpid():
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
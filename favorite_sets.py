@@ -0,0 +1,138 @@
+import bisect
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import session
+from sqlalchemy import bindparam, text
+
+from models import db
+
+_SELECT_IDS = text('SELECT song_id FROM favorite WHERE user_id = :user_id ORDER BY song_id')
+_ADD = text(
+    'INSERT INTO favorite (user_id, song_id, created_at) SELECT :user_id, id, :created_at FROM song '
+    'WHERE id IN :song_ids ON CONFLICT (user_id, song_id) DO NOTHING'
+).bindparams(bindparam('song_ids', expanding=True))
+_EXISTS = text('SELECT 1 FROM favorite WHERE user_id = :user_id AND song_id = :song_id')
+_REMOVE = text(
+    'DELETE FROM favorite WHERE user_id = :user_id AND song_id IN :song_ids'
+).bindparams(bindparam('song_ids', expanding=True))
+
+# Key of the session value that changes whenever the user's favorites do
+SESSION_KEY = 'favorites_version'
+
+
+class FavoriteIdSet:
+    """Immutable set of song ids stored as a sorted array of 64-bit integers (8 bytes per id)"""
+
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        self.ids = ids if isinstance(ids, array) else array('q', sorted(ids))
+
+    def __contains__(self, song_id):
+        position = bisect.bisect_left(self.ids, song_id)
+        return position < len(self.ids) and self.ids[position] == song_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def intersection(self, song_ids):
+        return [song_id for song_id in song_ids if song_id in self]
+
+
+EMPTY = FavoriteIdSet()
+
+
+class FavoriteSets:
+    """In-memory cache of each user's favorite song ids.
+
+    A miss reads the ids with one query on the ``(user_id, song_id)``
+    unique index, which already returns them sorted. Entries are evicted
+    least recently used past ``FAVORITE_SETS_MAX_USERS`` and expire after
+    ``FAVORITE_SETS_TTL`` seconds.
+
+    Writes go through ``toggle`` and ``update`` inside a request. They
+    drop the user's entry in this process and store a new version in the
+    user's session. Entries are keyed by that version, so a worker that
+    still holds the old set reloads it on the user's next request rather
+    than waiting for the TTL.
+    """
+
+    def __init__(self, app=None):
+        self.max_users = 1024
+        self.ttl = 60
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FAVORITE_SETS_MAX_USERS', 1024)
+        app.config.setdefault('FAVORITE_SETS_TTL', 60)
+        self.max_users = app.config['FAVORITE_SETS_MAX_USERS']
+        self.ttl = app.config['FAVORITE_SETS_TTL']
+        app.extensions['favorite_sets'] = self
+
+    def get(self, user_id):
+        """The user's FavoriteIdSet; at most one indexed query"""
+        version = session.get(SESSION_KEY)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sets.get(user_id)
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self._sets.move_to_end(user_id)
+                self.metrics['hits'] += 1
+                return entry[2]
+            self.metrics['misses'] += 1
+        ids = FavoriteIdSet(array('q', db.session.execute(_SELECT_IDS, {'user_id': user_id}).scalars()))
+        with self._lock:
+            self._sets[user_id] = (version, now, ids)
+            self._sets.move_to_end(user_id)
+            while len(self._sets) > self.max_users:
+                self._sets.popitem(last=False)
+        return ids
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._sets.pop(user_id, None)
+        session[SESSION_KEY] = time.time_ns()
+
+    def toggle(self, user_id, song_id):
+        """Flip one favorite in the current transaction; returns whether it is now a favorite.
+
+        Tries the DELETE first, so both directions are one statement on the
+        unique index. The caller commits.
+        """
+        params = {'user_id': user_id, 'song_ids': [song_id]}
+        self.invalidate(user_id)
+        if db.session.execute(_REMOVE, params).rowcount:
+            return False
+        if db.session.execute(_ADD, dict(params, created_at=datetime.utcnow())).rowcount:
+            return True
+        # Nothing inserted: the song does not exist, or a concurrent request added it first
+        return db.session.execute(_EXISTS, {'user_id': user_id, 'song_id': song_id}).first() is not None
+
+    def update(self, user_id, add=(), remove=()):
+        """Add and remove favorites in the current transaction; returns ``(added, removed)`` counts.
+
+        Ids of songs that do not exist, or that are already favorites, are skipped.
+        """
+        added = removed = 0
+        if remove:
+            removed = db.session.execute(_REMOVE, {'user_id': user_id, 'song_ids': list(remove)}).rowcount
+        if add:
+            added = db.session.execute(_ADD, {'user_id': user_id, 'song_ids': list(add),
+                                              'created_at': datetime.utcnow()}).rowcount
+        self.invalidate(user_id)
+        return added, removed
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics, users=len(self._sets), ids=sum(len(entry[2]) for entry in self._sets.values()))
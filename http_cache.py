@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import threading
+import time
+
+from flask import current_app, make_response, request
+from sqlalchemy import event, inspect, text
+
+from api_cache import CacheEntry, MemoryBackend
+from models import db, Song, Artist, Album, CacheVersion
+
+# Scopes that cached responses can depend on
+LIBRARY = 'library'
+PLAYS = 'plays'
+
+_BUMP = text(
+    'INSERT INTO cache_version (name, version) VALUES (:name, 1) '
+    'ON CONFLICT (name) DO UPDATE SET version = cache_version.version + 1'
+)
+
+# Bumped on every version change made by this process, so its own writes
+# are visible to its next request without waiting for HTTP_CACHE_VERSION_TTL
+_generation = 0
+
+
+def bump_versions(connection, *scopes):
+    """Invalidate responses depending on ``scopes``, in ``connection``'s transaction"""
+    global _generation
+    for scope in scopes:
+        connection.execute(_BUMP, {'name': scope})
+    _generation += 1
+
+
+class HTTPCache:
+    """Shared cache of whole JSON responses for endpoints that do not depend on the user.
+
+    Each cached endpoint names the data scopes it reads. Writes bump the
+    scope's row in ``cache_version`` in their own transaction: mapper
+    events cover songs, albums and artists, and the PlayCounter flush bumps
+    ``plays``. The versions are part of the cache key, so a bump in any
+    worker retires old entries everywhere within ``HTTP_CACHE_VERSION_TTL``
+    seconds, which is how long a worker trusts its copy of the versions.
+
+    Responses carry a strong ETag derived from the body and Cache-Control
+    headers that let a CDN keep them for ``s_maxage`` seconds.
+    """
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend(max_entries=512, max_bytes=8 * 1024 * 1024)
+        self.version_ttl = 1.0
+        self.enabled = True
+        self._versions = {}
+        self._versions_read_at = 0
+        self._versions_generation = -1
+        self._lock = threading.Lock()
+        self.metrics = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HTTP_CACHE_ENABLED', True)
+        app.config.setdefault('HTTP_CACHE_VERSION_TTL', 1.0)
+        self.enabled = app.config['HTTP_CACHE_ENABLED']
+        self.version_ttl = app.config['HTTP_CACHE_VERSION_TTL']
+        app.extensions['http_cache'] = self
+        # The mapper events write to this table, so it must exist up front
+        with app.app_context():
+            CacheVersion.__table__.create(db.engine, checkfirst=True)
+
+    def versions(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._versions_read_at < self.version_ttl and self._versions_generation == _generation:
+                return self._versions
+        generation = _generation
+        versions = dict(db.session.execute(text('SELECT name, version FROM cache_version')).all())
+        with self._lock:
+            self._versions, self._versions_read_at, self._versions_generation = versions, now, generation
+        return versions
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            counters = self.metrics.setdefault(endpoint, {'hits': 0, 'misses': 0, 'not_modified': 0})
+            counters[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for endpoint, counters in self.metrics.items():
+                lookups = counters['hits'] + counters['misses']
+                stats[endpoint] = dict(counters, hit_ratio=round(counters['hits'] / lookups, 4) if lookups else None)
+        return {'endpoints': stats, 'entries': len(self.backend), 'bytes': self.backend.bytes_used,
+                'evictions': self.backend.evictions}
+
+    def clear(self):
+        self.backend.clear()
+
+    def cached(self, *scopes, max_age=30, s_maxage=60, stale_while_revalidate=60):
+        """Cache the 200 responses of a view that returns the same JSON to every visitor.
+
+        The key is the full path with query string plus the current
+        version of each scope in ``scopes``.
+        """
+        cache_control = (f'public, max-age={max_age}, s-maxage={s_maxage}, '
+                         f'stale-while-revalidate={stale_while_revalidate}')
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                versions = self.versions()
+                key = (request.endpoint, request.full_path,
+                       tuple(versions.get(scope, 0) for scope in scopes))
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count(request.endpoint, 'hits')
+                    body, etag, mimetype = entry.value
+                else:
+                    self._count(request.endpoint, 'misses')
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    body, mimetype = response.get_data(), response.mimetype
+                    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    # Versions retire entries; the expiry only bounds how long unused ones linger
+                    expires = time.time() + 24 * 3600
+                    self.backend.set(key, CacheEntry((body, etag, mimetype), expires, expires, len(body)))
+
+                if request.if_none_match.contains(etag):
+                    self._count(request.endpoint, 'not_modified')
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.response_class(body, mimetype=mimetype)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = cache_control
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+def plays_flushed(connection, pending):
+    """PlayCounter flush listener"""
+    bump_versions(connection, PLAYS)
+
+
+@event.listens_for(Song, 'after_update')
+def _song_updated(mapper, connection, song):
+    # Play counts change far more often than anything else
+    state = inspect(song)
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    bump_versions(connection, *([PLAYS] if changed <= {'plays'} else [LIBRARY, PLAYS]))
+
+
+@event.listens_for(Song, 'after_insert')
+@event.listens_for(Song, 'after_delete')
+@event.listens_for(Artist, 'after_insert')
+@event.listens_for(Artist, 'after_update')
+@event.listens_for(Artist, 'after_delete')
+@event.listens_for(Album, 'after_insert')
+@event.listens_for(Album, 'after_update')
+@event.listens_for(Album, 'after_delete')
+def _library_changed(mapper, connection, target):
+    bump_versions(connection, LIBRARY)
@@ -0,0 +1,279 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import insert, select, text
+
+from models import db, Artist, Album, Song, ImportState, StoredFile
+from uploads import ADD_REFERENCE, read_audio_metadata, release_reference, remove_files
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_UPSERT_STATE = text(
+    'INSERT INTO import_state (path, mtime_ns, size, sha256, song_id) '
+    'VALUES (:path, :mtime_ns, :size, :sha256, :song_id) '
+    'ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size, '
+    'sha256 = excluded.sha256, song_id = excluded.song_id'
+)
+
+
+def find_audio_files(directory, extensions):
+    """Yield every file below ``directory`` with one of ``extensions``, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if '.' in name and name.rsplit('.', 1)[1].lower() in extensions:
+                yield os.path.join(root, name)
+
+
+def scan_file(path):
+    """Hash a file and read its tags. Runs in a worker process.
+
+    Returns ``(sha256, metadata, error)``; metadata is None for files
+    mutagen cannot parse.
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest(), read_audio_metadata(path), None
+    except OSError as e:
+        return None, None, str(e)
+
+
+def _place_file(source, directory, relative_path):
+    """Copy ``source`` into the content-addressed store.
+
+    Never a hard link: editing the tags of the source in place would change
+    the stored copy under its hash, and every song sharing it.
+    """
+    target = os.path.join(directory, relative_path)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.import-')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class LibraryImporter:
+    """Bulk import of a directory tree of audio files.
+
+    Files are hashed and tagged in a process pool while the parent resolves
+    artists and albums through in-memory maps and writes each batch with
+    executemany inserts in its own transaction. ``import_state`` records the
+    mtime, size and hash of every file seen, so an interrupted run resumes
+    where it stopped and later runs only look at new or changed files.
+
+    Bulk inserts bypass the ORM events, so the caller must reconcile the
+    library counters and rebuild the search index afterwards.
+    """
+
+    def __init__(self, audio_folder, batch_size=1000, workers=None, progress=None):
+        self.audio_folder = audio_folder
+        self.batch_size = batch_size
+        self.workers = workers
+        self.progress = progress
+        self.artists = {}
+        self.albums = {}
+        self.stats = {
+            'found': 0,
+            'queued': 0,
+            'unchanged': 0,
+            'imported': 0,
+            'updated': 0,
+            'failed': 0,
+            'processed': 0,
+            'bytes': 0,
+            'elapsed': 0.0,
+        }
+        self._started = None
+
+    def run(self, directory, extensions):
+        self._started = time.perf_counter()
+        directory = os.path.realpath(directory)
+
+        with db.engine.connect() as connection:
+            # song_id is None once the song is gone; SQLite does not enforce ON DELETE SET NULL
+            state = {row.path: row for row in connection.execute(
+                select(ImportState.path, ImportState.mtime_ns, ImportState.size, ImportState.sha256,
+                       ImportState.song_id.label('recorded_song_id'), Song.id.label('song_id'))
+                .outerjoin(Song, Song.id == ImportState.song_id)
+                .where(ImportState.path.startswith(directory + os.sep))
+            )}
+            self.artists = {name: id for id, name in connection.execute(select(Artist.id, Artist.name))}
+            self.albums = {(title, artist_id): id for id, title, artist_id
+                           in connection.execute(select(Album.id, Album.title, Album.artist_id))}
+
+        candidates = []
+        for path in find_audio_files(directory, extensions):
+            self.stats['found'] += 1
+            stat = os.stat(path)
+            known = state.get(path)
+            if (known is not None and known.mtime_ns == stat.st_mtime_ns and known.size == stat.st_size
+                    and (known.song_id is not None or known.recorded_song_id is None)):
+                self.stats['unchanged'] += 1
+                continue
+            candidates.append((path, stat.st_mtime_ns, stat.st_size, known))
+        self.stats['queued'] = len(candidates)
+
+        if candidates:
+            with ProcessPoolExecutor(self.workers) as pool:
+                batch = []
+                results = pool.map(scan_file, [c[0] for c in candidates], chunksize=32)
+                for candidate, result in zip(candidates, results):
+                    batch.append(candidate + result)
+                    if len(batch) >= self.batch_size:
+                        self._import_batch(batch)
+                        batch = []
+                if batch:
+                    self._import_batch(batch)
+
+        self.stats['elapsed'] = time.perf_counter() - self._started
+        return self.stats
+
+    def _resolve_artists(self, connection, names):
+        new = sorted({name for name in names if name not in self.artists})
+        if new:
+            ids = connection.execute(
+                insert(Artist.__table__).returning(Artist.__table__.c.id, sort_by_parameter_order=True),
+                [{'name': name} for name in new]
+            ).scalars().all()
+            self.artists.update(zip(new, ids))
+
+    def _resolve_albums(self, connection, keys, genres):
+        new = sorted({key for key in keys if key not in self.albums})
+        if new:
+            ids = connection.execute(
+                insert(Album.__table__).returning(Album.__table__.c.id, sort_by_parameter_order=True),
+                [{'title': title, 'artist_id': artist_id, 'genre': genres[(title, artist_id)]}
+                 for title, artist_id in new]
+            ).scalars().all()
+            self.albums.update(zip(new, ids))
+
+    def _import_batch(self, batch):
+        orphans = []
+        with db.engine.begin() as connection:
+            states = []
+            tracks = []
+            for path, mtime_ns, size, known, sha256, metadata, error in batch:
+                if error is not None:
+                    # Unreadable now; not recorded so the next run retries it
+                    self.stats['failed'] += 1
+                    continue
+                state = {'path': path, 'mtime_ns': mtime_ns, 'size': size, 'sha256': sha256,
+                         'song_id': known.song_id if known is not None else None}
+                states.append(state)
+                self.stats['bytes'] += size
+                if metadata is None:
+                    # Not audio; recorded so it is skipped until it changes
+                    self.stats['failed'] += 1
+                elif known is not None and known.sha256 == sha256 and known.song_id is not None:
+                    # Touched but identical content
+                    self.stats['unchanged'] += 1
+                else:
+                    tracks.append((path, size, sha256, metadata, state))
+
+            if tracks:
+                orphans = self._write_tracks(connection, tracks)
+            if states:
+                connection.execute(_UPSERT_STATE, states)
+
+        remove_files(self.audio_folder, orphans)
+        self.stats['processed'] += len(batch)
+        self.stats['elapsed'] = time.perf_counter() - self._started
+        if self.progress is not None:
+            self.progress(self.stats)
+
+    def _write_tracks(self, connection, tracks):
+        """Insert or update the songs of one batch; returns files left without references"""
+        rows = []
+        for path, size, sha256, metadata, state in tracks:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            rows.append({
+                'title': (metadata['title'] or stem)[:100],
+                'artist': (metadata['artist'] or 'Unknown Artist')[:100],
+                'album': (metadata['album'] or 'Singles')[:100],
+                'genre': (metadata['genre'] or 'Unknown')[:50],
+            })
+
+        self._resolve_artists(connection, [row['artist'] for row in rows])
+        genres = {}
+        for row in rows:
+            genres.setdefault((row['album'], self.artists[row['artist']]), row['genre'])
+        self._resolve_albums(connection, list(genres), genres)
+
+        # Reuse the stored copy of content that is already in the library
+        hashes = {sha256 for _, _, sha256, _, _ in tracks}
+        stored = dict(connection.execute(
+            select(StoredFile.sha256, StoredFile.path).where(StoredFile.sha256.in_(hashes))
+        ).all())
+        references = []
+        for path, size, sha256, _, _ in tracks:
+            if sha256 not in stored:
+                extension = path.rsplit('.', 1)[1].lower()
+                stored[sha256] = f'{sha256[:2]}/{sha256}.{extension}'
+            references.append({'sha256': sha256, 'path': stored[sha256], 'size': size})
+        connection.execute(ADD_REFERENCE, references)
+        # After the references, which hold the write lock, so a concurrent cleanup cannot remove them
+        for path, _, sha256, _, _ in tracks:
+            _place_file(path, self.audio_folder, stored[sha256])
+
+        # Files that changed since the last run update their existing song
+        song_ids = [state['song_id'] for *_, state in tracks if state['song_id'] is not None]
+        old_paths = {}
+        if song_ids:
+            old_paths = dict(connection.execute(select(Song.id, Song.file_path).where(Song.id.in_(song_ids))).all())
+
+        now = datetime.utcnow()
+        inserts, updates, inserted_states = [], [], []
+        for (path, size, sha256, metadata, state), row in zip(tracks, rows):
+            values = {
+                'title': row['title'],
+                'artist_id': self.artists[row['artist']],
+                'album_id': self.albums[(row['album'], self.artists[row['artist']])],
+                'duration': metadata['duration'],
+                'bitrate': metadata['bitrate'],
+                'file_path': stored[sha256],
+            }
+            if state['song_id'] in old_paths:
+                updates.append(dict(values, id=state['song_id']))
+            else:
+                inserts.append(dict(values, plays=0, created_at=now))
+                inserted_states.append(state)
+
+        orphans = []
+        if updates:
+            connection.execute(text(
+                'UPDATE song SET title = :title, artist_id = :artist_id, album_id = :album_id, '
+                'duration = :duration, bitrate = :bitrate, file_path = :file_path WHERE id = :id'
+            ), updates)
+            for update in updates:
+                if release_reference(connection, old_paths[update['id']]):
+                    orphans.append(old_paths[update['id']])
+            self.stats['updated'] += len(updates)
+        if inserts:
+            ids = connection.execute(
+                insert(Song.__table__).returning(Song.__table__.c.id, sort_by_parameter_order=True), inserts
+            ).scalars().all()
+            for state, song_id in zip(inserted_states, ids):
+                state['song_id'] = song_id
+            self.stats['imported'] += len(inserts)
+        return orphans
+
+
+def format_progress(stats):
+    elapsed = max(stats['elapsed'], 1e-9)
+    return (f"{stats['processed']}/{stats['queued']} scanned, {stats['imported']} imported, {stats['updated']} updated, {stats['failed']} failed "
+            f"({stats['processed'] / elapsed:.0f} files/s, {stats['bytes'] / elapsed / 1e6:.1f} MB/s)")
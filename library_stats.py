@@ -0,0 +1,128 @@
+from sqlalchemy import bindparam, event, inspect, text
+
+from models import db, Song, Artist, Album, LibraryStats
+
+STATS_ID = 1
+COUNTERS = ('songs', 'artists', 'albums', 'plays')
+
+_RECOMPUTE = text(
+    'SELECT (SELECT COUNT(*) FROM song), (SELECT COUNT(*) FROM artist), '
+    '(SELECT COUNT(*) FROM album), (SELECT COALESCE(SUM(plays), 0) FROM song)'
+)
+_EXISTING_SONGS = text('SELECT id FROM song WHERE id IN :ids').bindparams(bindparam('ids', expanding=True))
+
+
+class LibraryCounters:
+    """Library totals served from the single ``library_stats`` row.
+
+    Mapper events adjust the row in the same transaction as every Song,
+    Artist or Album insert or delete, and the play counter adds flushed
+    plays, so reading the totals never scans the library tables. Writes
+    that bypass the ORM (raw SQL, bulk deletes) cause drift; ``reconcile()``
+    recomputes the totals and reports it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['library_counters'] = self
+        # The mapper events write to this table, so it must exist before
+        # anything else touches the library. The row is seeded lazily.
+        with app.app_context():
+            LibraryStats.__table__.create(db.engine, checkfirst=True)
+
+    def create(self, connection):
+        """Create and seed the stats row if it does not exist yet"""
+        LibraryStats.__table__.create(connection, checkfirst=True)
+        exists = connection.execute(text('SELECT 1 FROM library_stats WHERE id = :id'), {'id': STATS_ID}).first()
+        if not exists:
+            songs, artists, albums, plays = connection.execute(_RECOMPUTE).one()
+            connection.execute(
+                text('INSERT INTO library_stats (id, songs, artists, albums, plays) '
+                     'VALUES (:id, :songs, :artists, :albums, :plays)'),
+                {'id': STATS_ID, 'songs': songs, 'artists': artists, 'albums': albums, 'plays': plays}
+            )
+
+    def read(self):
+        row = db.session.get(LibraryStats, STATS_ID)
+        if row is None:
+            with db.engine.begin() as connection:
+                self.create(connection)
+            row = db.session.get(LibraryStats, STATS_ID)
+        return {counter: getattr(row, counter) for counter in COUNTERS}
+
+    def reconcile(self, fix=True):
+        """Recompute every counter from scratch.
+
+        Returns ``{counter: (stored, actual)}`` for counters that drifted
+        and, when ``fix`` is set, overwrites the stored values.
+        """
+        with db.engine.begin() as connection:
+            self.create(connection)
+            stored = connection.execute(
+                text('SELECT songs, artists, albums, plays FROM library_stats WHERE id = :id'), {'id': STATS_ID}
+            ).one()
+            actual = connection.execute(_RECOMPUTE).one()
+            drift = {counter: (s, a) for counter, s, a in zip(COUNTERS, stored, actual) if s != a}
+            if drift and fix:
+                connection.execute(
+                    text('UPDATE library_stats SET songs = :songs, artists = :artists, '
+                         'albums = :albums, plays = :plays WHERE id = :id'),
+                    dict(zip(COUNTERS, actual), id=STATS_ID)
+                )
+        return drift
+
+
+def adjust(connection, **deltas):
+    """Add ``deltas`` to the stats row using ``connection``'s transaction"""
+    deltas = {counter: delta for counter, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    assignments = ', '.join(f'{counter} = {counter} + :{counter}' for counter in deltas)
+    connection.execute(text(f'UPDATE library_stats SET {assignments} WHERE id = :id'), dict(deltas, id=STATS_ID))
+
+
+@event.listens_for(Song, 'after_insert')
+def _song_inserted(mapper, connection, song):
+    adjust(connection, songs=1, plays=song.plays or 0)
+
+
+@event.listens_for(Song, 'after_update')
+def _song_updated(mapper, connection, song):
+    history = inspect(song).attrs.plays.history
+    if history.has_changes():
+        old = history.deleted[0] if history.deleted else 0
+        adjust(connection, plays=(song.plays or 0) - (old or 0))
+
+
+@event.listens_for(Song, 'after_delete')
+def _song_deleted(mapper, connection, song):
+    adjust(connection, songs=-1, plays=-(song.plays or 0))
+
+
+@event.listens_for(Artist, 'after_insert')
+def _artist_inserted(mapper, connection, artist):
+    adjust(connection, artists=1)
+
+
+@event.listens_for(Artist, 'after_delete')
+def _artist_deleted(mapper, connection, artist):
+    adjust(connection, artists=-1)
+
+
+@event.listens_for(Album, 'after_insert')
+def _album_inserted(mapper, connection, album):
+    adjust(connection, albums=1)
+
+
+@event.listens_for(Album, 'after_delete')
+def _album_deleted(mapper, connection, album):
+    adjust(connection, albums=-1)
+
+
+def count_flushed_plays(connection, pending):
+    """PlayCounter flush listener; plays of songs deleted before the flush matched no row and do not count"""
+    existing = connection.execute(_EXISTING_SONGS, {'ids': list(pending)}).scalars()
+    adjust(connection, plays=sum(pending[song_id] for song_id in existing))
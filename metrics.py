@@ -0,0 +1,212 @@
+import bisect
+import logging
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, as Prometheus expects"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_number(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_number(values[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class _RequestStats:
+    __slots__ = ('started', 'queries', 'sql_seconds', 'statements')
+
+    def __init__(self, capture):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = [] if capture else None
+
+
+class Metrics:
+    """Request, SQL and Deezer instrumentation in Prometheus text format.
+
+    Every request is timed per endpoint, and the SQLAlchemy cursor events
+    attribute query counts and time to the request running on the same
+    thread. Register ``observe_deezer`` as the MusicAPIService observer to
+    record upstream latency by outcome. ``render()`` produces the body of
+    ``/metrics``; values are per process, so scrape every worker.
+
+    Responses get a ``Server-Timing`` header with the request and SQL
+    time. When ``SLOW_REQUEST_MS`` is set, slower requests are logged
+    together with the SQL statements they ran (without their parameters).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.server_timing = True
+        self.slow_request_ms = None
+        self.requests = Histogram('sonance_request_duration_seconds', 'Time to build a response',
+                                  ('endpoint', 'method', 'status'))
+        self.request_queries = Histogram('sonance_request_sql_queries', 'SQL queries run per request',
+                                         ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.request_sql = Histogram('sonance_request_sql_duration_seconds', 'SQL time per request', ('endpoint',))
+        self.queries = Histogram('sonance_sql_query_duration_seconds', 'Duration of single SQL statements')
+        self.deezer = Histogram('sonance_deezer_request_duration_seconds', 'Deezer lookups that missed the cache',
+                                ('operation', 'outcome'))
+        self.deezer_errors = Counter('sonance_deezer_errors_total', 'Deezer lookups that failed', ('operation',))
+        self.collectors = [self.requests, self.request_queries, self.request_sql, self.queries,
+                           self.deezer, self.deezer_errors]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('SERVER_TIMING', True)
+        app.config.setdefault('SLOW_REQUEST_MS', None)
+        self.enabled = app.config['METRICS_ENABLED']
+        self.server_timing = app.config['SERVER_TIMING']
+        self.slow_request_ms = app.config['SLOW_REQUEST_MS']
+        app.extensions['metrics'] = self
+        if self.enabled:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            app.teardown_request(self._teardown_request)
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+
+    def _start_request(self):
+        _local.stats = g._request_stats = _RequestStats(self.slow_request_ms is not None)
+
+    def _finish_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        self.requests.observe(elapsed, endpoint, request.method, str(response.status_code))
+        self.request_queries.observe(stats.queries, endpoint)
+        self.request_sql.observe(stats.sql_seconds, endpoint)
+
+        if self.server_timing:
+            timing = f'app;dur={elapsed * 1000:.1f}, db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries"'
+            existing = response.headers.get('Server-Timing')
+            response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            statements = '\n'.join(f'  {i}. {ms:.1f} ms {statement}'
+                                   for i, (ms, statement) in enumerate(stats.statements, 1))
+            logger.warning('Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms\n%s', request.method,
+                           request.full_path, endpoint, elapsed * 1000, stats.queries, stats.sql_seconds * 1000,
+                           statements)
+        return response
+
+    def _teardown_request(self, exc):
+        _local.stats = None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        self.queries.observe(elapsed)
+        stats = getattr(_local, 'stats', None)
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+            if stats.statements is not None:
+                stats.statements.append((elapsed * 1000, statement))
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        if context.connection is not None and context.execution_context is not None:
+            started = context.connection.info.get('metrics_started')
+            if started:
+                started.pop()
+
+    def observe_deezer(self, operation, seconds, error):
+        """MusicAPIService observer"""
+        self.deezer.observe(seconds, operation, 'error' if error else 'ok')
+        if error:
+            self.deezer_errors.inc(operation)
+
+    def render(self):
+        lines = []
+        for collector in self.collectors:
+            lines.append(f'# HELP {collector.name} {collector.help}')
+            lines.append(f'# TYPE {collector.name} {collector.kind}')
+            lines.extend(collector.samples())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,194 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import search_index
+from library_stats import LibraryCounters
+from models import db, StoredFile, ImportState, PlayEvent, CacheVersion
+
+# Ordered list of (version, description, upgrade function)
+MIGRATIONS = []
+
+EPOCH = '1970-01-01 00:00:00.000000'
+
+
+def migration(version, description):
+    """Register ``func(connection)`` as schema migration ``version``.
+
+    Migrations must be idempotent: a fresh database built by
+    ``db.create_all()`` already has the current schema and still has every
+    migration applied to it once.
+    """
+
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return decorator
+
+
+def _ensure_version_table(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP)'
+    ))
+
+
+def current_version(connection):
+    _ensure_version_table(connection)
+    return connection.execute(text('SELECT COALESCE(MAX(version), 0) FROM schema_version')).scalar()
+
+
+def upgrade(target=None):
+    """Apply pending migrations, each in its own transaction.
+
+    Returns the ``(version, description)`` pairs that were applied.
+    """
+    applied = []
+    with db.engine.begin() as connection:
+        version = current_version(connection)
+    for number, description, func in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        with db.engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                text('INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': number, 'd': description, 't': datetime.utcnow()}
+            )
+        applied.append((number, description))
+    return applied
+
+
+def _create_indexes(connection, indexes):
+    for statement in indexes:
+        connection.execute(text(statement))
+
+
+@migration(1, 'Secondary indexes and unique favorites')
+def add_indexes(connection):
+    # Sort keys must not be NULL for keyset pagination to use the indexes
+    connection.execute(text('UPDATE song SET plays = 0 WHERE plays IS NULL'))
+    connection.execute(text('UPDATE song SET created_at = :epoch WHERE created_at IS NULL'), {'epoch': EPOCH})
+    connection.execute(text('UPDATE favorite SET created_at = :epoch WHERE created_at IS NULL'), {'epoch': EPOCH})
+    connection.execute(text('UPDATE playlist SET created_at = :epoch WHERE created_at IS NULL'), {'epoch': EPOCH})
+
+    # Keep the oldest row of each duplicated favorite before adding the unique index
+    connection.execute(text(
+        'DELETE FROM favorite WHERE id NOT IN (SELECT MIN(id) FROM favorite GROUP BY user_id, song_id)'
+    ))
+
+    _create_indexes(connection, [
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_favorite_user_song ON favorite (user_id, song_id)',
+        'CREATE INDEX IF NOT EXISTS ix_favorite_user_created_at ON favorite (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_song_plays ON song (plays)',
+        'CREATE INDEX IF NOT EXISTS ix_song_created_at ON song (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_song_title ON song (title)',
+        'CREATE INDEX IF NOT EXISTS ix_song_artist_id ON song (artist_id)',
+        'CREATE INDEX IF NOT EXISTS ix_song_album_id ON song (album_id)',
+        'CREATE INDEX IF NOT EXISTS ix_artist_name ON artist (name)',
+        'CREATE INDEX IF NOT EXISTS ix_album_title_artist_id ON album (title, artist_id)',
+        'CREATE INDEX IF NOT EXISTS ix_album_artist_id ON album (artist_id)',
+        'CREATE INDEX IF NOT EXISTS ix_album_release_date ON album (release_date)',
+        'CREATE INDEX IF NOT EXISTS ix_playlist_user_id ON playlist (user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_playlist_songs_song_id ON playlist_songs (song_id)',
+    ])
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text('ANALYZE'))
+
+
+@migration(2, 'Library statistics counters')
+def add_library_stats(connection):
+    LibraryCounters().create(connection)
+
+
+@migration(3, 'Song bitrate and content-addressed file references')
+def add_stored_files(connection):
+    if 'bitrate' not in {column['name'] for column in inspect(connection).get_columns('song')}:
+        connection.execute(text('ALTER TABLE song ADD COLUMN bitrate INTEGER'))
+    StoredFile.__table__.create(connection, checkfirst=True)
+
+
+@migration(4, 'Bulk import state')
+def add_import_state(connection):
+    ImportState.__table__.create(connection, checkfirst=True)
+
+
+@migration(5, 'Play history')
+def add_play_events(connection):
+    PlayEvent.__table__.create(connection, checkfirst=True)
+
+
+@migration(6, 'HTTP cache versions')
+def add_cache_versions(connection):
+    CacheVersion.__table__.create(connection, checkfirst=True)
+
+
+@migration(7, 'Playlist song positions')
+def add_playlist_positions(connection):
+    if 'position' not in {column['name'] for column in inspect(connection).get_columns('playlist_songs')}:
+        connection.execute(text('ALTER TABLE playlist_songs ADD COLUMN position INTEGER NOT NULL DEFAULT 0'))
+        # The old order was by song id
+        connection.execute(text(
+            'UPDATE playlist_songs SET position = (SELECT COUNT(*) FROM playlist_songs AS p '
+            'WHERE p.playlist_id = playlist_songs.playlist_id AND p.song_id < playlist_songs.song_id)'
+        ))
+    _create_indexes(connection, [
+        'CREATE INDEX IF NOT EXISTS ix_playlist_songs_playlist_position '
+        'ON playlist_songs (playlist_id, position, song_id)',
+    ])
+
+
+@migration(8, 'Fill the search index')
+def fill_search_index(connection):
+    # Earlier versions created the table empty at start-up and never filled it
+    if search_index.fts5_available(connection):
+        search_index.create(connection)
+        search_index.fill(connection)
+
+
+# Queries on hot paths that must be served from an index. Parameters are
+# dummies; only the plan matters.
+HOT_QUERIES = {
+    'favorite toggle lookup': 'SELECT id FROM favorite WHERE user_id = 1 AND song_id = 1',
+    'favorite ids of a user': 'SELECT song_id FROM favorite WHERE user_id = 1 ORDER BY song_id',
+    'favorites page': 'SELECT id FROM favorite WHERE user_id = 1 ORDER BY created_at DESC, id DESC LIMIT 51',
+    'trending songs': 'SELECT id FROM song ORDER BY plays DESC LIMIT 10',
+    'songs by plays page': 'SELECT id FROM song WHERE plays < 5 OR (plays = 5 AND id < 10) '
+                           'ORDER BY plays DESC, id DESC LIMIT 51',
+    'songs by title page': 'SELECT id FROM song ORDER BY title, id LIMIT 51',
+    'artist lookup on upload': "SELECT id FROM artist WHERE name = 'x'",
+    'album lookup on upload': "SELECT id FROM album WHERE title = 'x' AND artist_id = 1",
+    'new releases': 'SELECT id FROM album ORDER BY release_date DESC LIMIT 10',
+    'user playlists': 'SELECT id FROM playlist WHERE user_id = 1',
+    'playlist songs page': 'SELECT song_id FROM playlist_songs WHERE playlist_id = 1 '
+                           'ORDER BY position, song_id LIMIT 51',
+    'playlist membership': 'SELECT song_id FROM playlist_songs WHERE playlist_id = 1 AND song_id IN (1, 2)',
+    'playlist end': 'SELECT MAX(position) FROM playlist_songs WHERE playlist_id = 1',
+    'playlist song count': 'SELECT COUNT(*) FROM playlist_songs WHERE playlist_id = 1',
+    'playlist song ids': 'SELECT song_id FROM playlist_songs WHERE playlist_id = 1 ORDER BY position, song_id',
+    'songs of an artist': 'SELECT id FROM song WHERE artist_id = 1',
+    'recently played': 'SELECT song_id, played_at FROM play_event WHERE user_id = 1 ORDER BY id DESC LIMIT 200',
+}
+
+
+def explain(connection, sql):
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for ``sql``"""
+    return [row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def check_query_plans():
+    """Return ``{name: plan}`` for hot queries that scan a table or sort in a temp B-tree"""
+    problems = {}
+    with db.engine.connect() as connection:
+        if connection.dialect.name != 'sqlite':
+            return problems
+        for name, sql in HOT_QUERIES.items():
+            plan = explain(connection, sql)
+            for line in plan:
+                full_scan = line.startswith('SCAN') and 'USING' not in line
+                if full_scan or 'TEMP B-TREE' in line:
+                    problems[name] = plan
+                    break
+    return problems
@@ -2,14 +2,24 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 
-db = SQLAlchemy()
+from database import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Association tables for many-to-many relationships
 playlist_songs = db.Table('playlist_songs',
     db.Column('playlist_id', db.Integer, db.ForeignKey('playlist.id'), primary_key=True),
-    db.Column('song_id', db.Integer, db.ForeignKey('song.id'), primary_key=True)
+    db.Column('song_id', db.Integer, db.ForeignKey('song.id'), primary_key=True),
+    # Order within the playlist; may have gaps. Edit membership through
+    # playlists.py, which assigns positions, rather than Playlist.songs.
+    db.Column('position', db.Integer, nullable=False, default=0),
+    db.Index('ix_playlist_songs_song_id', 'song_id'),
+    db.Index('ix_playlist_songs_playlist_position', 'playlist_id', 'position', 'song_id')
 )
 
+# Secondary indexes are also created on existing databases by migrations.py;
+# keep the two in sync when adding one here.
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -21,6 +31,10 @@ class User(UserMixin, db.Model):
     favorites = db.relationship('Favorite', backref='user', lazy=True)
 
 class Artist(db.Model):
+    __table_args__ = (
+        db.Index('ix_artist_name', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     bio = db.Column(db.Text)
@@ -29,6 +43,12 @@ class Artist(db.Model):
     songs = db.relationship('Song', backref='artist', lazy=True)
 
 class Album(db.Model):
+    __table_args__ = (
+        db.Index('ix_album_title_artist_id', 'title', 'artist_id'),
+        db.Index('ix_album_artist_id', 'artist_id'),
+        db.Index('ix_album_release_date', 'release_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
@@ -38,27 +58,86 @@ class Album(db.Model):
     songs = db.relationship('Song', backref='album', lazy=True)
 
 class Song(db.Model):
+    __table_args__ = (
+        db.Index('ix_song_plays', 'plays'),
+        db.Index('ix_song_created_at', 'created_at'),
+        db.Index('ix_song_title', 'title'),
+        db.Index('ix_song_artist_id', 'artist_id'),
+        db.Index('ix_song_album_id', 'album_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     album_id = db.Column(db.Integer, db.ForeignKey('album.id'))
     duration = db.Column(db.Integer)  # in seconds
+    bitrate = db.Column(db.Integer)  # in bits per second
     file_path = db.Column(db.String(200), nullable=False)
     plays = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Playlist(db.Model):
+    __table_args__ = (
+        db.Index('ix_playlist_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     cover_image = db.Column(db.String(200), default='default-playlist.jpg')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    songs = db.relationship('Song', secondary=playlist_songs, lazy='subquery',
+    songs = db.relationship('Song', secondary=playlist_songs, lazy=True, order_by=playlist_songs.c.position,
                            backref=db.backref('playlists', lazy=True))
 
 class Favorite(db.Model):
+    __table_args__ = (
+        db.Index('uq_favorite_user_song', 'user_id', 'song_id', unique=True),
+        db.Index('ix_favorite_user_created_at', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    song_id = db.Column(db.Integer, db.ForeignKey('song.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    song = db.relationship('Song')
+
+class LibraryStats(db.Model):
+    """Single-row table of library totals, kept current by library_stats.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    songs = db.Column(db.Integer, nullable=False, default=0)
+    artists = db.Column(db.Integer, nullable=False, default=0)
+    albums = db.Column(db.Integer, nullable=False, default=0)
+    plays = db.Column(db.Integer, nullable=False, default=0)
+
+class StoredFile(db.Model):
+    """Content-addressed audio file shared by every song that uses it"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(200), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+
+class ImportState(db.Model):
+    """Last imported version of each file seen by ``flask import-library``"""
+    path = db.Column(db.String(500), primary_key=True)
+    mtime_ns = db.Column(db.BigInteger, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    song_id = db.Column(db.Integer, db.ForeignKey('song.id', ondelete='SET NULL'))
+
+class PlayEvent(db.Model):
+    """Append-only play history, trimmed by ``flask compact-play-history``"""
+    __table_args__ = (
+        db.Index('ix_play_event_user_id_id', 'user_id', 'id'),
+        db.Index('ix_play_event_played_at', 'played_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     song_id = db.Column(db.Integer, db.ForeignKey('song.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    played_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class CacheVersion(db.Model):
+    """Version counters that key the shared HTTP response cache"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -1,17 +1,74 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+
 import deezer
 
+from api_cache import cached
+
+# Seconds each kind of Deezer response stays fresh in the cache
+CACHE_TTLS = {
+    'search_tracks': 300,
+    'get_track': 24 * 3600,
+    'get_artist_top_tracks': 3600,
+    'get_trending': 600,
+}
+
+# Upper bounds for get_tracks batch lookups
+MAX_BATCH_SIZE = 50
+BATCH_WORKERS = 8
+BATCH_TIMEOUT = 5.0
+
+
+def observed(operation):
+    """Report the duration and outcome of the decorated method to ``self.observer``
+
+    Place it under ``@cached`` so only lookups that reach Deezer are timed.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.observer is None:
+                return func(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                self.observer(operation, time.perf_counter() - started, True)
+                raise
+            self.observer(operation, time.perf_counter() - started, 'error' in result)
+            return result
+
+        return wrapper
+
+    return decorator
+
 
 class MusicAPIService:
-    def __init__(self):
-        """Initialize Deezer client - no API key needed for public endpoints!"""
-        self.client = deezer.Client()
+    def __init__(self, client=None, cache=None, observer=None):
+        """Initialize Deezer client - no API key needed for public endpoints!
 
+        ``client`` can be any object with the ``deezer.Client`` interface,
+        which lets tests pass a fake. ``cache`` is an optional
+        ``api_cache.ResponseCache``. ``observer`` is called as
+        ``observer(operation, seconds, error)`` after each Deezer lookup.
+        """
+        self.client = client if client is not None else deezer.Client()
+        self.cache = cache
+        self.observer = observer
+        self._executor = None
+
+    @cached('search_tracks')
+    @observed('search_tracks')
     def search_tracks(self, query, limit=10):
         """Search for tracks on Deezer"""
         try:
             results = self.client.search(query)
             tracks = []
-            for track in list(results)[:limit]:
+            # Deezer results are paginated; stop fetching pages once we have enough
+            for track in islice(results, limit):
                 tracks.append({
                     'id': track.id,
                     'title': track.title,
@@ -30,6 +87,8 @@ class MusicAPIService:
         except Exception as e:
             return {'error': str(e)}
 
+    @cached('get_track')
+    @observed('get_track')
     def get_track(self, track_id):
         """Get specific track details"""
         try:
@@ -49,13 +108,52 @@ class MusicAPIService:
         except Exception as e:
             return {'error': str(e)}
 
+    def submit(self, func, *args, **kwargs):
+        """Run ``func`` on the shared Deezer thread pool and return its future"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='deezer')
+        return self._executor.submit(func, *args, **kwargs)
+
+    def get_tracks(self, track_ids, timeout=BATCH_TIMEOUT):
+        """Get details for many tracks concurrently
+
+        Lookups run on a bounded thread pool and share the ``get_track``
+        cache. Tracks that fail or do not finish within ``timeout`` seconds
+        are reported under ``errors`` instead of failing the whole batch.
+        Raises ValueError for more than MAX_BATCH_SIZE distinct ids.
+        """
+        track_ids = list(dict.fromkeys(track_ids))
+        if len(track_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f'At most {MAX_BATCH_SIZE} track ids per request')
+        futures = {track_id: self.submit(self.get_track, track_id) for track_id in track_ids}
+        wait(futures.values(), timeout=timeout)
+
+        tracks = []
+        errors = {}
+        for track_id, future in futures.items():
+            if not future.done():
+                future.cancel()
+                errors[track_id] = 'Timed out'
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'error': str(e)}
+            if 'error' in result:
+                errors[track_id] = result['error']
+            else:
+                tracks.append(result)
+        return {'data': tracks, 'errors': errors, 'platform': 'deezer'}
+
+    @cached('get_artist_top_tracks')
+    @observed('get_artist_top_tracks')
     def get_artist_top_tracks(self, artist_id, limit=5):
         """Get top tracks for an artist"""
         try:
             artist = self.client.get_artist(artist_id)
             tracks = artist.get_top()
             result = []
-            for track in list(tracks)[:limit]:
+            for track in islice(tracks, limit):
                 result.append({
                     'id': track.id,
                     'title': track.title,
@@ -66,6 +164,7 @@ class MusicAPIService:
         except Exception as e:
             return {'error': str(e)}
 
+    @cached('get_trending')
     def get_trending(self):
         """Get trending tracks (charts)"""
         try:
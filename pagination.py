@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page:
+    __slots__ = ('items', 'next_cursor')
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise InvalidCursor('Unknown cursor value')
+    return value
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for the sort key values of the last row"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, expected_length):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor('Malformed cursor') from e
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise InvalidCursor('Cursor does not match this sort order')
+    return [_decode_value(v) for v in values]
+
+
+def _after(keys, values):
+    """WHERE clause selecting rows that sort strictly after ``values``.
+
+    Expands the row comparison column by column so that keys may mix
+    ascending and descending order:
+    ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``.
+    """
+    clauses = []
+    for i, (expression, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        beyond = expression < values[i] if descending else expression > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value) if value is not None else default
+    except ValueError:
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_paginate(query, keys, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Fetch one page of ``query`` ordered by ``keys``.
+
+    ``keys`` is a list of ``(expression, descending)`` pairs that must end
+    with a unique column (usually the primary key) so the order is total.
+    Nullable columns should be wrapped in ``coalesce``. Rows keep the shape
+    of the original query; the sort key values are fetched as extra columns
+    and used to build ``next_cursor``, which is None on the last page.
+    """
+    width = len(query.column_descriptions)
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, len(keys))))
+    query = query.add_columns(*[expression for expression, _ in keys])
+    query = query.order_by(*[expression.desc() if descending else expression.asc()
+                             for expression, descending in keys])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][width:]))
+
+    if width == 1:
+        items = [row[0] for row in rows]
+    else:
+        items = [tuple(row[:width]) for row in rows]
+    return Page(items, next_cursor)
@@ -0,0 +1,133 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class PlayCounter:
+    """Write-behind aggregator for song play counts.
+
+    ``record()`` only touches an in-memory dict. A background thread
+    coalesces the increments per song and applies them in a single
+    ``UPDATE song SET plays = plays + ?`` transaction once
+    ``PLAY_FLUSH_SIZE`` plays are pending or ``PLAY_FLUSH_INTERVAL``
+    seconds have passed, whichever comes first. Pending plays are flushed
+    at interpreter exit.
+
+    Functions in ``flush_listeners`` are called as ``listener(connection,
+    pending)`` inside the flush transaction, where ``pending`` maps song id
+    to the number of plays being added.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 5.0
+        self.flush_size = 500
+        self._pending = {}
+        self._pending_plays = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flush_listeners = []
+        self.metrics = {
+            'recorded': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failures': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PLAY_FLUSH_INTERVAL', 5.0)
+        app.config.setdefault('PLAY_FLUSH_SIZE', 500)
+        self.flush_interval = app.config['PLAY_FLUSH_INTERVAL']
+        self.flush_size = app.config['PLAY_FLUSH_SIZE']
+        app.extensions['play_counter'] = self
+        atexit.register(self.flush)
+
+    def record(self, song_id, count=1):
+        """Buffer ``count`` plays of ``song_id``"""
+        self._ensure_thread()
+        with self._lock:
+            self._pending[song_id] = self._pending.get(song_id, 0) + count
+            self._pending_plays += count
+            self.metrics['recorded'] += count
+            full = self._pending_plays >= self.flush_size
+        if full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so pre-forking servers start one per worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='play-counter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush play counts')
+
+    def flush(self):
+        """Apply every buffered increment in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_plays = 0
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(
+                            text('UPDATE song SET plays = COALESCE(plays, 0) + :count WHERE id = :id'),
+                            [{'id': song_id, 'count': count} for song_id, count in pending.items()]
+                        )
+                        for listener in self.flush_listeners:
+                            listener(connection, pending)
+            except Exception:
+                # Put the increments back so the next flush retries them
+                with self._lock:
+                    for song_id, count in pending.items():
+                        self._pending[song_id] = self._pending.get(song_id, 0) + count
+                        self._pending_plays += count
+                    self.metrics['failures'] += 1
+                raise
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.metrics['flushes'] += 1
+                self.metrics['flushed'] += sum(pending.values())
+                self.metrics['last_flush_ms'] = round(elapsed_ms, 3)
+                self.metrics['max_flush_ms'] = round(max(self.metrics['max_flush_ms'], elapsed_ms), 3)
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats['backlog_songs'] = len(self._pending)
+            stats['backlog_plays'] = self._pending_plays
+        return stats
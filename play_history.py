@@ -0,0 +1,105 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, PlayEvent
+
+_INSERT = text('INSERT INTO play_event (user_id, song_id, played_at) VALUES (:user_id, :song_id, :played_at)')
+
+
+class PlayHistory:
+    """Append-only log of who played what.
+
+    ``record()`` appends to an in-memory buffer that is written with one
+    executemany INSERT inside the PlayCounter flush transaction; register
+    ``write`` as a PlayCounter flush listener. Reads take the newest rows
+    of one user from the ``(user_id, id)`` index, so they cost O(window)
+    whatever the table size, and merge in events still waiting in the
+    buffer. ``compact()`` enforces retention by age and by a per-user cap.
+    """
+
+    def __init__(self, app=None):
+        self.dedupe_seconds = 30
+        self.retention_days = 90
+        self.per_user = 500
+        self._buffer = []
+        self._last = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PLAY_HISTORY_DEDUPE_SECONDS', 30)
+        app.config.setdefault('PLAY_HISTORY_RETENTION_DAYS', 90)
+        app.config.setdefault('PLAY_HISTORY_PER_USER', 500)
+        self.dedupe_seconds = app.config['PLAY_HISTORY_DEDUPE_SECONDS']
+        self.retention_days = app.config['PLAY_HISTORY_RETENTION_DAYS']
+        self.per_user = app.config['PLAY_HISTORY_PER_USER']
+        app.extensions['play_history'] = self
+
+    def record(self, user_id, song_id):
+        """Buffer a play; returns False if it repeats the user's last play within the dedupe window.
+
+        Opening the player page and starting the stream both report the
+        same play, so only the first one inside the window counts.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(user_id)
+            if last is not None and last[0] == song_id and now - last[1] < self.dedupe_seconds:
+                return False
+            self._last[user_id] = (song_id, now)
+            self._buffer.append({'user_id': user_id, 'song_id': song_id, 'played_at': datetime.utcnow()})
+        return True
+
+    def write(self, connection, pending=None):
+        """Insert buffered events using ``connection``'s transaction"""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return
+        try:
+            connection.execute(_INSERT, events)
+        except Exception:
+            with self._lock:
+                self._buffer[:0] = events
+            raise
+
+    def recent(self, user_id, window=200):
+        """``(song_id, played_at)`` pairs of a user's last ``window`` plays, newest first"""
+        with self._lock:
+            buffered = [(e['song_id'], e['played_at']) for e in reversed(self._buffer) if e['user_id'] == user_id]
+        rows = db.session.query(PlayEvent.song_id, PlayEvent.played_at).filter(PlayEvent.user_id == user_id) \
+            .order_by(PlayEvent.id.desc()).limit(window).all()
+        return (buffered + [tuple(row) for row in rows])[:window]
+
+    def compact(self):
+        """Drop events past the retention age and beyond each user's newest ``per_user``.
+
+        Returns the number of rows removed.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        with db.engine.begin() as connection:
+            expired = connection.execute(text('DELETE FROM play_event WHERE played_at < :cutoff'),
+                                         {'cutoff': cutoff}).rowcount
+            trimmed = connection.execute(text(
+                'DELETE FROM play_event WHERE id IN (SELECT id FROM ('
+                'SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS position '
+                'FROM play_event) WHERE position > :keep)'
+            ), {'keep': self.per_user}).rowcount
+        with self._lock:
+            # Forget dedupe state of idle users
+            horizon = time.monotonic() - self.dedupe_seconds
+            self._last = {user: last for user, last in self._last.items() if last[1] >= horizon}
+        return expired + trimmed
+
+
+def dedupe_consecutive(plays):
+    """Collapse runs of the same song into their newest play"""
+    result = []
+    for song_id, played_at in plays:
+        if not result or result[-1][0] != song_id:
+            result.append((song_id, played_at))
+    return result
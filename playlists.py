@@ -0,0 +1,132 @@
+from sqlalchemy import bindparam, func, select, text
+
+from models import db, Playlist, playlist_songs
+
+# Most song ids one bulk edit accepts; every id becomes a bound parameter
+MAX_BULK_SONGS = 5000
+
+_APPEND = text(
+    'INSERT INTO playlist_songs (playlist_id, song_id, position) '
+    'SELECT :playlist_id, :song_id, COALESCE(MAX(position), -1) + 1 FROM playlist_songs '
+    'WHERE playlist_id = :playlist_id'
+)
+_MEMBERS = text(
+    'SELECT song_id FROM playlist_songs WHERE playlist_id = :playlist_id AND song_id IN :song_ids'
+).bindparams(bindparam('song_ids', expanding=True))
+_EXISTING_SONGS = text('SELECT id FROM song WHERE id IN :song_ids').bindparams(bindparam('song_ids', expanding=True))
+_REMOVE = text(
+    'DELETE FROM playlist_songs WHERE playlist_id = :playlist_id AND song_id IN :song_ids'
+).bindparams(bindparam('song_ids', expanding=True))
+_ANCHOR = text(
+    'SELECT position FROM playlist_songs WHERE playlist_id = :playlist_id AND song_id NOT IN :song_ids '
+    'ORDER BY position, song_id LIMIT 1 OFFSET :index'
+).bindparams(bindparam('song_ids', expanding=True))
+_SHIFT = text(
+    'UPDATE playlist_songs SET position = position + :count '
+    'WHERE playlist_id = :playlist_id AND position >= :position AND song_id NOT IN :song_ids'
+).bindparams(bindparam('song_ids', expanding=True))
+_TIES = text('SELECT COUNT(*) FROM playlist_songs WHERE playlist_id = :playlist_id AND position = :position')
+_END = text('SELECT COALESCE(MAX(position), -1) + 1 FROM playlist_songs WHERE playlist_id = :playlist_id')
+_SONG_IDS = text('SELECT song_id FROM playlist_songs WHERE playlist_id = :playlist_id ORDER BY position, song_id')
+_PLACE = text('UPDATE playlist_songs SET position = :position WHERE playlist_id = :playlist_id AND song_id = :song_id')
+
+
+class InvalidSongList(ValueError):
+    pass
+
+
+def parse_song_ids(data, key='song_ids'):
+    """Song ids of a bulk edit body ``{"song_ids": [...]}``, duplicates dropped, order kept"""
+    song_ids = (data or {}).get(key)
+    if not isinstance(song_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in song_ids):
+        raise InvalidSongList(f'{key} must be a list of integers')
+    if len(song_ids) > MAX_BULK_SONGS:
+        raise InvalidSongList(f'At most {MAX_BULK_SONGS} song ids per request')
+    return list(dict.fromkeys(song_ids))
+
+
+def song_count_column():
+    """Correlated ``COUNT(*)`` of a playlist's songs, to add to a Playlist query"""
+    return select(func.count()).select_from(playlist_songs) \
+        .where(playlist_songs.c.playlist_id == Playlist.id).correlate(Playlist).scalar_subquery()
+
+
+def song_count(playlist_id):
+    return db.session.query(func.count()).select_from(playlist_songs) \
+        .filter(playlist_songs.c.playlist_id == playlist_id).scalar()
+
+
+def song_ids(playlist_id):
+    """Every song id of the playlist in play order, read from the position index alone"""
+    return list(db.session.execute(_SONG_IDS, {'playlist_id': playlist_id}).scalars())
+
+
+def add_songs(playlist_id, song_ids):
+    """Append the songs that exist and are not yet in the playlist; returns their ids.
+
+    Membership is checked on the ``(playlist_id, song_id)`` primary key and
+    each row takes the next position from the ``(playlist_id, position, song_id)``
+    index, so the cost does not depend on the size of the playlist.
+    """
+    if not song_ids:
+        return []
+    session = db.session
+    existing = set(session.execute(_EXISTING_SONGS, {'song_ids': song_ids}).scalars())
+    members = set(session.execute(_MEMBERS, {'playlist_id': playlist_id, 'song_ids': song_ids}).scalars())
+    added = [song_id for song_id in song_ids if song_id in existing and song_id not in members]
+    if added:
+        session.execute(_APPEND, [{'playlist_id': playlist_id, 'song_id': song_id} for song_id in added])
+    return added
+
+
+def remove_songs(playlist_id, song_ids):
+    """Remove the songs from the playlist; returns how many were members.
+
+    Positions are left with gaps; only their order matters.
+    """
+    if not song_ids:
+        return 0
+    return db.session.execute(_REMOVE, {'playlist_id': playlist_id, 'song_ids': song_ids}).rowcount
+
+
+def move_songs(playlist_id, song_ids, index=None):
+    """Move member songs, in the given order, to ``index`` among the others.
+
+    ``index`` counts the songs that are not moved (0 moves to the top);
+    None or an index past the end moves them to the end. Only the songs
+    after the insertion point are renumbered, in one UPDATE, unless other
+    songs share the anchor's position. Returns the ids that were moved.
+    """
+    session = db.session
+    params = {'playlist_id': playlist_id, 'song_ids': song_ids}
+    members = set(session.execute(_MEMBERS, params).scalars()) if song_ids else set()
+    moved = [song_id for song_id in song_ids if song_id in members]
+    if not moved:
+        return []
+
+    position = None
+    if index is not None:
+        anchor = dict(params, index=max(index, 0))
+        position = session.execute(_ANCHOR, anchor).scalar()
+        if position is not None and session.execute(_TIES, dict(params, position=position)).scalar() > 1:
+            # Rows added through Playlist.songs all have position 0; the shift
+            # below needs the anchor's position to be its own
+            renumber(playlist_id)
+            position = session.execute(_ANCHOR, anchor).scalar()
+    if position is None:
+        position = session.execute(_END, {'playlist_id': playlist_id}).scalar()
+    else:
+        session.execute(_SHIFT, dict(params, count=len(moved), position=position))
+    session.execute(_PLACE, [{'playlist_id': playlist_id, 'song_id': song_id, 'position': position + i}
+                             for i, song_id in enumerate(moved)])
+    return moved
+
+
+def renumber(playlist_id):
+    """Give every song of the playlist its own position, keeping the play order"""
+    db.session.execute(_PLACE, [{'playlist_id': playlist_id, 'song_id': song_id, 'position': position}
+                                for position, song_id in enumerate(song_ids(playlist_id))])
+
+
+def clear(playlist_id):
+    db.session.execute(playlist_songs.delete().where(playlist_songs.c.playlist_id == playlist_id))
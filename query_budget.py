@@ -0,0 +1,93 @@
+import functools
+import logging
+import threading
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Declared budgets by endpoint name, filled in by the query_budget decorator
+QUERY_BUDGETS = {}
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """Record every SQL statement executed on this thread while active"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        if not hasattr(_local, 'counters'):
+            _local.counters = []
+        _local.counters.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.counters.remove(self)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_local, 'counters', ()):
+        counter.statements.append(statement)
+
+
+def _exceeded_message(name, budget, counter):
+    statements = '\n'.join(f'  {i}. {s}' for i, s in enumerate(counter.statements, 1))
+    return f'{name} ran {counter.count} queries, budget is {budget}:\n{statements}'
+
+
+def query_budget(max_queries):
+    """Declare how many SQL queries a view may run.
+
+    When ``QUERY_BUDGET_ENFORCE`` is set (e.g. under test) a view that goes
+    over budget raises QueryBudgetExceeded; otherwise a warning is logged.
+    """
+
+    def decorator(view):
+        QUERY_BUDGETS[view.__name__] = max_queries
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryCounter() as counter:
+                response = view(*args, **kwargs)
+            if counter.count > max_queries:
+                message = _exceeded_message(request.endpoint, max_queries, counter)
+                if current_app.config.get('QUERY_BUDGET_ENFORCE'):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def assert_query_budget(client, url, max_queries=None, **kwargs):
+    """Request ``url`` with a test client and fail if it runs too many queries.
+
+    Uses the budget declared on the endpoint unless ``max_queries`` is given.
+    Queries issued while loading the logged-in user are included.
+    """
+    app = client.application
+    with app.test_request_context(url):
+        endpoint = request.url_rule.endpoint if request.url_rule else url
+    budget = max_queries if max_queries is not None else QUERY_BUDGETS[endpoint]
+
+    with QueryCounter() as counter:
+        response = client.get(url, **kwargs)
+    if counter.count > budget:
+        raise QueryBudgetExceeded(_exceeded_message(endpoint, budget, counter))
+    return response
@@ -0,0 +1,262 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ('item_ids', 'indptr', 'indices', 'scores')
+
+# Neighbours kept per song, and the largest basket whose pairs are counted
+# (pairs grow quadratically; longer baskets only use their first songs, in
+# the order build_model is given them)
+NEIGHBOURS = 50
+MAX_BASKET_SIZE = 500
+# Pairs expanded at a time while counting; a chunk of baskets is counted
+# and merged before the next one is expanded
+PAIR_CHUNK = 4_000_000
+
+
+def _basket_pairs(items, starts, sizes):
+    """Every ordered pair of entries that share a basket, as two item arrays"""
+    entry_sizes = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(len(items)), entry_sizes)
+    first_pair = np.cumsum(entry_sizes) - entry_sizes
+    offsets = np.arange(len(left)) - np.repeat(first_pair, entry_sizes)
+    right = np.repeat(np.repeat(starts, sizes), entry_sizes) + offsets
+    return items[left], items[right]
+
+
+def _merge_counts(parts):
+    keys, counts = zip(*parts)
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    return keys, np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+
+
+def _cooccurrence(baskets, items):
+    """Count how often each ordered pair of distinct items shares a basket.
+
+    ``baskets`` and ``items`` are parallel arrays with one entry per
+    membership; each basket keeps its first ``MAX_BASKET_SIZE`` entries in
+    the given order. Returns ``(left, right, count)`` arrays sorted by
+    left item.
+    """
+    order = np.argsort(baskets, kind='stable')
+    baskets, items = baskets[order], items[order]
+    starts = np.flatnonzero(np.r_[True, baskets[1:] != baskets[:-1]])
+    sizes = np.diff(np.r_[starts, len(baskets)])
+
+    keep = np.arange(len(items)) - np.repeat(starts, sizes) < MAX_BASKET_SIZE
+    if not keep.all():
+        baskets, items = baskets[keep], items[keep]
+        starts = np.flatnonzero(np.r_[True, baskets[1:] != baskets[:-1]])
+        sizes = np.diff(np.r_[starts, len(baskets)])
+
+    # Group consecutive baskets into chunks of about PAIR_CHUNK pairs
+    pairs = sizes.astype(np.int64) ** 2
+    chunks = (np.cumsum(pairs) - pairs) // PAIR_CHUNK
+    bounds = np.r_[np.flatnonzero(np.r_[True, chunks[1:] != chunks[:-1]]), len(sizes)]
+
+    n_items = int(items.max()) + 1
+    parts, pending = [], 0
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        begin, end = starts[first], starts[last - 1] + sizes[last - 1]
+        a, b = _basket_pairs(items[begin:end], starts[first:last] - begin, sizes[first:last])
+        distinct = a != b
+        parts.append(np.unique(a[distinct].astype(np.int64) * n_items + b[distinct], return_counts=True))
+        pending += len(parts[-1][0])
+        if pending > PAIR_CHUNK and len(parts) > 1:
+            parts = [_merge_counts(parts)]
+            pending = len(parts[0][0])
+    keys, counts = _merge_counts(parts)
+    return keys // n_items, keys % n_items, counts
+
+
+def build_model(baskets, song_ids, neighbours=NEIGHBOURS):
+    """Item-item cosine similarity as CSR arrays, keeping the top ``neighbours`` per song"""
+    if not len(song_ids):
+        empty = np.zeros(0, dtype=np.int64)
+        return {'item_ids': empty, 'indptr': np.zeros(1, dtype=np.int64),
+                'indices': empty.astype(np.int32), 'scores': empty.astype(np.float32)}
+
+    item_ids, items = np.unique(song_ids, return_inverse=True)
+    n_items = len(item_ids)
+    # Drop repeated memberships, keeping the order the songs were given in
+    first = np.sort(np.unique(baskets * n_items + items, return_index=True)[1])
+    baskets, items = baskets[first], items[first]
+
+    left, right, counts = _cooccurrence(baskets, items)
+    popularity = np.bincount(items, minlength=n_items).astype(np.float64)
+    scores = counts / np.sqrt(popularity[left] * popularity[right])
+
+    # Best neighbours first within each row, then cut each row to ``neighbours``.
+    # Scores are in (0, 1], so ``left + (1 - score) / 2`` sorts by row and then
+    # by descending score in one argsort, which is much faster than lexsort.
+    order = np.argsort(left + (1 - scores) / 2)
+    left, right, scores = left[order], right[order], scores[order]
+    row_starts = np.searchsorted(left, np.arange(n_items))
+    rank = np.arange(len(left)) - row_starts[left]
+    keep = rank < neighbours
+    left, right, scores = left[keep], right[keep], scores[keep]
+
+    indptr = np.zeros(n_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(left, minlength=n_items), out=indptr[1:])
+    return {
+        'item_ids': item_ids.astype(np.int64),
+        'indptr': indptr,
+        'indices': right.astype(np.int32),
+        'scores': scores.astype(np.float32),
+    }
+
+
+class Recommender:
+    """Precomputed "people who saved this also saved" recommendations.
+
+    Every user's favorites and every playlist is a basket of songs. A build
+    turns the baskets into a song-song similarity matrix with NumPy and
+    writes its CSR arrays to a new version directory under
+    ``RECOMMENDER_PATH``; ``CURRENT`` names the live version. Workers load
+    the arrays with ``mmap_mode='r'``, so the pages are shared between
+    processes, and pick up a new version within ``RELOAD_INTERVAL`` seconds.
+    A model older than ``RECOMMENDER_REBUILD_INTERVAL`` is rebuilt in a
+    background thread; ``flask build-recommendations`` rebuilds on demand.
+    """
+
+    RELOAD_INTERVAL = 30
+    KEEP_VERSIONS = 2
+
+    def __init__(self, app=None):
+        self.app = None
+        self.path = None
+        self.rebuild_interval = 3600
+        self._model = None
+        self._version = None
+        self._built_at = 0
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('RECOMMENDER_PATH', os.path.join(app.instance_path, 'recommender'))
+        app.config.setdefault('RECOMMENDER_REBUILD_INTERVAL', 3600)
+        self.path = app.config['RECOMMENDER_PATH']
+        self.rebuild_interval = app.config['RECOMMENDER_REBUILD_INTERVAL']
+        app.extensions['recommender'] = self
+
+    def build(self):
+        """Rebuild the model from the database and publish it; returns the number of songs"""
+        with db.engine.connect() as connection:
+            # Baskets beyond MAX_BASKET_SIZE keep the latest favorites and a playlist's first songs
+            rows = connection.execute(text(
+                'SELECT basket, song_id FROM ('
+                'SELECT user_id * 2 AS basket, song_id, '
+                'ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, song_id) AS ordinal '
+                'FROM favorite '
+                'UNION ALL SELECT playlist_id * 2 + 1, song_id, '
+                'ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position, song_id) '
+                'FROM playlist_songs'
+                ') AS memberships WHERE ordinal <= :limit ORDER BY basket, ordinal'
+            ), {'limit': MAX_BASKET_SIZE}).all()
+        memberships = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        model = build_model(memberships[:, 0], memberships[:, 1])
+
+        os.makedirs(self.path, exist_ok=True)
+        version = f'{time.time_ns()}-{os.getpid()}'
+        directory = os.path.join(self.path, version)
+        os.makedirs(directory)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), model[name])
+        temp = os.path.join(self.path, f'.CURRENT-{version}')
+        with open(temp, 'w') as f:
+            f.write(version)
+        os.replace(temp, os.path.join(self.path, 'CURRENT'))
+        self._prune(version)
+        return len(model['item_ids'])
+
+    def _prune(self, current):
+        versions = sorted(name for name in os.listdir(self.path)
+                          if not name.startswith('.') and name != 'CURRENT' and name != current)
+        for name in versions[:max(0, len(versions) - self.KEEP_VERSIONS + 1)]:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _load(self):
+        now = time.monotonic()
+        if self._model is not None and now - self._checked_at < self.RELOAD_INTERVAL:
+            return self._model
+        self._checked_at = now
+        try:
+            with open(os.path.join(self.path, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if version != self._version:
+            directory = os.path.join(self.path, version)
+            try:
+                model = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+            except (FileNotFoundError, ValueError):
+                logger.exception('Could not load recommender version %s', version)
+                return self._model
+            with self._lock:
+                self._model, self._version = model, version
+                self._built_at = int(version.split('-')[0]) / 1e9
+        return self._model
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                with self.app.app_context():
+                    self.build()
+            except Exception:
+                logger.exception('Failed to rebuild recommendations')
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+                    self._checked_at = 0
+
+        threading.Thread(target=rebuild, name='recommender-build', daemon=True).start()
+
+    def recommend(self, seed_song_ids, limit=10):
+        """Song ids most similar to ``seed_song_ids``, best first, excluding the seeds.
+
+        Returns an empty list when there is no model yet or none of the
+        seeds co-occur with anything, so callers can fall back.
+        """
+        model = self._load()
+        if self.rebuild_interval and (model is None or time.time() - self._built_at > self.rebuild_interval):
+            self._schedule_rebuild()
+        if model is None or not len(seed_song_ids) or not len(model['item_ids']):
+            return []
+
+        item_ids, indptr = model['item_ids'], model['indptr']
+        seeds = np.unique(np.asarray(seed_song_ids, dtype=np.int64))
+        positions = np.minimum(np.searchsorted(item_ids, seeds), len(item_ids) - 1)
+        rows = positions[item_ids[positions] == seeds]
+        if not len(rows):
+            return []
+
+        slices = [slice(indptr[row], indptr[row + 1]) for row in rows]
+        neighbours = np.concatenate([model['indices'][s] for s in slices])
+        weights = np.concatenate([model['scores'][s] for s in slices])
+        candidates, inverse = np.unique(neighbours, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights)
+        fresh = ~np.isin(candidates, rows)
+        candidates, totals = candidates[fresh], totals[fresh]
+        if len(candidates) > limit:
+            top = np.argpartition(-totals, limit)[:limit]
+            candidates, totals = candidates[top], totals[top]
+        order = np.lexsort((candidates, -totals))
+        return item_ids[candidates[order]].tolist()
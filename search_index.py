@@ -0,0 +1,199 @@
+import re
+
+from flask import current_app
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Song, Artist, Album
+
+# Rows of every kind live in one FTS5 table. The rowid encodes both the
+# kind and the source primary key so that updates and deletes are point
+# lookups instead of scans over the index.
+KIND_SONG = 0
+KIND_ARTIST = 1
+KIND_ALBUM = 2
+
+TABLE = 'search_index'
+
+# bm25 column weights: title, artist, album, genre
+RANK = f'bm25({TABLE}, 10.0, 5.0, 3.0, 1.0)'
+
+_SELECT_SONGS = f"""
+    SELECT s.id * 4 + {KIND_SONG}, s.title, COALESCE(ar.name, ''), COALESCE(al.title, ''), COALESCE(al.genre, '')
+    FROM song s
+    LEFT JOIN artist ar ON ar.id = s.artist_id
+    LEFT JOIN album al ON al.id = s.album_id
+"""
+
+_SELECT_ARTISTS = f"""
+    SELECT ar.id * 4 + {KIND_ARTIST}, ar.name, ar.name, '', ''
+    FROM artist ar
+"""
+
+_SELECT_ALBUMS = f"""
+    SELECT al.id * 4 + {KIND_ALBUM}, al.title, COALESCE(ar.name, ''), al.title, COALESCE(al.genre, '')
+    FROM album al
+    LEFT JOIN artist ar ON ar.id = al.artist_id
+"""
+
+
+def build_match_query(query):
+    """Turn free text typed by a user into a safe FTS5 prefix query"""
+    terms = re.findall(r'\w+', query or '', re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def fts5_available(connection):
+    """True if the connection is SQLite and its build has the FTS5 extension"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        connection.execute(text('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)'))
+    except OperationalError:
+        return False
+    connection.execute(text('DROP TABLE temp.fts5_probe'))
+    return True
+
+
+def create(connection):
+    """Create the FTS5 table if it does not exist yet; returns whether it was created"""
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': TABLE}).first() is not None
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "title, artist, album, genre, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+    return not exists
+
+
+def fill(connection):
+    """Replace every indexed row with the library tables' contents; returns the row count"""
+    connection.execute(text(f'DELETE FROM {TABLE}'))
+    for select in (_SELECT_SONGS, _SELECT_ARTISTS, _SELECT_ALBUMS):
+        connection.execute(text(f'INSERT INTO {TABLE}(rowid, title, artist, album, genre) {select}'))
+    connection.execute(text(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"))
+    return connection.execute(text(f'SELECT COUNT(*) FROM {TABLE}')).scalar()
+
+
+class SearchIndex:
+    """Full-text index for the /search endpoint.
+
+    The index is kept in sync with the ORM through mapper events, so any
+    insert, update or delete of a Song, Artist or Album that goes through
+    the session is reflected in the same transaction. Bulk ``query.delete()``
+    or raw SQL bypasses the events; run ``flask rebuild-search-index`` after
+    those.
+
+    The table is created and filled at start-up when it does not exist, and
+    filled once by migration 8 on databases that had it created empty. It
+    is only used when SQLite was built with FTS5; otherwise /search falls
+    back to substring matching.
+    """
+
+    def __init__(self, app=None):
+        self.available = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['search_index'] = self
+        with app.app_context():
+            with db.engine.begin() as connection:
+                self.available = fts5_available(connection)
+                # Before create_all() there is nothing to index yet; migration 8 fills it then
+                if self.available and create(connection) and inspect(connection).has_table('song'):
+                    fill(connection)
+
+    def rebuild(self):
+        """Drop every indexed row and repopulate from the library tables"""
+        with db.engine.begin() as connection:
+            create(connection)
+            return fill(connection)
+
+    def search(self, query, kind, limit=20, offset=0):
+        """Return ranked ``(id, title, artist, album)`` rows of one kind"""
+        match = build_match_query(query)
+        if not match:
+            return []
+        rows = db.session.execute(text(
+            f"SELECT rowid >> 2 AS id, title, artist, album FROM {TABLE} "
+            f"WHERE {TABLE} MATCH :match AND (rowid & 3) = :kind "
+            f"ORDER BY {RANK} LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'kind': kind, 'limit': limit, 'offset': offset})
+        return rows.all()
+
+
+def _indexed(connection):
+    """True if the FTS5 table is maintained, i.e. SQLite has FTS5"""
+    search_index = current_app.extensions.get('search_index')
+    return search_index is not None and search_index.available
+
+
+def _changed(obj, *attrs):
+    """True if any of the indexed attributes changed in this flush"""
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _replace(connection, select, where, params, delete_rowids):
+    connection.execute(text(f'DELETE FROM {TABLE} WHERE rowid IN ({delete_rowids})'), params)
+    connection.execute(text(f'INSERT INTO {TABLE}(rowid, title, artist, album, genre) {select} WHERE {where}'), params)
+
+
+def _delete(connection, rowid):
+    connection.execute(text(f'DELETE FROM {TABLE} WHERE rowid = :rowid'), {'rowid': rowid})
+
+
+@event.listens_for(Song, 'after_insert')
+@event.listens_for(Song, 'after_update')
+def _index_song(mapper, connection, song):
+    # Play count updates are by far the most common write; skip them
+    if _indexed(connection) and _changed(song, 'title', 'artist_id', 'album_id'):
+        _replace(connection, _SELECT_SONGS, 's.id = :id', {'id': song.id},
+                 f':id * 4 + {KIND_SONG}')
+
+
+@event.listens_for(Artist, 'after_insert')
+@event.listens_for(Artist, 'after_update')
+def _index_artist(mapper, connection, artist):
+    if not _indexed(connection) or not _changed(artist, 'name'):
+        return
+    params = {'id': artist.id}
+    _replace(connection, _SELECT_ARTISTS, 'ar.id = :id', params, f':id * 4 + {KIND_ARTIST}')
+    # The artist name is denormalized into album and song rows
+    _replace(connection, _SELECT_ALBUMS, 'al.artist_id = :id', params,
+             f'SELECT id * 4 + {KIND_ALBUM} FROM album WHERE artist_id = :id')
+    _replace(connection, _SELECT_SONGS, 's.artist_id = :id', params,
+             f'SELECT id * 4 + {KIND_SONG} FROM song WHERE artist_id = :id')
+
+
+@event.listens_for(Album, 'after_insert')
+@event.listens_for(Album, 'after_update')
+def _index_album(mapper, connection, album):
+    if not _indexed(connection) or not _changed(album, 'title', 'genre', 'artist_id'):
+        return
+    params = {'id': album.id}
+    _replace(connection, _SELECT_ALBUMS, 'al.id = :id', params, f':id * 4 + {KIND_ALBUM}')
+    # Album title and genre are denormalized into song rows
+    _replace(connection, _SELECT_SONGS, 's.album_id = :id', params,
+             f'SELECT id * 4 + {KIND_SONG} FROM song WHERE album_id = :id')
+
+
+@event.listens_for(Song, 'after_delete')
+def _unindex_song(mapper, connection, song):
+    if _indexed(connection):
+        _delete(connection, song.id * 4 + KIND_SONG)
+
+
+@event.listens_for(Artist, 'after_delete')
+def _unindex_artist(mapper, connection, artist):
+    if _indexed(connection):
+        _delete(connection, artist.id * 4 + KIND_ARTIST)
+
+
+@event.listens_for(Album, 'after_delete')
+def _unindex_album(mapper, connection, album):
+    if _indexed(connection):
+        _delete(connection, album.id * 4 + KIND_ALBUM)
@@ -0,0 +1,125 @@
+import json
+from collections import namedtuple
+from urllib.parse import quote
+
+from flask import current_app, g, url_for
+
+from covers import SIZES
+from models import db, Song, Artist, Album
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used without it
+    orjson = None
+
+# Lightweight records for the JSON APIs. Queries select exactly these
+# columns, in this order, so no ORM objects or relationships are built.
+SongRecord = namedtuple('SongRecord', 'id title artist album duration plays cover_image')
+AlbumRecord = namedtuple('AlbumRecord', 'id title artist release_date cover_image')
+ArtistRecord = namedtuple('ArtistRecord', 'id name image songs_count')
+
+ARTIST_NAME = db.func.coalesce(Artist.name, 'Unknown')
+
+
+def song_query(*extra):
+    """Query of SongRecord columns, followed by ``extra`` columns"""
+    return db.session.query(Song.id, Song.title, ARTIST_NAME, Album.title, Song.duration, Song.plays,
+                            Album.cover_image, *extra) \
+        .select_from(Song).outerjoin(Artist, Artist.id == Song.artist_id).outerjoin(Album, Album.id == Song.album_id)
+
+
+def album_query():
+    return db.session.query(Album.id, Album.title, ARTIST_NAME, Album.release_date, Album.cover_image) \
+        .select_from(Album).outerjoin(Artist, Artist.id == Album.artist_id)
+
+
+def artist_query():
+    """ArtistRecord columns with the song count done in SQL"""
+    return db.session.query(Artist.id, Artist.name, Artist.image, db.func.count(Song.id)) \
+        .outerjoin(Song, Song.artist_id == Artist.id).group_by(Artist.id)
+
+
+def records(record_type, rows):
+    """Turn query rows into ``record_type``, ignoring any trailing extra columns"""
+    width = len(record_type._fields)
+    return [record_type._make(row[:width]) for row in rows]
+
+
+class URLBuilder:
+    """Per-request URL building for serializers.
+
+    ``url_for`` resolves the static and cover routes once per size; each
+    row then only concatenates strings. Cover digests are memoized for the
+    request, so a cover shared by many rows is looked up once.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, covers):
+        self.covers = covers
+        self.static_prefix = url_for('static', filename='')
+        # '/covers/md/-/-' minus the placeholders
+        self.cover_prefixes = {size: url_for('cover_thumbnail', size=size, digest='-', filename='-')[:-3]
+                               for size in SIZES}
+        self._digests = {}
+
+    def static(self, filename):
+        return self.static_prefix + quote(filename)
+
+    def cover(self, filename, size='md'):
+        """Same URL as ``CoverThumbnails.url``"""
+        filename = filename or 'default-album.jpg'
+        digest = self._digests.get(filename, self._MISSING)
+        if digest is self._MISSING:
+            digest = self._digests[filename] = self.covers.digest(filename)
+        if digest is None:
+            return f'{self.static_prefix}uploads/covers/{quote(filename)}'
+        return f'{self.cover_prefixes[size]}{digest}/{quote(filename)}'
+
+
+def url_builder():
+    """The URLBuilder of the current request"""
+    if 'url_builder' not in g:
+        g.url_builder = URLBuilder(current_app.extensions['cover_thumbnails'])
+    return g.url_builder
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_response(data, status=200):
+    """Encode ``data`` without Flask's key sorting, using orjson when installed"""
+    return current_app.response_class(dumps(data), status=status, mimetype='application/json')
+
+
+def song_json(song, urls, size='md'):
+    return {
+        'id': song.id,
+        'title': song.title,
+        'artist': song.artist,
+        'album': song.album or 'Single',
+        'duration': song.duration,
+        'cover_url': urls.cover(song.cover_image, size),
+    }
+
+
+def album_json(album, urls, size='md'):
+    return {
+        'id': album.id,
+        'title': album.title,
+        'artist': album.artist,
+        'year': album.release_date.year if album.release_date else None,
+        'cover_url': urls.cover(album.cover_image, size),
+    }
+
+
+def artist_json(artist, urls, size='md'):
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'image_url': urls.cover(artist.image or 'default-artist.jpg', size),
+        'songs_count': artist.songs_count,
+    }
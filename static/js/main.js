@@ -334,9 +334,12 @@ async function performSearch(query) {
     if (!query.trim()) return;
 
     try {
-        // Search local database
-        const localResponse = await fetch(`/search?q=${encodeURIComponent(query)}`);
-        const localResults = await localResponse.json();
+        // Suggestions from the in-memory index of the local library
+        const localResponse = await fetch(`/api/suggest?q=${encodeURIComponent(query)}&types=song&limit=5`);
+        const suggestions = (await localResponse.json()).suggestions || [];
+        const localResults = {
+            songs: suggestions.map(s => ({ id: s.id, title: s.name, artist: s.artist || 'Unknown' }))
+        };
 
         // Search Deezer API
         let deezerResults = { data: [] };
@@ -443,12 +446,30 @@ function displaySearchResults(localResults, deezerResults) {
     }
 }
 
-// Escape HTML to prevent XSS
+// Escape HTML to prevent XSS; quotes too, so the result is safe inside attribute values
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
 function escapeHtml(text) {
-    if (!text) return '';
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    if (text === null || text === undefined) return '';
+    return String(text).replace(/[&<>"']/g, char => HTML_ESCAPES[char]);
+}
+
+// Color the heart buttons of songs that are favorites, with one request for all of them
+async function markFavorites(songIds) {
+    if (!songIds.length) return;
+    try {
+        const response = await fetch(`/api/user/favorites/contains?ids=${songIds.join(',')}`);
+        if (!response.ok || response.redirected) return;
+        const data = await response.json();
+        data.favorites.forEach(songId => {
+            const button = document.querySelector(`[data-song-id="${songId}"] .favorite-btn`);
+            if (!button) return;
+            button.querySelector('i').className = 'fas fa-heart';
+            button.style.background = 'var(--primary)';
+        });
+    } catch (error) {
+        console.error('Error checking favorites:', error);
+    }
 }
 
 // Favorite functionality
@@ -544,7 +565,7 @@ function showNotification(message, type = 'info') {
 
     notification.innerHTML = `
         <i class="fas fa-${icon}"></i>
-        <span>${message}</span>
+        <span>${escapeHtml(message)}</span>
     `;
 
     document.body.appendChild(notification);
@@ -601,6 +622,7 @@ document.addEventListener('DOMContentLoaded', () => {
 window.playSong = playSong;
 window.playExternalSong = playExternalSong;
 window.toggleFavorite = toggleFavorite;
+window.markFavorites = markFavorites;
 window.createPlaylist = createPlaylist;
 window.addToPlaylist = addToPlaylist;
 window.togglePlay = togglePlay;
@@ -0,0 +1,98 @@
+document.addEventListener('DOMContentLoaded', function() {
+    loadDiscover();
+
+    // Add click handlers for mood cards
+    document.querySelectorAll('.mood-card').forEach(card => {
+        card.addEventListener('click', function() {
+            const mood = this.dataset.mood;
+            window.location.href = `/discover/mood/${mood}`;
+        });
+    });
+});
+
+const DISCOVER_SECTIONS = [
+    // [section, container, items shown, card, empty message, loading message]
+    ['trending', 'trending-songs', 5, createSongCard, 'No trending songs found', 'Loading trending songs...'],
+    ['new_releases', 'new-releases', 6, createAlbumCard, 'No new releases found', 'Loading new releases...'],
+    ['recommended', 'recommended-songs', 5, createSongCard, 'No recommendations found', 'Loading recommendations...'],
+    ['popular_artists', 'popular-artists', 6, createArtistCard, 'No artists found', 'Loading artists...'],
+    ['recently_played', 'recently-played', 10, createRecentItem, 'No recently played songs', null],
+];
+
+function loadDiscover() {
+    DISCOVER_SECTIONS.forEach(([, containerId, , , , loading]) => {
+        if (loading) {
+            document.getElementById(containerId).innerHTML =
+                `<div class="loading"><i class="fas fa-spinner"></i><p>${loading}</p></div>`;
+        }
+    });
+
+    // All sections come from one request
+    fetch('/api/discover')
+        .then(response => response.json())
+        .then(data => {
+            DISCOVER_SECTIONS.forEach(([section, containerId, count, createCard, empty]) => {
+                const container = document.getElementById(containerId);
+                const items = data[section] || [];
+                container.innerHTML = items.length === 0
+                    ? `<p class="no-results">${empty}</p>`
+                    : items.slice(0, count).map(createCard).join('');
+            });
+        })
+        .catch(error => {
+            console.error('Error loading discover page:', error);
+            DISCOVER_SECTIONS.forEach(([, containerId]) => {
+                document.getElementById(containerId).innerHTML = '<p class="error">Failed to load</p>';
+            });
+        });
+}
+
+function createSongCard(song) {
+    return `
+        <div class="song-card" data-song-id="${song.id}" onclick="playSong(${song.id})">
+            <img src="${escapeHtml(song.cover_url || '/static/default-album.jpg')}" alt="${escapeHtml(song.title)}">
+            <div class="song-info">
+                <h3>${escapeHtml(song.title)}</h3>
+                <p>${escapeHtml(song.artist)}</p>
+            </div>
+            <button class="play-btn" onclick="event.stopPropagation(); playSong(${song.id})">
+                <i class="fas fa-play"></i>
+            </button>
+        </div>
+    `;
+}
+
+function createAlbumCard(album) {
+    return `
+        <div class="album-card" onclick="window.location.href='/album/${album.id}'">
+            <img src="${escapeHtml(album.cover_url || '/static/default-album.jpg')}" alt="${escapeHtml(album.title)}">
+            <h4>${escapeHtml(album.title)}</h4>
+            <p>${escapeHtml(album.artist)}</p>
+        </div>
+    `;
+}
+
+function createArtistCard(artist) {
+    return `
+        <div class="artist-card" onclick="window.location.href='/artist/${artist.id}'">
+            <img src="${escapeHtml(artist.image_url || '/static/default-artist.jpg')}" alt="${escapeHtml(artist.name)}">
+            <h4>${escapeHtml(artist.name)}</h4>
+            <p>${artist.songs_count || 0} songs</p>
+        </div>
+    `;
+}
+
+function createRecentItem(song) {
+    return `
+        <div class="recent-item" onclick="playSong(${song.id})">
+            <img src="${escapeHtml(song.cover_url || '/static/default-album.jpg')}" alt="${escapeHtml(song.title)}">
+            <div class="recent-item-info">
+                <h4>${escapeHtml(song.title)}</h4>
+                <p>${escapeHtml(song.artist)}</p>
+            </div>
+            <button class="play-btn" onclick="event.stopPropagation(); playSong(${song.id})">
+                <i class="fas fa-play"></i>
+            </button>
+        </div>
+    `;
+}
@@ -0,0 +1,279 @@
+let currentSongToAdd = null;
+let favoritesView = 'grid';
+let favoritesSort = 'recent';
+// Favorites loaded so far, in display order, and the cursor for the next page
+let loadedFavorites = [];
+let favoritesCursor = null;
+let favoritesLoading = false;
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadFavorites();
+
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) loadMoreFavorites();
+        }, { rootMargin: '400px' }).observe(document.getElementById('favorites-load-more'));
+    }
+});
+
+function favoritesUrl(cursor) {
+    let url = `/api/user/favorites?sort=${favoritesSort}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    return url;
+}
+
+function updateLoadMore() {
+    document.getElementById('favorites-load-more').style.display = favoritesCursor ? 'block' : 'none';
+}
+
+function loadFavorites() {
+    fetch(favoritesUrl())
+        .then(response => response.json())
+        .then(data => {
+            const container = document.getElementById('favorites-container');
+            const emptyState = document.getElementById('empty-favorites');
+
+            loadedFavorites = data.favorites;
+            favoritesCursor = data.next_cursor;
+            updateLoadMore();
+
+            if (data.favorites.length === 0) {
+                container.style.display = 'none';
+                emptyState.style.display = 'block';
+                updateStats([], data);
+            } else {
+                container.style.display = favoritesView === 'grid' ? 'grid' : 'block';
+                emptyState.style.display = 'none';
+                displayFavorites(loadedFavorites);
+                updateStats(loadedFavorites, data);
+                document.getElementById('total-favorites').textContent = data.total;
+            }
+        })
+        .catch(error => {
+            console.error('Error loading favorites:', error);
+        });
+}
+
+function loadMoreFavorites() {
+    if (!favoritesCursor || favoritesLoading) return;
+    favoritesLoading = true;
+
+    fetch(favoritesUrl(favoritesCursor))
+        .then(response => response.json())
+        .then(data => {
+            loadedFavorites = loadedFavorites.concat(data.favorites);
+            favoritesCursor = data.next_cursor;
+            updateLoadMore();
+            const render = favoritesView === 'grid' ? createFavoriteCard : createFavoriteListItem;
+            document.getElementById('favorites-container')
+                .insertAdjacentHTML('beforeend', data.favorites.map(render).join(''));
+        })
+        .catch(error => console.error('Error loading favorites:', error))
+        .finally(() => { favoritesLoading = false; });
+}
+
+function displayFavorites(favorites) {
+    const container = document.getElementById('favorites-container');
+    container.className = favoritesView === 'grid' ? 'favorites-grid' : 'favorites-list';
+
+    if (favoritesView === 'grid') {
+        container.innerHTML = favorites.map(song => createFavoriteCard(song)).join('');
+    } else {
+        container.innerHTML = favorites.map(song => createFavoriteListItem(song)).join('');
+    }
+}
+
+function createFavoriteCard(song) {
+    return `
+        <div class="song-card favorite-card" data-song-id="${song.id}">
+            <img src="${escapeHtml(song.cover_url || '/static/default-album.jpg')}" alt="${escapeHtml(song.title)}">
+            <div class="song-info">
+                <h3>${escapeHtml(song.title)}</h3>
+                <p>${escapeHtml(song.artist)}</p>
+                <small class="added-date">Added ${song.added_date}</small>
+            </div>
+            <button class="play-btn" onclick="playSong(${song.id})">
+                <i class="fas fa-play"></i>
+            </button>
+            <button class="favorite-btn active" onclick="toggleFavorite(${song.id}, this)">
+                <i class="fas fa-heart"></i>
+            </button>
+            <button class="more-btn" onclick="showSongOptions(${song.id}, event)">
+                <i class="fas fa-ellipsis-v"></i>
+            </button>
+        </div>
+    `;
+}
+
+function createFavoriteListItem(song) {
+    return `
+        <div class="favorite-list-item" data-song-id="${song.id}">
+            <img src="${escapeHtml(song.thumbnail_url || song.cover_url || '/static/default-album.jpg')}" alt="${escapeHtml(song.title)}" onclick="playSong(${song.id})">
+            <div class="song-info" onclick="playSong(${song.id})">
+                <h4>${escapeHtml(song.title)}</h4>
+                <p>${escapeHtml(song.artist)}</p>
+            </div>
+            <div class="added-date">${song.added_date}</div>
+            <div class="actions">
+                <button onclick="playSong(${song.id})" title="Play">
+                    <i class="fas fa-play"></i>
+                </button>
+                <button onclick="toggleFavorite(${song.id}, this)" title="Remove from favorites">
+                    <i class="fas fa-heart"></i>
+                </button>
+                <button onclick="showSongOptions(${song.id}, event)" title="More options">
+                    <i class="fas fa-ellipsis-v"></i>
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+function updateStats(favorites, totals) {
+    // Total playtime covers every favorite, not just the loaded page
+    const totalMinutes = (totals.total_duration || 0) / 60;
+    document.getElementById('total-playtime').textContent = Math.round(totalMinutes);
+
+    // Find most active month
+    if (favorites.length > 0) {
+        const months = favorites.map(song => new Date(song.added_date).getMonth());
+        const mostCommonMonth = getMostFrequent(months);
+        const monthNames = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+        document.getElementById('favorite-month').textContent = monthNames[mostCommonMonth] || '-';
+    }
+}
+
+function getMostFrequent(arr) {
+    return arr.sort((a,b) =>
+        arr.filter(v => v === a).length - arr.filter(v => v === b).length
+    ).pop();
+}
+
+function playAllFavorites() {
+    if (loadedFavorites.length > 0) {
+        playSong(loadedFavorites[0].id);
+        // Queue up the rest
+        window.playlist = loadedFavorites.map(f => f.id);
+        window.currentIndex = 0;
+    }
+}
+
+function shuffleFavorites() {
+    if (loadedFavorites.length > 0) {
+        const shuffled = [...loadedFavorites].sort(() => Math.random() - 0.5);
+        playSong(shuffled[0].id);
+        window.playlist = shuffled.map(f => f.id);
+        window.currentIndex = 0;
+    }
+}
+
+function sortFavorites(sortBy) {
+    // Sorting happens in SQL so that paging stays consistent
+    favoritesSort = sortBy;
+    loadFavorites();
+}
+
+function switchFavoritesView(view) {
+    favoritesView = view;
+
+    // Update active button
+    document.querySelectorAll('.favorites-view-options .view-btn').forEach(btn => {
+        btn.classList.remove('active');
+    });
+    event.target.classList.add('active');
+
+    // Reload favorites with new view
+    loadFavorites();
+}
+
+function showSongOptions(songId, event) {
+    event.stopPropagation();
+    currentSongToAdd = songId;
+
+    // Show options modal
+    const modal = document.getElementById('playlist-modal');
+    modal.style.display = 'flex';
+
+    // Load playlists
+    fetch('/api/playlists')
+        .then(response => response.json())
+        .then(playlists => {
+            const list = document.getElementById('playlists-list');
+            if (playlists.length === 0) {
+                list.innerHTML = '<p class="no-playlists">No playlists yet</p>';
+            } else {
+                list.innerHTML = playlists.map(playlist => `
+                    <div class="playlist-item">
+                        <span>${escapeHtml(playlist.name)}</span>
+                        <button onclick="addToPlaylist(${playlist.id}, ${songId})">
+                            Add
+                        </button>
+                    </div>
+                `).join('');
+            }
+        });
+}
+
+function closeModal() {
+    document.getElementById('playlist-modal').style.display = 'none';
+}
+
+function createNewPlaylist() {
+    const name = prompt('Enter playlist name:');
+    if (name) {
+        fetch('/playlist/create', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ name: name })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success && currentSongToAdd) {
+                return fetch(`/playlist/${data.id}/add-song`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ song_id: currentSongToAdd })
+                });
+            }
+        })
+        .then(() => {
+            closeModal();
+            alert('Song added to new playlist!');
+        })
+        .catch(error => {
+            console.error('Error creating playlist:', error);
+        });
+    }
+}
+
+function addToPlaylist(playlistId, songId) {
+    fetch(`/playlist/${playlistId}/add-song`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ song_id: songId })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            closeModal();
+            alert('Song added to playlist!');
+        }
+    })
+    .catch(error => {
+        console.error('Error adding to playlist:', error);
+    });
+}
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+    const modal = document.getElementById('playlist-modal');
+    if (event.target == modal) {
+        modal.style.display = 'none';
+    }
+}
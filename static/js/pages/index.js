@@ -0,0 +1,9 @@
+// Load statistics
+fetch('/api/stats')
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('total-songs').textContent = data.songs;
+        document.getElementById('total-artists').textContent = data.artists;
+        document.getElementById('total-albums').textContent = data.albums;
+        document.getElementById('total-plays').textContent = data.plays;
+    });
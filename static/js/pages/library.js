@@ -0,0 +1,114 @@
+// Keyset cursors for the next page of each tab, passed on the script tag; null once everything is loaded
+const libraryCursors = JSON.parse(document.currentScript.dataset.cursors);
+const libraryLoading = {};
+
+const libraryRenderers = {
+    songs: song => `
+        <div class="song-card" data-song-id="${song.id}">
+            <img src="${escapeHtml(song.cover_url)}" alt="${escapeHtml(song.title)}">
+            <div class="song-info">
+                <h3>${escapeHtml(song.title)}</h3>
+                <p>${escapeHtml(song.artist)}</p>
+                <span class="song-duration">${formatDuration(song.duration)}</span>
+            </div>
+            <div class="song-actions">
+                <button class="play-btn" onclick="playSong(${song.id})">
+                    <i class="fas fa-play"></i>
+                </button>
+                <button class="favorite-btn" onclick="toggleFavorite(${song.id}, this)">
+                    <i class="far fa-heart"></i>
+                </button>
+                <button class="more-btn" onclick="showSongOptions(${song.id})">
+                    <i class="fas fa-ellipsis-v"></i>
+                </button>
+            </div>
+        </div>`,
+    albums: album => `
+        <div class="album-card">
+            <img src="${escapeHtml(album.cover_url)}" alt="${escapeHtml(album.title)}">
+            <h4>${escapeHtml(album.title)}</h4>
+            <p>${escapeHtml(album.artist)}</p>
+            <p class="album-year">${escapeHtml(album.year || 'Unknown')}</p>
+        </div>`,
+    artists: artist => `
+        <div class="artist-card">
+            <img src="${escapeHtml(artist.image_url)}" alt="${escapeHtml(artist.name)}">
+            <h4>${escapeHtml(artist.name)}</h4>
+            <p>${artist.songs_count} songs</p>
+        </div>`
+};
+
+function formatDuration(seconds) {
+    seconds = seconds || 0;
+    return `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`;
+}
+
+function loadMore(kind) {
+    const cursor = libraryCursors[kind];
+    if (!cursor || libraryLoading[kind]) return;
+    libraryLoading[kind] = true;
+
+    fetch(`/api/library/${kind}?cursor=${encodeURIComponent(cursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById(`${kind}-grid`)
+                .insertAdjacentHTML('beforeend', data[kind].map(libraryRenderers[kind]).join(''));
+            if (kind === 'songs') markFavorites(data.songs.map(song => song.id));
+            libraryCursors[kind] = data.next_cursor;
+            if (!data.next_cursor) {
+                document.getElementById(`${kind}-load-more`).style.display = 'none';
+            }
+        })
+        .catch(error => console.error(`Error loading ${kind}:`, error))
+        .finally(() => { libraryLoading[kind] = false; });
+}
+
+// Fetch the next page when a tab's "Load more" button scrolls into view
+if ('IntersectionObserver' in window) {
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                loadMore(entry.target.id.replace('-load-more', ''));
+            }
+        });
+    }, { rootMargin: '400px' });
+    document.querySelectorAll('.load-more-btn').forEach(button => observer.observe(button));
+}
+
+function showTab(tabName) {
+    // Hide all tabs
+    document.querySelectorAll('.tab-content').forEach(tab => {
+        tab.classList.remove('active');
+    });
+
+    // Remove active class from all tab buttons
+    document.querySelectorAll('.tab-btn').forEach(btn => {
+        btn.classList.remove('active');
+    });
+
+    // Show selected tab
+    document.getElementById(tabName + '-tab').classList.add('active');
+    event.target.classList.add('active');
+}
+
+function showSongOptions(songId) {
+    // Create options dropdown
+    const options = [
+        { text: 'Add to Playlist', action: () => showPlaylists(songId) },
+        { text: 'View Artist', action: () => viewArtist(songId) },
+        { text: 'View Album', action: () => viewAlbum(songId) }
+    ];
+
+    // Implement dropdown menu
+    console.log('Show options for song:', songId);
+}
+
+function showPlaylists(songId) {
+    // Show playlists modal
+    fetch('/api/playlists')
+        .then(response => response.json())
+        .then(playlists => {
+            // Display playlists in modal
+            console.log('Available playlists:', playlists);
+        });
+}
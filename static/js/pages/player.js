@@ -0,0 +1,240 @@
+// The song rendered by the page, passed on the script tag
+let currentSongId = Number(document.currentScript.dataset.songId);
+let queue = [currentSongId];
+// Declared by main.js
+currentIndex = 0;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Initialize player with current song
+    playSong(currentSongId);
+    loadQueue();
+    loadRecommended();
+    checkFavoriteStatus();
+
+    // Add click handler for progress bar
+    document.querySelector('.progress-bar').addEventListener('click', seek);
+});
+
+function playSong(songId) {
+    fetch(`/api/song/${songId}`)
+        .then(response => response.json())
+        .then(song => {
+            const audioPlayer = document.getElementById('audio-player');
+            audioPlayer.src = song.file_url;
+            audioPlayer.play();
+
+            // Update UI
+            document.getElementById('player-title').textContent = song.title;
+            document.getElementById('player-artist').textContent = song.artist;
+            document.getElementById('player-cover').src = song.cover_url;
+
+            // Update play button
+            document.getElementById('play-pause-large').innerHTML = '<i class="fas fa-pause"></i>';
+
+            // Add to recently played
+            addToRecentlyPlayed(songId);
+        })
+        .catch(error => console.error('Error playing song:', error));
+}
+
+function togglePlay() {
+    const audioPlayer = document.getElementById('audio-player');
+    const playBtn = document.getElementById('play-pause-large');
+
+    if (audioPlayer.paused) {
+        audioPlayer.play();
+        playBtn.innerHTML = '<i class="fas fa-pause"></i>';
+    } else {
+        audioPlayer.pause();
+        playBtn.innerHTML = '<i class="fas fa-play"></i>';
+    }
+}
+
+function previousSong() {
+    if (currentIndex > 0) {
+        currentIndex--;
+        playSong(queue[currentIndex]);
+    }
+}
+
+function nextSong() {
+    if (currentIndex < queue.length - 1) {
+        currentIndex++;
+        playSong(queue[currentIndex]);
+    }
+}
+
+function seek(event) {
+    const progressBar = event.currentTarget;
+    const clickPosition = (event.clientX - progressBar.getBoundingClientRect().left) / progressBar.offsetWidth;
+    const audioPlayer = document.getElementById('audio-player');
+    audioPlayer.currentTime = clickPosition * audioPlayer.duration;
+}
+
+// Update progress bar
+document.getElementById('audio-player').addEventListener('timeupdate', function() {
+    const progress = (this.currentTime / this.duration) * 100;
+    document.getElementById('progress-fill').style.width = progress + '%';
+
+    // Update current time
+    const minutes = Math.floor(this.currentTime / 60);
+    const seconds = Math.floor(this.currentTime % 60);
+    document.getElementById('current-time').textContent = `${minutes}:${seconds.toString().padStart(2, '0')}`;
+});
+
+// When song ends, play next
+document.getElementById('audio-player').addEventListener('ended', function() {
+    nextSong();
+});
+
+function loadQueue() {
+    const queueList = document.getElementById('queue-list');
+    queueList.innerHTML = '';
+
+    queue.forEach((songId, index) => {
+        fetch(`/api/song/${songId}`)
+            .then(response => response.json())
+            .then(song => {
+                queueList.innerHTML += `
+                    <div class="queue-item" onclick="playSong(${songId})">
+                        <img src="${escapeHtml(song.cover_url)}" alt="${escapeHtml(song.title)}">
+                        <div class="queue-item-info">
+                            <h4>${escapeHtml(song.title)}</h4>
+                            <p>${escapeHtml(song.artist)}</p>
+                        </div>
+                        <button class="remove-btn" onclick="event.stopPropagation(); removeFromQueue(${index})">
+                            <i class="fas fa-times"></i>
+                        </button>
+                    </div>
+                `;
+            });
+    });
+}
+
+function loadRecommended() {
+    const recommendedList = document.getElementById('recommended-list');
+
+    fetch('/api/songs/recommended')
+        .then(response => response.json())
+        .then(songs => {
+            recommendedList.innerHTML = '';
+            songs.slice(0, 5).forEach(song => {
+                recommendedList.innerHTML += `
+                    <div class="recommended-item" onclick="playSong(${song.id})">
+                        <img src="${escapeHtml(song.cover_url)}" alt="${escapeHtml(song.title)}">
+                        <div class="recommended-item-info">
+                            <h4>${escapeHtml(song.title)}</h4>
+                            <p>${escapeHtml(song.artist)}</p>
+                        </div>
+                    </div>
+                `;
+            });
+        });
+}
+
+function addToQueue(songId) {
+    queue.push(songId);
+    loadQueue();
+}
+
+function removeFromQueue(index) {
+    queue.splice(index, 1);
+    loadQueue();
+}
+
+function checkFavoriteStatus() {
+    fetch(`/api/user/favorites/contains?ids=${currentSongId}`)
+        .then(response => response.json())
+        .then(data => {
+            const isFavorite = (data.favorites || []).includes(currentSongId);
+            const favBtn = document.getElementById('favorite-btn');
+            if (isFavorite) {
+                favBtn.innerHTML = '<i class="fas fa-heart"></i> Favorited';
+                favBtn.style.background = 'var(--primary)';
+            }
+        });
+}
+
+function toggleFavorite(songId, btn) {
+    fetch(`/favorite/toggle/${songId}`, { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                if (data.is_favorite) {
+                    btn.innerHTML = '<i class="fas fa-heart"></i> Favorited';
+                    btn.style.background = 'var(--primary)';
+                } else {
+                    btn.innerHTML = '<i class="far fa-heart"></i> Favorite';
+                    btn.style.background = '';
+                }
+            }
+        });
+}
+
+function showPlaylists(songId) {
+    document.getElementById('playlist-modal').style.display = 'flex';
+
+    fetch('/api/playlists')
+        .then(response => response.json())
+        .then(playlists => {
+            const list = document.getElementById('playlists-list');
+            if (playlists.length === 0) {
+                list.innerHTML = '<p>No playlists yet</p>';
+            } else {
+                list.innerHTML = playlists.map(playlist => `
+                    <div class="playlist-item">
+                        <span>${escapeHtml(playlist.name)}</span>
+                        <button onclick="addToPlaylist(${playlist.id}, ${songId})">Add</button>
+                    </div>
+                `).join('');
+            }
+        });
+}
+
+function addToPlaylist(playlistId, songId) {
+    fetch(`/playlist/${playlistId}/add-song`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ song_id: songId })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            closeModal();
+            alert('Song added to playlist!');
+        }
+    });
+}
+
+function createNewPlaylist() {
+    const name = prompt('Enter playlist name:');
+    if (name) {
+        fetch('/playlist/create', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: name })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                closeModal();
+                alert('Playlist created!');
+            }
+        });
+    }
+}
+
+function closeModal() {
+    document.getElementById('playlist-modal').style.display = 'none';
+}
+
+function downloadSong(songId) {
+    window.location.href = `/api/song/${songId}/download`;
+}
+
+function addToRecentlyPlayed(songId) {
+    // Store in localStorage for now
+    let recent = JSON.parse(localStorage.getItem('recentlyPlayed') || '[]');
+    recent = [songId, ...recent.filter(id => id !== songId)].slice(0, 20);
+    localStorage.setItem('recentlyPlayed', JSON.stringify(recent));
+}
@@ -0,0 +1,128 @@
+// Settings passed on the script tag by playlist.html
+const playlistSettings = document.currentScript.dataset;
+const playlistId = Number(playlistSettings.playlistId);
+let playlistCursor = JSON.parse(playlistSettings.cursor);
+let playlistLoading = false;
+const canEditPlaylist = playlistSettings.canEdit === 'true';
+
+// Only the first page of songs is rendered, so Play all and Shuffle ask for every id
+function fetchSongIds() {
+    return fetch(`/api/playlist/${playlistId}/song-ids`)
+        .then(response => response.json())
+        .then(data => data.song_ids);
+}
+
+function loadMoreSongs() {
+    if (!playlistCursor || playlistLoading) return;
+    playlistLoading = true;
+
+    fetch(`/api/playlist/${playlistId}/songs?cursor=${encodeURIComponent(playlistCursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            const list = document.getElementById('songs-list');
+            let index = list.children.length;
+            list.insertAdjacentHTML('beforeend', data.songs.map(song => {
+                index += 1;
+                const minutes = Math.floor((song.duration || 0) / 60);
+                const seconds = String((song.duration || 0) % 60).padStart(2, '0');
+                return `
+                <div class="song-item" data-song-id="${song.id}" data-index="${index}">
+                    <div class="song-number">${index}</div>
+                    <div class="song-title">
+                        <img src="${escapeHtml(song.cover_url)}" alt="${escapeHtml(song.title)}">
+                        <span>${escapeHtml(song.title)}</span>
+                    </div>
+                    <div class="song-artist">${escapeHtml(song.artist)}</div>
+                    <div class="song-album">${escapeHtml(song.album)}</div>
+                    <div class="song-duration">${minutes}:${seconds}</div>
+                    <div class="song-actions">
+                        <button class="play-song-btn" onclick="playSong(${song.id})">
+                            <i class="fas fa-play"></i>
+                        </button>
+                        ${canEditPlaylist ? `
+                        <button class="remove-song-btn" onclick="removeFromPlaylist(${playlistId}, ${song.id})">
+                            <i class="fas fa-times"></i>
+                        </button>` : ''}
+                    </div>
+                </div>`;
+            }).join(''));
+            playlistCursor = data.next_cursor;
+            if (!playlistCursor) {
+                document.getElementById('songs-load-more').style.display = 'none';
+            }
+        })
+        .catch(error => console.error('Error loading playlist songs:', error))
+        .finally(() => { playlistLoading = false; });
+}
+
+if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => {
+        if (entries[0].isIntersecting) loadMoreSongs();
+    }, { rootMargin: '400px' }).observe(document.getElementById('songs-load-more'));
+}
+
+function playAll() {
+    fetchSongIds().then(songs => {
+        if (songs.length > 0) {
+            window.playlist = songs;
+            window.currentIndex = 0;
+            playSong(songs[0]);
+        }
+    }).catch(error => console.error('Error loading playlist songs:', error));
+}
+
+function shufflePlay() {
+    fetchSongIds().then(songs => {
+        if (songs.length > 0) {
+            const shuffled = [...songs].sort(() => Math.random() - 0.5);
+            window.playlist = shuffled;
+            window.currentIndex = 0;
+            playSong(shuffled[0]);
+        }
+    }).catch(error => console.error('Error loading playlist songs:', error));
+}
+
+function removeFromPlaylist(playlistId, songId) {
+    if (confirm('Remove this song from playlist?')) {
+        fetch(`/playlist/${playlistId}/remove-song`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ song_id: songId })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                location.reload();
+            }
+        });
+    }
+}
+
+function editPlaylist() {
+    const newName = prompt('Enter new playlist name:', playlistSettings.name);
+    if (newName) {
+        fetch(`/playlist/${playlistId}/edit`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: newName })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                location.reload();
+            }
+        });
+    }
+}
+
+function deletePlaylist() {
+    if (confirm('Are you sure you want to delete this playlist?')) {
+        fetch(`/playlist/${playlistId}/delete`, { method: 'POST' })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    window.location.href = playlistSettings.libraryUrl;
+                }
+            });
+    }
+}
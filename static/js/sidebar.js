@@ -0,0 +1,47 @@
+// Settings passed on the js/app.js script tag by base.html, which bundles this file
+const sidebarSettings = document.currentScript.dataset;
+
+// Load user playlists for sidebar
+function loadUserPlaylists() {
+    if (sidebarSettings.authenticated !== 'true') return;
+
+    fetch('/api/playlists')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(playlists => {
+            const container = document.getElementById('playlist-links');
+            if (!container) return;
+
+            if (playlists.length === 0) {
+                container.innerHTML = '<li class="no-playlists">No playlists yet</li>';
+            } else {
+                container.innerHTML = playlists.map(playlist => {
+                    // url_for('playlist', playlist_id=0), rendered by the template
+                    const playlistUrl = sidebarSettings.playlistUrl.replace('0', playlist.id);
+                    return `
+                        <li>
+                            <a href="${playlistUrl}">
+                                <i class="fas fa-list"></i> ${escapeHtml(playlist.name)}
+                            </a>
+                        </li>
+                    `;
+                }).join('');
+            }
+        })
+        .catch(error => {
+            console.error('Error loading playlists:', error);
+            const container = document.getElementById('playlist-links');
+            if (container) {
+                container.innerHTML = '<li class="error">Failed to load playlists</li>';
+            }
+        });
+}
+
+// Call when page loads
+document.addEventListener('DOMContentLoaded', function() {
+    loadUserPlaylists();
+});
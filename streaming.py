@@ -0,0 +1,223 @@
+import mimetypes
+import os
+import uuid
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date, quote_etag, unquote_etag
+from werkzeug.wsgi import wrap_file
+
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'ogg': 'audio/ogg',
+    'oga': 'audio/ogg',
+    'm4a': 'audio/mp4',
+    'aac': 'audio/aac',
+    'flac': 'audio/flac',
+    'webm': 'audio/webm',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# Guard against "bytes=0-0,1-1,2-2,..." style amplification
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def audio_mimetype(path):
+    """Content type for an audio file based on its extension"""
+    ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    return AUDIO_MIMETYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def parse_range_header(header, size):
+    """Parse a ``Range`` header into sorted, merged ``(start, end)`` pairs.
+
+    ``end`` is inclusive, as in ``Content-Range``. Returns None when the
+    header is absent or malformed, in which case the whole file should be
+    sent. Raises RangeNotSatisfiable when the header is valid but no range
+    overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Suffix range: the final N bytes
+                length = int(last)
+                if length < 0:
+                    return None
+                if length == 0 or size == 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else start
+        except ValueError:
+            return None
+        if start < 0 or end < start:
+            return None
+        if not last:
+            end = size - 1
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def make_etag(stat):
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+def _etag_matches(header, etag, weak=True):
+    """Compare an ``If-None-Match`` or ``If-Range`` value against an ETag"""
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        value, is_weak = unquote_etag(candidate)
+        if value == etag and (weak or not is_weak):
+            return True
+    return False
+
+
+def _not_modified(stat, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    return since is not None and int(stat.st_mtime) <= since.timestamp()
+
+
+def _if_range_allows(stat, etag):
+    """True if the Range header should be honoured given ``If-Range``"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        # If-Range requires a strong comparison
+        return _etag_matches(if_range, etag, weak=False)
+    date = parse_date(if_range)
+    return date is not None and int(stat.st_mtime) == int(date.timestamp())
+
+
+def _iter_range(path, start, end):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        position = start
+        while position <= end:
+            chunk = os.pread(fd, min(CHUNK_SIZE, end - position + 1), position)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+
+def _iter_multipart(path, ranges, size, mimetype, boundary):
+    for start, end in ranges:
+        yield _part_header(boundary, mimetype, start, end, size)
+        yield from _iter_range(path, start, end)
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def _part_header(boundary, mimetype, start, end, size):
+    return (f'\r\n--{boundary}\r\n'
+            f'Content-Type: {mimetype}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode()
+
+
+def multipart_length(ranges, size, mimetype, boundary):
+    """Exact body size of a multipart/byteranges response"""
+    length = len(f'\r\n--{boundary}--\r\n')
+    for start, end in ranges:
+        length += len(_part_header(boundary, mimetype, start, end, size)) + end - start + 1
+    return length
+
+
+def send_audio(path, offload=None, accel_path=None):
+    """Serve an audio file with range, conditional GET and offload support.
+
+    ``offload`` may be ``'x-accel-redirect'`` (nginx, using ``accel_path``
+    as the internal location) or ``'x-sendfile'`` (Apache/lighttpd). In both
+    cases the front-end server handles ranges and the body itself. Otherwise
+    full responses go through ``wsgi.file_wrapper`` so servers such as
+    gunicorn can use ``sendfile``, and ranges are streamed with ``pread``.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    mimetype = audio_mimetype(path)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': 'public, max-age=86400',
+    }
+
+    if _not_modified(stat, etag):
+        return Response(status=304, headers=headers)
+
+    if offload == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = accel_path
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    if offload == 'x-sendfile':
+        headers['X-Sendfile'] = os.path.abspath(path)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    ranges = None
+    if request.method in ('GET', 'HEAD') and _if_range_allows(stat, etag):
+        try:
+            ranges = parse_range_header(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+    if not ranges:
+        headers['Content-Length'] = str(size)
+        body = wrap_file(request.environ, open(path, 'rb'), CHUNK_SIZE)
+        return Response(body, status=200, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+        return Response(_iter_range(path, start, end), status=206, headers=headers,
+                        mimetype=mimetype, direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    headers['Content-Length'] = str(multipart_length(ranges, size, mimetype, boundary))
+    return Response(_iter_multipart(path, ranges, size, mimetype, boundary), status=206, headers=headers,
+                    content_type=f'multipart/byteranges; boundary={boundary}', direct_passthrough=True)
@@ -0,0 +1,473 @@
+import bisect
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import db, Song, Artist, Album
+
+logger = logging.getLogger(__name__)
+
+KIND_SONG = 0
+KIND_ARTIST = 1
+KIND_ALBUM = 2
+KIND_NAMES = {KIND_SONG: 'song', KIND_ARTIST: 'artist', KIND_ALBUM: 'album'}
+DEAD = 255
+
+# Prefixes of at least this many words cost too much to merge per
+# keystroke; their best entries are kept precomputed
+BROAD_PREFIX_WORDS = 64
+BROAD_PREFIX_ENTRIES = 256
+# Words considered for a misspelt term, before the edit distance check
+FUZZY_CANDIDATES = 32
+
+_SELECT_SONGS = text('SELECT id, title, artist_id, COALESCE(plays, 0) FROM song')
+_SELECT_ARTISTS = text(
+    'SELECT ar.id, ar.name, COALESCE(SUM(s.plays), 0) FROM artist ar '
+    'LEFT JOIN song s ON s.artist_id = ar.id GROUP BY ar.id, ar.name'
+)
+_SELECT_ALBUMS = text(
+    'SELECT al.id, al.title, al.artist_id, COALESCE(SUM(s.plays), 0) FROM album al '
+    'LEFT JOIN song s ON s.album_id = al.id GROUP BY al.id, al.title, al.artist_id'
+)
+
+
+def normalize(value):
+    """Lowercase ``value`` and strip diacritics, so "Beyoncé" is found by "beyonce" """
+    value = value or ''
+    if value.isascii():
+        return value.lower()
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(value):
+    return re.findall(r'\w+', normalize(value))
+
+
+def _trigrams(word):
+    # The leading marker makes the first letters count, as they are rarely mistyped
+    padded = f'^{word}'
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+def _within_distance(a, b, limit):
+    """True if the Levenshtein distance between ``a`` and ``b`` is at most ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class _Term:
+    """One word of a query: the vocabulary words it accepts, and whether any word starting with it matches"""
+    __slots__ = ('text', 'prefix', 'word_ids', 'accepted', 'fuzzy')
+
+    def __init__(self, text, prefix):
+        self.text, self.prefix = text, prefix
+        self.word_ids, self.accepted, self.fuzzy = [], set(), False
+
+    def matches(self, entry_words):
+        if self.prefix and not self.fuzzy:
+            return any(word.startswith(self.text) for word in entry_words)
+        return not self.accepted.isdisjoint(entry_words)
+
+
+class Snapshot:
+    """Names of songs, artists and albums with a word index, ordered by plays.
+
+    Entries are numbered by descending play count, so every posting list
+    (the entries containing a word) is sorted best first and the top
+    suggestions are the first entries that match every term. Entries are
+    stored in parallel arrays; the vocabulary is a sorted list for prefix
+    ranges, and a trigram index over the vocabulary finds words within a
+    small edit distance of a misspelt term.
+    """
+
+    def __init__(self):
+        self.kinds = bytearray()
+        self.ids = array('L')
+        self.parents = array('l')
+        self.plays = array('q')
+        self.names = []
+        self.vocabulary = []
+        self.postings = []
+        self.sorted_words = []
+        self.sorted_ids = array('L')
+        self.trigrams = {}
+        self.broad = {}
+        self.artists = {}
+
+    @classmethod
+    def build(cls, songs, artists, albums):
+        """Build from ``(id, name, plays)`` artists and ``(id, name, artist_id, plays)`` songs and albums"""
+        rows = [(plays, KIND_ARTIST, id, name, None) for id, name, plays in artists]
+        rows.extend((plays, KIND_ALBUM, id, name, artist_id) for id, name, artist_id, plays in albums)
+        rows.extend((plays, KIND_SONG, id, name, artist_id) for id, name, artist_id, plays in songs)
+        rows.sort(key=lambda row: (-row[0], row[1], row[2]))
+
+        snapshot = cls()
+        snapshot.artists = {row[2]: index for index, row in enumerate(rows) if row[1] == KIND_ARTIST}
+        word_ids = {}
+        postings = snapshot.postings
+        for index, (plays, kind, id, name, artist_id) in enumerate(rows):
+            snapshot.kinds.append(kind)
+            snapshot.ids.append(id)
+            snapshot.parents.append(snapshot.artists.get(artist_id, -1))
+            snapshot.plays.append(plays)
+            snapshot.names.append(name)
+            for word in set(words(name)):
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = word_ids[word] = len(postings)
+                    postings.append(array('L'))
+                postings[word_id].append(index)
+        del rows
+
+        snapshot.vocabulary = [None] * len(word_ids)
+        for word, word_id in word_ids.items():
+            snapshot.vocabulary[word_id] = word
+        order = sorted(word_ids.items())
+        snapshot.sorted_words = [word for word, _ in order]
+        snapshot.sorted_ids = array('L', (word_id for _, word_id in order))
+        for word, word_id in order:
+            for trigram in _trigrams(word):
+                snapshot.trigrams.setdefault(trigram, array('L')).append(word_id)
+        prefixes = Counter(word[:n] for word in snapshot.sorted_words for n in range(1, len(word) + 1))
+        for prefix, count in prefixes.items():
+            if count >= BROAD_PREFIX_WORDS:
+                union = snapshot._union(snapshot._prefix_ids(prefix))
+                snapshot.broad[prefix] = array('L', itertools.islice(union, BROAD_PREFIX_ENTRIES))
+        return snapshot
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def stats(self):
+        return {'entries': len(self.kinds), 'words': len(self.vocabulary), 'trigrams': len(self.trigrams),
+                'postings': sum(len(p) for p in self.postings), 'broad_prefixes': len(self.broad)}
+
+    def _prefix_ids(self, prefix):
+        start = bisect.bisect_left(self.sorted_words, prefix)
+        end = bisect.bisect_left(self.sorted_words, prefix + '\U0010ffff', start)
+        return self.sorted_ids[start:end]
+
+    def _word_id(self, word):
+        position = bisect.bisect_left(self.sorted_words, word)
+        if position < len(self.sorted_words) and self.sorted_words[position] == word:
+            return self.sorted_ids[position]
+        return None
+
+    def _similar(self, term):
+        """Vocabulary words close to a misspelt term, as (word_id, word) pairs"""
+        if len(term.text) < 3:
+            return []
+        shared = Counter(itertools.chain.from_iterable(self.trigrams.get(t, ()) for t in _trigrams(term.text)))
+        limit = 1 if len(term.text) < 6 else 2
+        similar = []
+        for word_id, _ in shared.most_common(FUZZY_CANDIDATES):
+            word = self.vocabulary[word_id]
+            # A prefix is compared with the start of each word
+            candidates = [word[:n] for n in range(len(term.text) - limit, len(term.text) + limit + 1)] \
+                if term.prefix else [word]
+            if any(_within_distance(term.text, candidate, limit) for candidate in candidates if candidate):
+                similar.append((word_id, word))
+        return similar
+
+    def _resolve(self, term):
+        if term.prefix:
+            term.word_ids = list(self._prefix_ids(term.text))
+        else:
+            word_id = self._word_id(term.text)
+            term.word_ids = [] if word_id is None else [word_id]
+            term.accepted = {term.text}
+        if not term.word_ids:
+            similar = self._similar(term)
+            term.fuzzy = True
+            term.word_ids = [word_id for word_id, _ in similar]
+            term.accepted = {word for _, word in similar}
+
+    def _union(self, word_ids, after=-1, batch=16):
+        """Entries containing any of the words, best first.
+
+        A prefix can match thousands of words. Rather than merging every
+        posting list entry by entry, each round takes the next ``batch``
+        entries of every list; their union is complete up to the smallest
+        last entry taken from a list that has more.
+        """
+        lists = [self.postings[word_id] for word_id in word_ids]
+        while lists:
+            candidates, bound = set(), None
+            for postings in lists:
+                start = bisect.bisect_right(postings, after)
+                chunk = postings[start:start + batch]
+                candidates.update(chunk)
+                if start + batch < len(postings) and (bound is None or chunk[-1] < bound):
+                    bound = chunk[-1]
+            for index in sorted(candidates):
+                if bound is not None and index > bound:
+                    break
+                yield index
+            if bound is None:
+                return
+            after, batch = bound, batch * 4
+            lists = [postings for postings in lists if postings[-1] > after]
+
+    def _candidates(self, term):
+        """Entries containing a word of ``term``, best first"""
+        if len(term.word_ids) == 1:
+            yield from self.postings[term.word_ids[0]]
+        elif term.prefix and not term.fuzzy and term.text in self.broad:
+            cached = self.broad[term.text]
+            yield from cached
+            if len(cached) == BROAD_PREFIX_ENTRIES:
+                yield from self._union(term.word_ids, cached[-1])
+        else:
+            yield from self._union(term.word_ids)
+
+    def search(self, query, limit=10, kinds=None):
+        """Entry indexes of the best ``limit`` names containing every word of ``query``.
+
+        The last word is a prefix unless the query ends with a space;
+        words with no match are replaced by close spellings.
+        """
+        normalized = normalize(query)
+        terms = [_Term(word, False) for word in re.findall(r'\w+', normalized)]
+        if not terms:
+            return []
+        terms[-1].prefix = not normalized[-1:].isspace()
+        for term in terms:
+            self._resolve(term)
+            if not term.word_ids:
+                return []
+
+        driver = min(terms, key=lambda t: sum(len(self.postings[word_id]) for word_id in t.word_ids))
+        others = [term for term in terms if term is not driver]
+        results = []
+        for index in self._candidates(driver):
+            kind = self.kinds[index]
+            if kind == DEAD or (kinds is not None and kind not in kinds):
+                continue
+            if others:
+                entry_words = set(words(self.names[index]))
+                if not all(term.matches(entry_words) for term in others):
+                    continue
+            results.append(index)
+            if len(results) == limit:
+                break
+        return results
+
+    def add(self, kind, id, name, artist_id=None):
+        """Append an entry with no plays, which ranks it after every existing one"""
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.ids.append(id)
+        self.parents.append(self.artists.get(artist_id, -1))
+        self.plays.append(0)
+        self.names.append(name)
+        if kind == KIND_ARTIST:
+            self.artists[id] = index
+        for word in set(words(name)):
+            word_id = self._word_id(word)
+            if word_id is None:
+                word_id = len(self.vocabulary)
+                self.vocabulary.append(word)
+                self.postings.append(array('L'))
+                position = bisect.bisect_left(self.sorted_words, word)
+                self.sorted_words.insert(position, word)
+                self.sorted_ids.insert(position, word_id)
+                for trigram in _trigrams(word):
+                    self.trigrams.setdefault(trigram, array('L')).append(word_id)
+            self.postings[word_id].append(index)
+            for n in range(1, len(word) + 1):
+                cached = self.broad.get(word[:n])
+                if cached is not None and len(cached) < BROAD_PREFIX_ENTRIES and cached[-1] != index:
+                    cached.append(index)
+
+    def remove(self, kind, id, name):
+        """Drop the entry indexed under ``name`` and return its index.
+
+        The entry is found through the postings of the rarest word of its name.
+        """
+        word_ids = [word_id for word_id in map(self._word_id, set(words(name))) if word_id is not None]
+        if not word_ids:
+            return None
+        for index in min((self.postings[word_id] for word_id in word_ids), key=len):
+            if self.kinds[index] == kind and self.ids[index] == id:
+                self.kinds[index] = DEAD
+                return index
+        return None
+
+
+class SuggestIndex:
+    """In-process search-as-you-type over song, artist and album names.
+
+    The snapshot is built from the database in a background thread when
+    the app starts (again in each forked worker that did not inherit a
+    finished one). Songs, artists and albums committed by this process are
+    applied to it right away; they rank last, as they have no plays yet.
+    Changes made by other processes, and play counts, are picked up by a
+    rebuild once ``SUGGEST_REFRESH_SECONDS`` have passed and the
+    ``version()`` callable reports a different value. Until the first
+    snapshot is ready, requests wait at most ``SUGGEST_WAIT_SECONDS`` and
+    then get no suggestions.
+    """
+
+    def __init__(self, app=None, version=None):
+        self.snapshot = None
+        self.refresh_seconds = 300
+        self.wait_seconds = 0.2
+        self.version = version
+        self.built_at = None
+        self.built_version = None
+        self.build_seconds = None
+        self._app = None
+        self._pid = None
+        self._building = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, version)
+
+    def init_app(self, app, version=None):
+        app.config.setdefault('SUGGEST_ENABLED', True)
+        app.config.setdefault('SUGGEST_REFRESH_SECONDS', 300)
+        app.config.setdefault('SUGGEST_WAIT_SECONDS', 0.2)
+        self.refresh_seconds = app.config['SUGGEST_REFRESH_SECONDS']
+        self.wait_seconds = app.config['SUGGEST_WAIT_SECONDS']
+        if version is not None:
+            self.version = version
+        self._app = app
+        app.extensions['suggest'] = self
+        if app.config['SUGGEST_ENABLED']:
+            event.listen(Session, 'after_flush', _collect_changes)
+            event.listen(Session, 'after_commit', self._apply_changes)
+            event.listen(Session, 'after_rollback', _discard_changes)
+            self.start()
+
+    def start(self):
+        """Build a new snapshot in the background unless one is being built"""
+        with self._lock:
+            if self._building is not None and self._building.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._building = threading.Thread(target=self._build, name='suggest-index', daemon=True)
+            self._building.start()
+
+    def _build(self):
+        started = time.perf_counter()
+        snapshot, version = None, None
+        try:
+            with self._app.app_context():
+                version = self.version() if self.version else None
+                with db.engine.connect() as connection:
+                    snapshot = Snapshot.build(connection.execute(_SELECT_SONGS),
+                                              connection.execute(_SELECT_ARTISTS).all(),
+                                              connection.execute(_SELECT_ALBUMS).all())
+        except OperationalError:
+            # Tables not created yet; empty until the next refresh
+            logger.warning('Suggest index built empty; the library tables are missing')
+        except Exception:
+            logger.exception('Failed to build the suggest index')
+        finally:
+            with self._lock:
+                if snapshot is not None or self.snapshot is None:
+                    self.snapshot = snapshot if snapshot is not None else Snapshot()
+                    self.built_version = version
+                self.build_seconds = time.perf_counter() - started
+                self.built_at = time.monotonic()
+            self._ready.set()
+
+    def _ensure(self):
+        if self._pid != os.getpid() and self.snapshot is None:
+            self.start()
+        if self.snapshot is None:
+            # Never hold a request for the whole first build
+            self._ready.wait(self.wait_seconds)
+        elif time.monotonic() - self.built_at > self.refresh_seconds and self.version:
+            if self.version() != self.built_version:
+                self.built_at = time.monotonic()
+                self.start()
+        return self.snapshot
+
+    def suggest(self, query, limit=10, kinds=None):
+        """Best matches as dicts with ``type``, ``id``, ``name``, ``artist`` and ``plays``"""
+        snapshot = self._ensure()
+        if snapshot is None:
+            return []
+        with self._lock:
+            results = []
+            for index in snapshot.search(query, limit, kinds):
+                parent = snapshot.parents[index]
+                results.append({
+                    'type': KIND_NAMES[snapshot.kinds[index]],
+                    'id': snapshot.ids[index],
+                    'name': snapshot.names[index],
+                    'artist': snapshot.names[parent] if parent >= 0 else None,
+                    'plays': snapshot.plays[index],
+                })
+        return results
+
+    def stats(self):
+        snapshot = self.snapshot
+        stats = snapshot.stats() if snapshot is not None else {}
+        stats['build_seconds'] = round(self.build_seconds, 3) if self.build_seconds is not None else None
+        return stats
+
+    def _apply_changes(self, session):
+        changes = session.info.pop('suggest_changes', None)
+        if not changes or self.snapshot is None:
+            return
+        with self._lock:
+            for kind, id, old_name, name, artist_id in changes:
+                old = self.snapshot.remove(kind, id, old_name) if old_name is not None else None
+                if name is not None:
+                    self.snapshot.add(kind, id, name, artist_id)
+                    if kind == KIND_ARTIST and old is not None:
+                        # Songs and albums still show the artist name of the old entry
+                        self.snapshot.names[old] = name
+
+
+# (kind, name attribute, artist attribute)
+_INDEXED = {Song: (KIND_SONG, 'title', 'artist_id'), Album: (KIND_ALBUM, 'title', 'artist_id'),
+            Artist: (KIND_ARTIST, 'name', None)}
+
+
+def _collect_changes(session, context):
+    """Remember names added, changed or deleted by this flush until the transaction ends"""
+    changes = session.info.setdefault('suggest_changes', [])
+    for obj in session.new | session.dirty | session.deleted:
+        indexed = _INDEXED.get(type(obj))
+        if indexed is None:
+            continue
+        kind, name_attr, artist_attr = indexed
+        # after_flush still sees this flush's history; play count updates are skipped
+        state = inspect(obj)
+        attrs = [name_attr] + ([artist_attr] if artist_attr else [])
+        if obj not in session.deleted and not any(state.attrs[a].history.has_changes() for a in attrs):
+            continue
+        name = getattr(obj, name_attr)
+        old_name = state.attrs[name_attr].history.deleted
+        old_name = old_name[0] if old_name else (None if obj in session.new else name)
+        changes.append((kind, obj.id, old_name, None if obj in session.deleted else name,
+                        getattr(obj, artist_attr) if artist_attr else None))
+
+
+def _discard_changes(session):
+    session.info.pop('suggest_changes', None)
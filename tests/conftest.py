@@ -0,0 +1,92 @@
+"""Shared fixtures: the app on a temporary SQLite database with a small seeded library.
+
+The database is created once per session. Tests that write create their
+own users and playlists so they do not depend on each other's order.
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = tempfile.mkdtemp(prefix='sonance-tests-')
+# app.py reads the database URL when it is imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DATA_DIR, 'test.db')
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import migrations  # noqa: E402
+from app import app as flask_app  # noqa: E402
+from models import db, User, Artist, Album, Song  # noqa: E402
+
+PASSWORD = 'password'
+
+# Seeded library: artists x albums per artist x songs per album
+ARTISTS, ALBUMS_PER_ARTIST, SONGS_PER_ALBUM = 3, 2, 3
+
+_usernames = (f'user{i}' for i in itertools.count(1))
+
+
+def seed_library():
+    for a in range(ARTISTS):
+        artist = Artist(name=f'Artist {a}')
+        db.session.add(artist)
+        db.session.flush()
+        for b in range(ALBUMS_PER_ARTIST):
+            album = Album(title=f'Album {a}-{b}', artist_id=artist.id, genre='Rock')
+            db.session.add(album)
+            db.session.flush()
+            for c in range(SONGS_PER_ALBUM):
+                db.session.add(Song(title=f'Song {a}-{b}-{c}', artist_id=artist.id, album_id=album.id,
+                                    file_path=f'song-{a}-{b}-{c}.mp3', duration=180 + c, plays=a * 10 + c))
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, QUERY_BUDGET_ENFORCE=True,
+                            UPLOAD_FOLDER=os.path.join(DATA_DIR, 'uploads'),
+                            COVER_CACHE_FOLDER=os.path.join(DATA_DIR, 'cover-cache'))
+    for folder in ('audio', 'covers'):
+        os.makedirs(os.path.join(DATA_DIR, 'uploads', folder), exist_ok=True)
+    # Thumbnails read their folders at init
+    flask_app.extensions['cover_thumbnails'].init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        migrations.upgrade()
+        seed_library()
+    yield flask_app
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_user(app):
+    """A new user; returns ``(id, username)``"""
+    username = next(_usernames)
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com',
+                    password=generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+        return user.id, username
+
+
+@pytest.fixture
+def user(app, client):
+    """A new user, logged in on ``client``; returns the user id"""
+    user_id, username = create_user(app)
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+    return user_id
+
+
+def song_ids(app):
+    with app.app_context():
+        return [song_id for song_id, in db.session.query(Song.id).order_by(Song.id)]
@@ -0,0 +1,90 @@
+import json
+import time
+
+import pytest
+
+import api_cache
+from api_cache import MemoryBackend, ResponseCache, SQLiteBackend
+from music_api import CACHE_TTLS, MusicAPIService
+from test_music_api import FakeClient
+
+
+class Clock:
+    """Stands in for the ``time`` module in api_cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api_cache, 'time', clock)
+    return clock
+
+
+def service_with(fake, backend=None, **options):
+    return MusicAPIService(client=fake, cache=ResponseCache(backend, ttls=CACHE_TTLS, **options))
+
+
+def test_lru_eviction_by_byte_budget(clock):
+    fake = FakeClient()
+    size = len(json.dumps(service_with(FakeClient()).get_track(1)))
+    backend = MemoryBackend(max_entries=100, max_bytes=int(size * 2.5))
+    service = service_with(fake, backend)
+    service.get_track(1)
+    service.get_track(2)
+    service.get_track(1)  # now the most recently used
+    service.get_track(3)  # over the byte budget: 2 goes
+    assert len(backend) == 2 and backend.evictions == 1
+    assert backend.bytes_used <= backend.max_bytes
+    service.get_track(1)
+    service.get_track(2)
+    assert fake.calls == {1: 1, 2: 2, 3: 1}
+
+
+def test_stale_hit_serves_the_old_value_while_one_refresh_runs(clock):
+    fake = FakeClient()
+    service = service_with(fake)
+    first = service.get_track(1)
+
+    clock.now += CACHE_TTLS['get_track'] + 1
+    fake.delay = 5
+    try:
+        assert [service.get_track(1) for _ in range(3)] == [first] * 3
+        assert fake.calls[1] == 2
+    finally:
+        fake.release.set()
+    deadline = time.monotonic() + 5
+    while service.cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    service.get_track(1)
+    stats = service.cache.stats()
+    assert (stats['stale_hits'], stats['refreshes'], stats['hits']) == (3, 1, 1)
+    assert fake.calls[1] == 2
+
+
+def test_negative_entries_expire(clock):
+    fake = FakeClient(missing={404})
+    service = service_with(fake, negative_ttl=30)
+    assert 'error' in service.get_track(404)
+    clock.now += 29
+    assert 'error' in service.get_track(404)
+    assert fake.calls[404] == 1 and service.cache.counters['negative_hits'] == 1
+    clock.now += 2
+    service.get_track(404)
+    assert fake.calls[404] == 2
+
+
+def test_caches_share_one_sqlite_file(clock, tmp_path):
+    fake = FakeClient()
+    path = str(tmp_path / 'api_cache.db')
+    first, second = service_with(fake, SQLiteBackend(path)), service_with(fake, SQLiteBackend(path))
+    assert first.get_track(1) == second.get_track(1)
+    assert fake.calls == {1: 1}
+    assert second.cache.counters['hits'] == 1
+    assert len(second.cache.backend) == 1
@@ -0,0 +1,41 @@
+import glob
+import html
+import json
+import os
+import re
+
+from assets import BUNDLES, Assets
+
+
+def test_templates_have_no_inline_scripts(app):
+    for path in glob.glob(os.path.join(app.root_path, 'templates', '*.html')):
+        with open(path) as f:
+            assert not re.search(r'<script(?![^>]*\bsrc=)[^>]*>', f.read()), path
+
+
+def test_build_writes_every_bundle(app, tmp_path):
+    assets = Assets()
+    assets.static_folder, assets.folder = app.static_folder, str(tmp_path)
+    results = assets.build()
+    assert set(results) == set(BUNDLES)
+    for hashed, sizes in results.values():
+        assert os.path.getsize(tmp_path / hashed) == sizes['minified'] < sizes['source'] * 0.95
+        assert os.path.getsize(tmp_path / (hashed + '.br')) == sizes['br'] < sizes['gzip']
+
+
+def script_data(page, bundle):
+    tag = re.search(r'<script src="[^"]*' + re.escape(bundle) + r'[^"]*"([^>]*)>', page)
+    return {name: html.unescape(value) for name, _, value in
+            re.findall(r'data-([\w-]+)=(["\'])(.*?)\2', tag.group(1), re.S)}
+
+
+def test_pages_pass_their_settings_on_the_script_tag(client, user):
+    data = script_data(client.get('/library').get_data(as_text=True), 'js/pages/library.js')
+    assert set(json.loads(data['cursors'])) == {'songs', 'albums', 'artists'}
+
+    playlist_id = client.post('/playlist/create', json={'name': "Rock 'n' roll"}).get_json()['id']
+    data = script_data(client.get(f'/playlist/{playlist_id}').get_data(as_text=True), 'js/pages/playlist.js')
+    assert data['playlist-id'] == str(playlist_id)
+    assert data['name'] == "Rock 'n' roll"
+    assert data['can-edit'] == 'true'
+    json.loads(data['cursor'])
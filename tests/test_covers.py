@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.mark.parametrize('filename', ['..', '.', 'missing.jpg'])
+def test_cover_that_is_not_a_file(app, client, filename):
+    assert app.extensions['cover_thumbnails'].digest(filename) is None
+    assert client.get(f'/covers/md/0123456789abcdef/{filename}').status_code == 404
@@ -0,0 +1,63 @@
+import logging
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from database import WriteLock
+from models import db
+
+
+def acquire_in_thread(lock, timeout):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(lock.acquire(timeout)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_write_lock_is_reentrant_per_thread():
+    lock = WriteLock()
+    assert lock.acquire(0) and lock.acquire(0)
+    assert not acquire_in_thread(lock, 0.05)
+    lock.release()
+    assert not acquire_in_thread(lock, 0.05)
+    lock.release()
+    assert acquire_in_thread(lock, 0.05)
+    with pytest.raises(RuntimeError):
+        WriteLock().release()
+
+
+def test_concurrent_writers(app, caplog):
+    writers, writes = 8, 25
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('CREATE TABLE write_test (writer INTEGER, n INTEGER)'))
+    errors = []
+
+    def write(writer):
+        try:
+            with app.app_context():
+                for n in range(writes):
+                    with db.engine.begin() as connection:
+                        connection.execute(text('INSERT INTO write_test VALUES (:writer, :n)'),
+                                           {'writer': writer, 'n': n})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    with caplog.at_level(logging.WARNING, logger='database'):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    try:
+        assert not errors
+        assert not caplog.records
+        with app.app_context():
+            assert db.session.execute(text('SELECT COUNT(*) FROM write_test')).scalar() == writers * writes
+            assert not app.extensions['database'].write_lock._count
+    finally:
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(text('DROP TABLE write_test'))
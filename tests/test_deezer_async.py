@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from benchmarks.deezer_stub import serve
+from deezer_async import AsyncDeezerClient
+
+
+@pytest.fixture
+def stub():
+    server = serve(latency=0.1)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def deezer(stub):
+    client = AsyncDeezerClient(f'http://127.0.0.1:{stub.server_port}', timeout=2.0, retries=2, backoff=0.01)
+    yield client
+    client.close()
+
+
+def test_identical_requests_share_one_upstream_call(stub, deezer):
+    callers = 10
+    barrier = threading.Barrier(callers)
+    titles = []
+
+    def call():
+        barrier.wait()
+        titles.append(deezer.get_track(7).title)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert titles == ['Track 7'] * callers
+    assert stub.hits == 1
+    assert deezer.stats()['coalesced'] == callers - 1
+
+
+def test_retries_503(stub, deezer):
+    stub.fail_next = 2
+    assert deezer.get_artist(3).name == 'Artist 3'
+    assert stub.hits == 3
+    assert deezer.stats()['retries'] == 2
+
+
+def test_gives_up_after_the_last_retry(stub, deezer):
+    stub.fail_next = 3
+    with pytest.raises(Exception, match='503'):
+        deezer.get_track(1)
+    assert deezer.stats()['failures'] == 1
+
+
+@pytest.mark.parametrize('timeout, deadline, error', [(0.1, None, ConnectionError), (5.0, 0.1, TimeoutError)])
+def test_timeouts(stub, timeout, deadline, error):
+    """A slow upstream fails the request; callers stop waiting at the deadline either way"""
+    stub.latency = 1.0
+    client = AsyncDeezerClient(f'http://127.0.0.1:{stub.server_port}', timeout=timeout, retries=0)
+    if deadline is not None:
+        client.deadline = deadline
+    try:
+        with pytest.raises(error):
+            client.get_track(1)
+    finally:
+        client.close()
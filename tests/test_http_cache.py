@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from http_cache import LIBRARY
+from models import db, Artist
+
+
+def library_version(app):
+    with app.app_context():
+        return db.session.execute(text('SELECT version FROM cache_version WHERE name = :name'),
+                                  {'name': LIBRARY}).scalar()
+
+
+def test_write_changes_the_etag(app, client):
+    first = client.get('/api/stats')
+    etag = first.headers['ETag']
+    assert client.get('/api/stats', headers={'If-None-Match': etag}).status_code == 304
+
+    version = library_version(app)
+    with app.app_context():
+        db.session.add(Artist(name='Cache buster'))
+        db.session.commit()
+    assert library_version(app) == (version or 0) + 1
+
+    second = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert second.get_json()['artists'] == first.get_json()['artists'] + 1
@@ -0,0 +1,91 @@
+import itertools
+import os
+
+import pytest
+
+from library_import import LibraryImporter
+from models import db, Song
+from test_uploads import wav_bytes
+
+
+_folders = itertools.count(1)
+
+
+@pytest.fixture
+def music(tmp_path):
+    """Three WAV files in a folder of their own; titles are ``<folder>-<name>`` so each test's are unique"""
+    folder = tmp_path / f'import{next(_folders)}'
+    folder.mkdir()
+    for name in ('one', 'two', 'three'):
+        (folder / f'{folder.name}-{name}.wav').write_bytes(wav_bytes())
+    return folder
+
+
+def file(folder, name):
+    return folder / f'{folder.name}-{name}.wav'
+
+
+def run(app, folder):
+    with app.app_context():
+        importer = LibraryImporter(os.path.join(app.config['UPLOAD_FOLDER'], 'audio'), workers=1)
+        return importer.run(str(folder), {'wav'})
+
+
+def songs(app, folder):
+    """``{name: file_path}`` of the songs imported from ``folder``"""
+    prefix = folder.name + '-'
+    titles = [name.rsplit('.', 1)[0] for name in os.listdir(folder)]
+    with app.app_context():
+        rows = db.session.query(Song.title, Song.file_path).filter(Song.title.in_(titles))
+        return {title[len(prefix):]: path for title, path in rows}
+
+
+def stored(app, path):
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'audio', path)
+
+
+def test_second_run_finds_everything_unchanged(app, music):
+    assert run(app, music)['imported'] == 3
+    stats = run(app, music)
+    assert (stats['unchanged'], stats['queued'], stats['imported']) == (3, 0, 0)
+
+
+def test_touched_file_is_not_reimported(app, music):
+    run(app, music)
+    before = songs(app, music)
+    stat = os.stat(file(music, 'one'))
+    os.utime(file(music, 'one'), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    stats = run(app, music)
+    assert (stats['queued'], stats['unchanged'], stats['imported'], stats['updated']) == (1, 3, 0, 0)
+    assert songs(app, music) == before
+
+
+def test_edited_file_updates_its_song(app, music):
+    run(app, music)
+    old_path = songs(app, music)['one']
+    (file(music, 'one')).write_bytes(wav_bytes())
+    stats = run(app, music)
+    assert (stats['imported'], stats['updated']) == (0, 1)
+    new_path = songs(app, music)['one']
+    assert new_path != old_path and len(songs(app, music)) == 3
+    assert os.path.exists(stored(app, new_path)) and not os.path.exists(stored(app, old_path))
+
+
+def test_deleted_song_is_imported_again(app, music):
+    run(app, music)
+    with app.app_context():
+        db.session.delete(Song.query.filter_by(title=file(music, 'two').stem).one())
+        db.session.commit()
+    assert run(app, music)['imported'] == 1
+    assert 'two' in songs(app, music)
+
+
+def test_store_keeps_its_own_copy(app, music):
+    run(app, music)
+    path = stored(app, songs(app, music)['one'])
+    original = open(path, 'rb').read()
+    # Tags edited in place must not reach the stored copy
+    with open(file(music, 'one'), 'r+b') as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b'edit')
+    assert open(path, 'rb').read() == original
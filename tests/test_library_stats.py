@@ -0,0 +1,21 @@
+from models import db, Song
+
+
+def test_plays_of_a_deleted_song_do_not_count(app):
+    counters, play_counter = app.extensions['library_counters'], app.extensions['play_counter']
+    with app.app_context():
+        counters.reconcile()
+        song = Song(title='Short-lived', artist_id=1, file_path='short-lived.mp3', plays=0)
+        db.session.add(song)
+        db.session.commit()
+        kept, deleted = db.session.query(Song.id).filter(Song.id != song.id).first()[0], song.id
+
+        play_counter.record(kept, 2)
+        play_counter.flush()
+        play_counter.record(kept, 3)
+        play_counter.record(deleted, 4)
+        db.session.delete(song)
+        db.session.commit()
+        play_counter.flush()
+
+        assert counters.reconcile(fix=False) == {}
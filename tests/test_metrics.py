@@ -0,0 +1,47 @@
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{[^}]*\})? (\S+)$')
+
+
+def test_server_timing_header(client):
+    timing = client.get('/api/stats').headers['Server-Timing']
+    assert re.fullmatch(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"', timing)
+
+
+def test_exposition_format(app, client):
+    client.get('/api/stats')
+    body = client.get('/metrics').get_data(as_text=True)
+    declared, counts = {}, {}
+    for line in body.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            declared[name] = kind
+            continue
+        if line.startswith('# HELP '):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        base = re.sub(r'_(bucket|sum|count)$', '', name) if name not in declared else name
+        assert base in declared, line
+        float(value)
+        if name.endswith('_bucket'):
+            series = re.sub(r',?le="[^"]*"', '', labels)
+            assert int(value) >= counts.get((base, series), 0), 'buckets must be cumulative'
+            counts[(base, series)] = int(value)
+            if 'le="+Inf"' in labels:
+                assert f'{base}_count{series if series != "{}" else ""} {value}' in body
+    assert declared['sonance_request_duration_seconds'] == 'histogram'
+    assert 'sonance_request_duration_seconds_count{endpoint="get_stats",method="GET",status="200"}' in body
+
+
+def test_failed_statement_does_not_leak_its_start_time(app):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT * FROM no_such_table'))
+            assert not connection.info.get('metrics_started')
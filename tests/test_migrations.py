@@ -0,0 +1,12 @@
+import migrations
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        assert migrations.check_query_plans() == {}
+
+
+def test_check_query_plans_reports_full_scans(app, monkeypatch):
+    monkeypatch.setattr(migrations, 'HOT_QUERIES', {'unindexed': 'SELECT id FROM song WHERE duration = 180'})
+    with app.app_context():
+        assert list(migrations.check_query_plans()) == ['unindexed']
@@ -0,0 +1,89 @@
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from api_cache import ResponseCache
+from music_api import CACHE_TTLS, MAX_BATCH_SIZE, MusicAPIService
+
+
+class FakeClient:
+    """Stands in for deezer.Client; counts lookups per track id"""
+
+    def __init__(self, missing=(), delay=None):
+        self.calls = Counter()
+        self.missing = set(missing)
+        self.delay = delay
+        self.release = threading.Event()
+
+    def get_track(self, track_id):
+        self.calls[track_id] += 1
+        if self.delay is not None:
+            self.release.wait(self.delay)
+        if track_id in self.missing:
+            raise Exception('DataException: no data')
+        return SimpleNamespace(
+            id=track_id, title=f'Track {track_id}', preview=f'https://preview/{track_id}', duration=30,
+            artist=SimpleNamespace(id=1, name='Artist'),
+            album=SimpleNamespace(id=2, title='Album', cover_medium='https://cover'),
+        )
+
+
+@pytest.fixture
+def fake():
+    return FakeClient(missing={404})
+
+
+@pytest.fixture
+def service(fake):
+    return MusicAPIService(client=fake, cache=ResponseCache(ttls=CACHE_TTLS))
+
+
+def test_get_tracks_deduplicates_ids(service, fake):
+    result = service.get_tracks([1, 2, 1, 3, 2])
+    assert [track['id'] for track in result['data']] == [1, 2, 3]
+    assert fake.calls == {1: 1, 2: 1, 3: 1}
+
+
+def test_get_tracks_shares_the_get_track_cache(service, fake):
+    service.get_track(1)
+    service.get_tracks([1, 2])
+    service.get_tracks([2, 1])
+    assert service.get_track(2)['title'] == 'Track 2'
+    assert fake.calls == {1: 1, 2: 1}
+    assert service.cache.counters['hits'] == 4
+
+
+def test_get_tracks_reports_failures_per_track(service, fake):
+    result = service.get_tracks([1, 404])
+    assert [track['id'] for track in result['data']] == [1]
+    assert result['errors'] == {404: 'DataException: no data'}
+    # Failures are cached too, so a retry does not hit Deezer again
+    service.get_tracks([404])
+    assert fake.calls[404] == 1
+
+
+def test_get_tracks_times_out_slow_lookups():
+    fake = FakeClient(delay=5)
+    service = MusicAPIService(client=fake)
+    try:
+        result = service.get_tracks([1], timeout=0.05)
+    finally:
+        fake.release.set()
+    assert result == {'data': [], 'errors': {1: 'Timed out'}, 'platform': 'deezer'}
+
+
+def test_get_tracks_rejects_oversized_batches(service, fake):
+    with pytest.raises(ValueError):
+        service.get_tracks(range(MAX_BATCH_SIZE + 1))
+    assert not fake.calls
+    # Duplicates do not count towards the limit
+    assert len(service.get_tracks(list(range(MAX_BATCH_SIZE)) * 2)['data']) == MAX_BATCH_SIZE
+
+
+def test_tracks_endpoint_rejects_oversized_batches(client):
+    ids = ','.join(str(i) for i in range(MAX_BATCH_SIZE + 1))
+    response = client.get(f'/api/music/tracks?ids={ids}')
+    assert response.status_code == 400
+    assert str(MAX_BATCH_SIZE) in response.get_json()['error']
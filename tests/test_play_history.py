@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+import play_history
+from conftest import create_user, song_ids
+from models import db, PlayEvent
+from play_history import PlayHistory
+
+
+def test_dedupe_window_and_compact(app, monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(play_history, 'time', clock)
+    history = PlayHistory()
+    history.dedupe_seconds, history.per_user = 30, 3
+    user_id, _ = create_user(app)
+    first, second = song_ids(app)[:2]
+
+    plays = [(0, first, True), (10, first, False), (15, second, True), (20, first, True),
+             (40, first, False), (51, first, True)]
+    for now, song_id, counted in plays:
+        clock.now = now
+        assert history.record(user_id, song_id) is counted, now
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            history.write(connection)
+            connection.execute(text('INSERT INTO play_event (user_id, song_id, played_at) '
+                                    'VALUES (:user_id, :song_id, :played_at)'),
+                               {'user_id': user_id, 'song_id': second,
+                                'played_at': datetime.utcnow() - timedelta(days=history.retention_days + 1)})
+        assert db.session.query(PlayEvent).filter_by(user_id=user_id).count() == 5
+
+        # One past retention, and the oldest of four beyond the cap of three
+        assert history.compact() >= 2
+        kept = db.session.query(PlayEvent.song_id).filter_by(user_id=user_id).order_by(PlayEvent.id).all()
+        assert [song_id for song_id, in kept] == [second, first, first]
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import song_ids
+from models import db, playlist_songs
+
+
+@pytest.fixture
+def playlist(client, user):
+    return client.post('/playlist/create', json={'name': 'Mix'}).get_json()['id']
+
+
+def add(client, playlist_id, ids):
+    return client.post(f'/playlist/{playlist_id}/songs/add', json={'song_ids': ids}).get_json()
+
+
+def test_song_ids_lists_the_whole_playlist_in_order(app, client, playlist):
+    ids = song_ids(app)
+    order = ids[::-1]
+    add(client, playlist, order)
+    # Larger than one page of /api/playlist/<id>/songs
+    assert client.get(f'/api/playlist/{playlist}/songs?limit=5').get_json()['next_cursor']
+    assert client.get(f'/api/playlist/{playlist}/song-ids').get_json() == {'song_ids': order}
+
+
+def test_song_ids_of_unknown_playlist(client):
+    assert client.get('/api/playlist/999999/song-ids').status_code == 404
+
+
+def order(client, playlist_id):
+    return client.get(f'/api/playlist/{playlist_id}/song-ids').get_json()['song_ids']
+
+
+def move(client, playlist_id, ids, index=None):
+    return client.post(f'/playlist/{playlist_id}/songs/reorder', json={'song_ids': ids, 'index': index}).get_json()
+
+
+@pytest.mark.parametrize('ids, index', [([5], 2), ([0, 4], 1), ([1], 0), ([2], None), ([3, 0], 3)])
+def test_move_songs(client, playlist, ids, index):
+    members = song_ids(client.application)[:6]
+    add(client, playlist, members)
+    moving = [members[i] for i in ids]
+    rest = [song_id for song_id in members if song_id not in moving]
+    expected = rest[:index] + moving + rest[index:] if index is not None else rest + moving
+    assert move(client, playlist, moving, index)['moved'] == moving
+    assert order(client, playlist) == expected
+
+
+def test_move_songs_with_tied_positions(app, client, playlist):
+    # Songs added through Playlist.songs all get the default position 0
+    members = song_ids(app)[:5]
+    with app.app_context():
+        db.session.execute(playlist_songs.insert(), [{'playlist_id': playlist, 'song_id': song_id}
+                                                     for song_id in members])
+        db.session.commit()
+    assert order(client, playlist) == members
+    move(client, playlist, [members[4]], 2)
+    assert order(client, playlist) == members[:2] + [members[4]] + members[2:4]
+    move(client, playlist, [members[0]], 3)
+    assert order(client, playlist) == [members[1], members[4], members[2], members[0], members[3]]
@@ -0,0 +1,61 @@
+"""Every endpoint declared with @query_budget stays within its budget.
+
+Each request is counted from the outside by assert_query_budget, so the
+query that loads the logged-in user counts too. Views behind
+``http_cache.cached`` also get the one version lookup the cache runs
+before them.
+"""
+import pytest
+
+from conftest import song_ids
+from query_budget import QUERY_BUDGETS, assert_query_budget
+
+URLS = {
+    'index': '/',
+    'library': '/library',
+    'get_library_songs': '/api/library/songs',
+    'get_library_albums': '/api/library/albums',
+    'get_library_artists': '/api/library/artists',
+    'search': '/search?q=song',
+    'suggest': '/api/suggest?q=so',
+    'player': '/player/{song_id}',
+    'get_song': '/api/song/{song_id}',
+    'favorites_contains': '/api/user/favorites/contains?ids={song_ids}',
+    'get_stats': '/api/stats',
+    'get_playlists': '/api/playlists',
+    'get_trending_songs': '/api/songs/trending',
+    'get_new_releases': '/api/albums/new-releases',
+    'get_recommended_songs': '/api/songs/recommended',
+    'get_popular_artists': '/api/artists/popular',
+    'get_recently_played': '/api/user/recently-played',
+    'get_discover': '/api/discover',
+    'get_user_favorites': '/api/user/favorites',
+    'get_playlist_songs': '/api/playlist/{playlist_id}/songs',
+    'get_playlist_song_ids': '/api/playlist/{playlist_id}/song-ids',
+}
+
+HTTP_CACHED = {'get_song', 'get_stats', 'get_trending_songs', 'get_new_releases', 'get_popular_artists'}
+
+
+@pytest.fixture
+def library(app, client, user):
+    """Favorites, a playlist and a play for the logged-in user; returns URL parameters"""
+    ids = song_ids(app)
+    client.post('/api/user/favorites/bulk', json={'add': ids[:5]})
+    playlist_id = client.post('/playlist/create', json={'name': 'Budget'}).get_json()['id']
+    client.post(f'/playlist/{playlist_id}/songs/add', json={'song_ids': ids[:8]})
+    client.get(f'/player/{ids[0]}')
+    return {'song_id': ids[0], 'song_ids': ','.join(map(str, ids)), 'playlist_id': playlist_id}
+
+
+def test_every_budgeted_endpoint_is_covered():
+    assert set(URLS) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(URLS))
+def test_query_budget(client, library, endpoint):
+    url = URLS[endpoint].format(**library)
+    # The first request may fill caches; the budget holds for both
+    for _ in range(2):
+        response = assert_query_budget(client, url, QUERY_BUDGETS[endpoint] + (endpoint in HTTP_CACHED))
+        assert response.status_code == 200, response.data
@@ -0,0 +1,41 @@
+from collections import Counter
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+import recommender
+from recommender import _cooccurrence
+
+
+def brute_force(baskets, items):
+    members = {}
+    for basket, item in zip(baskets, items):
+        members.setdefault(basket, []).append(item)
+    return Counter(pair for songs in members.values() for pair in permutations(songs, 2))
+
+
+def as_counter(left, right, counts):
+    return Counter({(int(a), int(b)): int(n) for a, b, n in zip(left, right, counts)})
+
+
+@pytest.mark.parametrize('chunk', [1, 50, recommender.PAIR_CHUNK])
+def test_cooccurrence_counts_in_chunks(monkeypatch, chunk):
+    monkeypatch.setattr(recommender, 'PAIR_CHUNK', chunk)
+    rng = np.random.default_rng(1)
+    baskets, items = [], []
+    for basket in range(40):
+        for item in rng.choice(30, size=rng.integers(1, 12), replace=False):
+            baskets.append(basket)
+            items.append(int(item))
+    left, right, counts = _cooccurrence(np.array(baskets), np.array(items))
+    assert as_counter(left, right, counts) == brute_force(baskets, items)
+    assert (np.diff(left) >= 0).all()
+
+
+def test_long_baskets_keep_their_first_entries(monkeypatch):
+    monkeypatch.setattr(recommender, 'MAX_BASKET_SIZE', 3)
+    # Given in order 9, 2, 7, 1, 5: the first three are counted, not the lowest ids
+    items = [9, 2, 7, 1, 5]
+    counted = as_counter(*_cooccurrence(np.zeros(5, dtype=np.int64), np.array(items)))
+    assert counted == brute_force([0] * 3, items[:3])
@@ -0,0 +1,68 @@
+from sqlalchemy import text
+
+import migrations
+from models import db, Song
+from search_index import SearchIndex, TABLE
+
+
+def indexed_rows(app):
+    with app.app_context():
+        return db.session.execute(text(f'SELECT COUNT(*) FROM {TABLE}')).scalar()
+
+
+def test_search_finds_seeded_library(client):
+    # bm25 ranks by corpus statistics, which other tests' rows change
+    results = client.get('/search?q=Song 1-0').get_json()
+    assert 'Song 1-0-0' in [song['title'] for song in results['songs']]
+    assert client.get('/search?q=Artist 2').get_json()['artists'][0]['name'] == 'Artist 2'
+
+
+def test_index_created_at_start_up_is_filled(app, client):
+    original = app.extensions['search_index']
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE {TABLE}'))
+    try:
+        assert SearchIndex(app).available
+        assert indexed_rows(app) > 0
+    finally:
+        app.extensions['search_index'] = original
+    assert client.get('/search?q=Song').get_json()['songs']
+
+
+def test_migration_fills_an_empty_index(app):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(f'DELETE FROM {TABLE}'))
+        assert indexed_rows(app) == 0
+        with db.engine.begin() as connection:
+            migrations.fill_search_index(connection)
+    assert indexed_rows(app) > 0
+
+
+def test_song_without_artist_is_indexed(app, client):
+    # SQLite does not enforce the foreign key, so a song can outlive its artist
+    with app.app_context():
+        song = Song(title='Orphaned Tune', artist_id=999999, file_path='orphaned.mp3')
+        db.session.add(song)
+        db.session.commit()
+        song_id = song.id
+    try:
+        songs = client.get('/search?q=Orphaned').get_json()['songs']
+        assert songs == [{'id': song_id, 'title': 'Orphaned Tune', 'artist': 'Unknown'}]
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(Song, song_id))
+            db.session.commit()
+
+
+def test_limit_and_offset_are_clamped(client):
+    assert len(client.get('/search?q=Song&limit=-1').get_json()['songs']) == 1
+    assert len(client.get('/search?q=Song&limit=0').get_json()['songs']) == 1
+    assert len(client.get('/search?q=Song&limit=1000').get_json()['songs']) == 18
+    assert client.get('/search?q=Song&offset=-5').get_json() == client.get('/search?q=Song').get_json()
+
+
+def test_malformed_limit_or_offset(client):
+    assert client.get('/search?q=Song&limit=ten').status_code == 400
+    assert client.get('/search?q=Song&offset=1.5').status_code == 400
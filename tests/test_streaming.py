@@ -0,0 +1,129 @@
+import os
+
+import pytest
+from werkzeug.http import http_date
+
+from conftest import song_ids
+from models import db, Song
+from streaming import MAX_RANGES, RangeNotSatisfiable, make_etag, multipart_length, parse_range_header
+
+SIZE = 1000
+CONTENT = bytes(i % 251 for i in range(SIZE))
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 99)]),
+    ('bytes=-100', [(900, 999)]),
+    ('bytes=-5000', [(0, 999)]),
+    ('bytes=500-', [(500, 999)]),
+    ('bytes=900-5000', [(900, 999)]),
+    ('bytes=0-99,50-199,200-299', [(0, 299)]),
+    ('bytes=500-599, 0-9, -10', [(0, 9), (500, 599), (990, 999)]),
+    ('bytes=0-9,1000-2000', [(0, 9)]),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', [None, '', 'items=0-9', 'bytes=', 'bytes=9-0', 'bytes=a-9', 'bytes=5'])
+def test_parse_range_header_ignores_malformed(header):
+    assert parse_range_header(header, SIZE) is None
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=1000-1999', 'bytes=-0', 'bytes=2000-,3000-3999'])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, SIZE)
+
+
+def test_parse_range_header_too_many_ranges():
+    ranges = ','.join(f'{i * 2}-{i * 2}' for i in range(MAX_RANGES + 1))
+    assert parse_range_header(f'bytes={ranges}', SIZE) is None
+    assert len(parse_range_header(f'bytes={ranges.rsplit(",", 1)[0]}', SIZE)) == MAX_RANGES
+
+
+@pytest.fixture
+def audio(app):
+    """Song id and path of a seeded song with SIZE bytes of audio on disk"""
+    song_id = song_ids(app)[0]
+    with app.app_context():
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'audio', db.session.get(Song, song_id).file_path)
+    with open(path, 'wb') as f:
+        f.write(CONTENT)
+    return song_id, path
+
+
+def stream(client, song_id, **headers):
+    return client.get(f'/api/song/{song_id}/stream', headers=headers)
+
+
+def test_full_response(client, audio):
+    response = stream(client, audio[0])
+    assert response.status_code == 200
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == str(SIZE)
+    assert response.data == CONTENT
+
+
+def test_single_range(client, audio):
+    response = stream(client, audio[0], Range='bytes=100-199')
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{SIZE}'
+    assert response.headers['Content-Length'] == '100'
+    assert response.data == CONTENT[100:200]
+
+
+def test_suffix_range(client, audio):
+    response = stream(client, audio[0], Range='bytes=-10')
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 990-999/{SIZE}'
+    assert response.data == CONTENT[-10:]
+
+
+def test_multiple_ranges(client, audio):
+    response = stream(client, audio[0], Range='bytes=0-9,500-509,505-519')
+    assert response.status_code == 206
+    content_type = response.headers['Content-Type']
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('boundary=', 1)[1]
+
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert len(response.data) == multipart_length([(0, 9), (500, 519)], SIZE, 'audio/mpeg', boundary)
+    parts = response.data.split(f'--{boundary}'.encode())
+    assert parts[-1] == b'--\r\n'
+    assert parts[1].endswith(b'Content-Range: bytes 0-9/1000\r\n\r\n' + CONTENT[0:10] + b'\r\n')
+    assert parts[2].endswith(b'Content-Range: bytes 500-519/1000\r\n\r\n' + CONTENT[500:520] + b'\r\n')
+
+
+def test_unsatisfiable_range(client, audio):
+    response = stream(client, audio[0], Range=f'bytes={SIZE}-')
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{SIZE}'
+
+
+def test_not_modified(client, audio):
+    etag = stream(client, audio[0]).headers['ETag']
+    assert stream(client, audio[0], **{'If-None-Match': etag}).status_code == 304
+    assert stream(client, audio[0], **{'If-None-Match': '"other"'}).status_code == 200
+
+    last_modified = http_date(os.stat(audio[1]).st_mtime)
+    assert stream(client, audio[0], **{'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_if_range(client, audio):
+    etag = f'"{make_etag(os.stat(audio[1]))}"'
+    response = stream(client, audio[0], Range='bytes=0-9', **{'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == CONTENT[:10]
+
+    # A changed representation gets the whole file instead of a range of the wrong one
+    response = stream(client, audio[0], Range='bytes=0-9', **{'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+    # Weak validators never match If-Range
+    response = stream(client, audio[0], Range='bytes=0-9', **{'If-Range': f'W/{etag}'})
+    assert response.status_code == 200
+
+    last_modified = http_date(os.stat(audio[1]).st_mtime)
+    assert stream(client, audio[0], Range='bytes=0-9', **{'If-Range': last_modified}).status_code == 206
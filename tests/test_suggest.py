@@ -0,0 +1,24 @@
+import os
+import time
+
+from suggest import SuggestIndex
+
+
+def test_suggest_finds_seeded_library(client):
+    suggestions = client.get('/api/suggest?q=Artist 1').get_json()['suggestions']
+    assert (suggestions[0]['type'], suggestions[0]['name']) == ('artist', 'Artist 1')
+    assert len(client.get('/api/suggest?q=Song&limit=2').get_json()['suggestions']) == 2
+
+
+def test_malformed_limit(client):
+    assert client.get('/api/suggest?q=Song&limit=ten').status_code == 400
+
+
+def test_requests_do_not_wait_for_the_first_build():
+    index = SuggestIndex()
+    # A build that has started in this process and not finished yet
+    index._pid = os.getpid()
+    index.wait_seconds = 0.05
+    started = time.perf_counter()
+    assert index.suggest('song') == []
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,98 @@
+import io
+import itertools
+import os
+import wave
+
+import pytest
+from PIL import Image
+
+import uploads
+from models import db, Song
+
+_tones = itertools.count(1)
+
+
+def wav_bytes():
+    """A short WAV file whose content differs on every call"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(1)
+        audio.setframerate(8000)
+        audio.writeframes(bytes([next(_tones) % 256]) * 800 + os.urandom(16))
+    return buffer.getvalue()
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), tuple(os.urandom(3))).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(client, audio, cover=None):
+    data = {'audio': (io.BytesIO(audio), 'track.wav'), 'title': 'Upload'}
+    if cover is not None:
+        data['cover'] = (io.BytesIO(cover), 'cover.png')
+    return client.post('/api/upload', data=data, content_type='multipart/form-data')
+
+
+def stored_files(app, folder):
+    root = os.path.join(app.config['UPLOAD_FOLDER'], folder)
+    return {os.path.relpath(os.path.join(path, name), root)
+            for path, _, names in os.walk(root) for name in names}
+
+
+def song_path(app, song_id):
+    with app.app_context():
+        return os.path.join(app.config['UPLOAD_FOLDER'], 'audio', db.session.get(Song, song_id).file_path)
+
+
+def delete_song(app, song_id):
+    with app.app_context():
+        db.session.delete(db.session.get(Song, song_id))
+        db.session.commit()
+
+
+def test_upload_stores_audio_and_cover(app, client, user):
+    response = upload(client, wav_bytes(), png_bytes())
+    assert response.status_code == 200, response.data
+    assert os.path.exists(song_path(app, response.get_json()['song_id']))
+
+
+@pytest.mark.parametrize('audio_ok', [True, False])
+def test_rejected_upload_leaves_no_files(app, client, user, audio_ok):
+    audio, cover = (wav_bytes(), b'not an image') if audio_ok else (b'not audio', png_bytes())
+    before = stored_files(app, 'audio'), stored_files(app, 'covers')
+    assert upload(client, audio, cover).status_code == 400
+    assert (stored_files(app, 'audio'), stored_files(app, 'covers')) == before
+
+
+def test_file_is_removed_with_its_last_reference(app, client, user):
+    audio = wav_bytes()
+    first, second = (upload(client, audio).get_json()['song_id'] for _ in range(2))
+    path = song_path(app, first)
+    assert song_path(app, second) == path
+    delete_song(app, first)
+    assert os.path.exists(path)
+    delete_song(app, second)
+    assert not os.path.exists(path)
+
+
+def test_upload_racing_the_cleanup_of_a_delete_keeps_its_file(app, client, user, monkeypatch):
+    audio = wav_bytes()
+    first = upload(client, audio).get_json()['song_id']
+    path = song_path(app, first)
+
+    # Delete the only reference, but hold the file cleanup back until the same content is uploaded again
+    pending = []
+    monkeypatch.setattr(uploads, 'remove_files', lambda directory, paths: pending.append((directory, paths)))
+    delete_song(app, first)
+    monkeypatch.undo()
+    assert pending and os.path.exists(path)
+
+    second = upload(client, audio).get_json()['song_id']
+    with app.app_context():
+        for directory, paths in pending:
+            uploads.remove_files(directory, paths)
+    assert os.path.exists(path)
+    assert song_path(app, second) == path
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import tempfile
+
+import mutagen
+from flask import current_app
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import event, text
+from sqlalchemy.orm import object_session
+
+from models import db, Song
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class StoredUpload:
+    """A validated upload, spooled to a temp file until ``place`` moves it into the store"""
+    __slots__ = ('path', 'sha256', 'size', 'absolute_path', 'temp_path')
+
+    def __init__(self, path, sha256, size, absolute_path, temp_path):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.absolute_path = absolute_path
+        self.temp_path = temp_path
+
+    def place(self):
+        """Move the spooled copy into place, or drop it if an identical file is already there"""
+        if self.temp_path is None:
+            return
+        if os.path.exists(self.absolute_path):
+            os.unlink(self.temp_path)
+        else:
+            os.makedirs(os.path.dirname(self.absolute_path), exist_ok=True)
+            os.replace(self.temp_path, self.absolute_path)
+        self.temp_path = None
+
+    def discard(self):
+        """Drop the spooled copy if it was never placed"""
+        if self.temp_path is not None:
+            os.unlink(self.temp_path)
+            self.temp_path = None
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def spool(file_storage, directory, max_bytes):
+    """Copy an upload to a temp file in ``directory`` while hashing it.
+
+    Only one chunk is held in memory at a time. Returns ``(temp_path,
+    sha256, size)``; raises UploadError once ``max_bytes`` is exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError('File exceeds the upload size limit', 413)
+                digest.update(chunk)
+                temp.write(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    if size == 0:
+        os.unlink(temp_path)
+        raise UploadError('Empty file')
+    return temp_path, digest.hexdigest(), size
+
+
+def read_audio_metadata(path):
+    """Duration, bitrate and tags of an audio file, or None if it is not audio"""
+    try:
+        audio = mutagen.File(path, easy=True)
+    except mutagen.MutagenError:
+        return None
+    if audio is None or audio.info is None:
+        return None
+
+    def tag(name):
+        values = audio.tags.get(name) if audio.tags else None
+        return values[0].strip() if values and values[0].strip() else None
+
+    return {
+        'duration': int(round(audio.info.length or 0)),
+        'bitrate': getattr(audio.info, 'bitrate', None) or None,
+        'title': tag('title'),
+        'artist': tag('artist'),
+        'album': tag('album'),
+        'genre': tag('genre'),
+    }
+
+
+def receive_audio(file_storage, directory, max_bytes):
+    """Validate an audio upload and spool it for its content-addressed place.
+
+    Files live at ``<first two hex digits>/<sha256>.<ext>`` below
+    ``directory`` so identical uploads share one copy. Returns the
+    StoredUpload and the metadata read with mutagen. Place the file after
+    ``add_reference`` in the same transaction: the reference takes the
+    write lock, so a delete of the same content cannot remove the file
+    in between (see ``remove_files``).
+    """
+    extension = _extension(file_storage.filename)
+    temp_path, sha256, size = spool(file_storage, directory, max_bytes)
+    metadata = read_audio_metadata(temp_path)
+    if metadata is None:
+        os.unlink(temp_path)
+        raise UploadError('Not a valid audio file')
+
+    existing = db.session.execute(
+        text('SELECT path FROM stored_file WHERE sha256 = :sha256'), {'sha256': sha256}
+    ).scalar()
+    relative_path = existing or f'{sha256[:2]}/{sha256}.{extension}'
+    absolute_path = os.path.join(directory, relative_path)
+    return StoredUpload(relative_path, sha256, size, absolute_path, temp_path), metadata
+
+
+def receive_image(file_storage, directory, max_bytes):
+    """Validate an image upload and spool it for ``<sha256>.<ext>`` in ``directory``"""
+    extension = _extension(file_storage.filename)
+    temp_path, sha256, size = spool(file_storage, directory, max_bytes)
+    try:
+        with Image.open(temp_path) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        os.unlink(temp_path)
+        raise UploadError('Not a valid image file')
+
+    relative_path = f'{sha256}.{extension}'
+    return StoredUpload(relative_path, sha256, size, os.path.join(directory, relative_path), temp_path)
+
+
+ADD_REFERENCE = text(
+    'INSERT INTO stored_file (sha256, path, size, refcount) VALUES (:sha256, :path, :size, 1) '
+    'ON CONFLICT (sha256) DO UPDATE SET refcount = stored_file.refcount + 1'
+)
+
+
+def add_reference(upload):
+    """Count one more row pointing at ``upload`` in the current transaction"""
+    db.session.execute(ADD_REFERENCE, {'sha256': upload.sha256, 'path': upload.path, 'size': upload.size})
+
+
+def release_reference(connection, path):
+    """Count one fewer row pointing at ``path``; True once nothing uses the file"""
+    params = {'path': path}
+    connection.execute(text('UPDATE stored_file SET refcount = refcount - 1 WHERE path = :path'), params)
+    refcount = connection.execute(text('SELECT refcount FROM stored_file WHERE path = :path'), params).scalar()
+    if refcount is not None and refcount <= 0:
+        connection.execute(text('DELETE FROM stored_file WHERE path = :path'), params)
+        return True
+    return False
+
+
+def remove_files(directory, paths):
+    """Remove files that lost their last reference, unless one was added since.
+
+    Checks and removes inside a write transaction. Uploads and imports add
+    their reference before placing the file in theirs, so the two cannot
+    interleave: either the file goes first and is placed again, or the new
+    reference is seen here and the file stays.
+    """
+    if not paths:
+        return
+    with db.engine.begin() as connection:
+        for path in paths:
+            # A write first, so SQLite takes the write lock before the check
+            connection.execute(text('DELETE FROM stored_file WHERE path = :path AND refcount <= 0'), {'path': path})
+            if connection.execute(text('SELECT 1 FROM stored_file WHERE path = :path'), {'path': path}).first():
+                continue
+            try:
+                os.remove(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+
+
+@event.listens_for(Song, 'after_delete')
+def _release_audio(mapper, connection, song):
+    """Drop a reference when a song goes; the file itself is removed after commit"""
+    if release_reference(connection, song.file_path):
+        object_session(song).info.setdefault('orphaned_audio', []).append(song.file_path)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _remove_orphans(session):
+    orphans = session.info.pop('orphaned_audio', None)
+    if orphans:
+        remove_files(os.path.join(current_app.config['UPLOAD_FOLDER'], 'audio'), orphans)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_orphans(session):
+    session.info.pop('orphaned_audio', None)